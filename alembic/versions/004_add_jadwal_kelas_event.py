@@ -0,0 +1,36 @@
+"""Add jadwal_kelas_event table used as the schedule version log
+
+Revision ID: 004_add_jadwal_kelas_event
+Revises: 003_add_kode_dosen_to_dosen
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import DateTime
+from sqlalchemy.sql import func
+
+
+# revision identifiers
+revision = '004_add_jadwal_kelas_event'
+down_revision = '003_add_kode_dosen_to_dosen'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create jadwal_kelas_event table
+    op.create_table('jadwal_kelas_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('jadwal_kelas_id', sa.Integer(), nullable=False),
+        sa.Column('semester', sa.String(20), nullable=True),
+        sa.Column('event_type', sa.String(30), nullable=False),
+        sa.Column('created_at', DateTime, server_default=func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_jadwal_kelas_event_jadwal_kelas_id', 'jadwal_kelas_event', ['jadwal_kelas_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_jadwal_kelas_event_jadwal_kelas_id', table_name='jadwal_kelas_event')
+    op.drop_table('jadwal_kelas_event')
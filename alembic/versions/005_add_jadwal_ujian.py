@@ -0,0 +1,40 @@
+"""Add jadwal_ujian table for generated exam timetables
+
+Revision ID: 005_add_jadwal_ujian
+Revises: 004_add_jadwal_kelas_event
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import DateTime
+from sqlalchemy.sql import func
+
+
+# revision identifiers
+revision = '005_add_jadwal_ujian'
+down_revision = '004_add_jadwal_kelas_event'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create jadwal_ujian table
+    op.create_table('jadwal_ujian',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('semester', sa.String(20), nullable=False),
+        sa.Column('jenis_ujian', sa.String(10), nullable=False),
+        sa.Column('matakuliah_id', sa.Integer(), nullable=False),
+        sa.Column('kode_mk', sa.String(10), nullable=False),
+        sa.Column('periode', sa.Integer(), nullable=False),
+        sa.Column('ruang_id', sa.Integer(), nullable=True),
+        sa.Column('jumlah_peserta', sa.Integer(), nullable=False),
+        sa.Column('created_at', DateTime(timezone=True), server_default=func.now()),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_jadwal_ujian_semester_jenis', 'jadwal_ujian', ['semester', 'jenis_ujian'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_jadwal_ujian_semester_jenis', table_name='jadwal_ujian')
+    op.drop_table('jadwal_ujian')
@@ -0,0 +1,39 @@
+"""Make attendance_record unique per (attendance_session_id, nim)
+
+Revision ID: 006_attendance_record_unique
+Revises: 005_add_jadwal_ujian
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers
+revision = '006_attendance_record_unique'
+down_revision = '005_add_jadwal_ujian'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keep the first scan of every student per session; later copies came from the
+    # read-then-insert race the unique index now prevents
+    op.execute("""
+        DELETE FROM attendance_record
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM attendance_record
+            GROUP BY attendance_session_id, nim
+        )
+    """)
+
+    # Scans insert with ON CONFLICT (attendance_session_id, nim) DO NOTHING
+    op.create_index(
+        'uq_attendance_record_session_nim',
+        'attendance_record',
+        ['attendance_session_id', 'nim'],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_attendance_record_session_nim', table_name='attendance_record')
@@ -0,0 +1,49 @@
+"""Create attendance_warning table for the attendance early-warning sweep
+
+Revision ID: 007_add_attendance_warning
+Revises: 006_attendance_record_unique
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers
+revision = '007_add_attendance_warning'
+down_revision = '006_attendance_record_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create attendance_warning table
+    op.create_table('attendance_warning',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('semester', sa.String(20), nullable=False),
+        sa.Column('schedule_id', sa.Integer(), nullable=False),
+        sa.Column('kode_mk', sa.String(20), nullable=False),
+        sa.Column('dosen_id', sa.Integer(), nullable=True),
+        sa.Column('nim', sa.String(20), nullable=False),
+        sa.Column('hadir', sa.Integer(), nullable=False),
+        sa.Column('total_sesi', sa.Integer(), nullable=False),
+        sa.Column('persentase', sa.Float(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('severity', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('semester', 'schedule_id', 'nim', name='uq_attendance_warning_semester_schedule_nim')
+    )
+    op.create_index(op.f('ix_attendance_warning_id'), 'attendance_warning', ['id'], unique=False)
+    op.create_index('idx_attendance_warning_semester_severity', 'attendance_warning',
+                    ['semester', 'severity', 'persentase'], unique=False)
+    op.create_index('idx_attendance_warning_dosen', 'attendance_warning', ['dosen_id', 'semester'], unique=False)
+    op.create_index('idx_attendance_warning_nim', 'attendance_warning', ['nim'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_attendance_warning_nim', table_name='attendance_warning')
+    op.drop_index('idx_attendance_warning_dosen', table_name='attendance_warning')
+    op.drop_index('idx_attendance_warning_semester_severity', table_name='attendance_warning')
+    op.drop_index(op.f('ix_attendance_warning_id'), table_name='attendance_warning')
+    op.drop_table('attendance_warning')
@@ -0,0 +1,177 @@
+"""
+Streaming attendance export over many schedules
+
+One row per (schedule, rostered student) with a column per session, produced from a
+server-side cursor (yield_per) ordered by (schedule, nim): consecutive cursor rows of the
+same student are folded into one output row, so memory stays constant however many
+schedules match. Only the session numbers of the matching schedules (at most 16 each) are
+loaded up front. The roster is the same as the attendance matrix: students with the
+course in their KRS.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+from typing import Dict, Any, Iterator, Optional, Set
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from attendance_system.attendance_matrix import SAFE_PERCENTAGE, WARNING_PERCENTAGE
+from krs_system.models import Matakuliah, KRS, KRSDetail
+from pmb_system.models import CalonMahasiswa, ProgramStudi
+from schedule_system.models import JadwalKelas, Dosen
+
+
+MAX_SESSIONS = 16
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = ("csv", "ndjson")
+
+EXPORT_COLUMNS = (
+    ["schedule_id", "kode_mk", "semester", "kelas", "nama_dosen", "nim", "nama"]
+    + [f"S{number}" for number in range(1, MAX_SESSIONS + 1)]
+    + ["hadir", "total_sesi", "persentase", "status"]
+)
+
+
+def _schedule_filter(
+    query,
+    semester: Optional[str] = None,
+    dosen_id: Optional[int] = None,
+    fakultas: Optional[str] = None,
+    schedule_id: Optional[int] = None
+):
+    """Filters on a query that has JadwalKelas and Dosen in its FROM clause"""
+    if semester:
+        query = query.filter(JadwalKelas.semester == semester)
+    if dosen_id is not None:
+        query = query.filter(JadwalKelas.dosen_id == dosen_id)
+    if schedule_id is not None:
+        query = query.filter(JadwalKelas.id == schedule_id)
+    if fakultas:
+        # A class belongs to the faculty of its lecturer's study program
+        query = query.join(ProgramStudi, ProgramStudi.nama == Dosen.program_studi).filter(
+            ProgramStudi.fakultas == fakultas
+        )
+    return query
+
+
+def iter_attendance_rows(db: Session, batch_size: int = EXPORT_BATCH_SIZE, **filters) -> Iterator[Dict[str, Any]]:
+    """
+    Attendance of every rostered student of the matching schedules that have sessions
+
+    Args:
+        filters: semester, dosen_id, fakultas, schedule_id
+
+    Yields:
+        {"schedule_id", "kode_mk", "semester", "kelas", "nama_dosen", "nim", "nama",
+         "sesi": {session_number: bool} for the sessions held, "hadir", "total_sesi", "persentase", "status"}
+    """
+    held: Dict[int, Set[int]] = defaultdict(set)
+    session_rows = _schedule_filter(
+        db.query(AttendanceSession.schedule_id, AttendanceSession.session_number).join(
+            JadwalKelas, JadwalKelas.id == AttendanceSession.schedule_id
+        ).outerjoin(Dosen, Dosen.id == JadwalKelas.dosen_id),
+        **filters
+    ).all()
+    for schedule_id, number in session_rows:
+        held[schedule_id].add(number)
+    if not held:
+        return
+
+    attended = select(
+        AttendanceSession.schedule_id, AttendanceRecord.nim, AttendanceSession.session_number
+    ).join(
+        AttendanceRecord, AttendanceRecord.attendance_session_id == AttendanceSession.id
+    ).subquery()
+
+    query = db.query(
+        JadwalKelas.id, JadwalKelas.kode_mk, JadwalKelas.semester, JadwalKelas.kelas, Dosen.nama.label("nama_dosen"),
+        KRS.nim, CalonMahasiswa.nama_lengkap, attended.c.session_number
+    ).join(
+        Matakuliah, Matakuliah.kode == JadwalKelas.kode_mk
+    ).join(
+        KRSDetail, KRSDetail.matakuliah_id == Matakuliah.id
+    ).join(
+        KRS, KRS.id == KRSDetail.krs_id
+    ).outerjoin(
+        Dosen, Dosen.id == JadwalKelas.dosen_id
+    ).outerjoin(
+        CalonMahasiswa, CalonMahasiswa.nim == KRS.nim
+    ).outerjoin(
+        attended, and_(attended.c.schedule_id == JadwalKelas.id, attended.c.nim == KRS.nim)
+    ).filter(JadwalKelas.id.in_(select(AttendanceSession.schedule_id)))
+    query = _schedule_filter(query, **filters).order_by(JadwalKelas.id, KRS.nim)
+
+    current = None
+    for row in query.yield_per(batch_size):
+        if current is None or (current["schedule_id"], current["nim"]) != (row.id, row.nim):
+            if current is not None:
+                yield _finish_row(current, held[current["schedule_id"]])
+            current = {
+                "schedule_id": row.id,
+                "kode_mk": row.kode_mk,
+                "semester": row.semester,
+                "kelas": row.kelas,
+                "nama_dosen": row.nama_dosen,
+                "nim": row.nim,
+                "nama": row.nama_lengkap,
+                "attended": set()
+            }
+        if row.session_number is not None:
+            current["attended"].add(row.session_number)
+    if current is not None:
+        yield _finish_row(current, held[current["schedule_id"]])
+
+
+def _finish_row(current: Dict[str, Any], held: Set[int]) -> Dict[str, Any]:
+    attended = current.pop("attended") & held
+    total = len(held)
+    percentage = round(len(attended) / total * 100, 2)
+    if percentage >= SAFE_PERCENTAGE:
+        status = "AMAN"
+    elif percentage >= WARNING_PERCENTAGE:
+        status = "PERINGATAN"
+    else:
+        status = "KRITIS"
+    return {
+        **current,
+        "sesi": {number: number in attended for number in sorted(held)},
+        "hadir": len(attended),
+        "total_sesi": total,
+        "persentase": percentage,
+        "status": status
+    }
+
+
+def iter_attendance_csv(db: Session, batch_size: int = EXPORT_BATCH_SIZE, **filters) -> Iterator[str]:
+    """CSV text in chunks of batch_size rows; S1..S16 are 1/0 for sessions held, empty otherwise"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for index, row in enumerate(iter_attendance_rows(db, batch_size, **filters), start=1):
+        sesi = row["sesi"]
+        writer.writerow(
+            [row["schedule_id"], row["kode_mk"], row["semester"], row["kelas"] or "", row["nama_dosen"] or "",
+             row["nim"], row["nama"] or ""]
+            + [int(sesi[number]) if number in sesi else "" for number in range(1, MAX_SESSIONS + 1)]
+            + [row["hadir"], row["total_sesi"], row["persentase"], row["status"]]
+        )
+        if index % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def iter_attendance_ndjson(db: Session, batch_size: int = EXPORT_BATCH_SIZE, **filters) -> Iterator[str]:
+    """One JSON object per line; "sesi" maps the session numbers held to attended or not"""
+    lines = []
+    for row in iter_attendance_rows(db, batch_size, **filters):
+        lines.append(json.dumps({**row, "sesi": {str(number): hadir for number, hadir in row["sesi"].items()}}))
+        if len(lines) == batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
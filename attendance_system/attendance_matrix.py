@@ -0,0 +1,188 @@
+"""
+Attendance matrix of a schedule: presence of every rostered student at every session
+
+build_attendance_matrix loads a schedule with four queries whatever its size: the schedule
+with its course and lecturer, its sessions, the roster with names, and one grouped query
+of (nim, session_number) pairs that fills a NumPy boolean matrix. The report, the insights
+and the CSV export are all derived from it. Matrices are memoized per schedule until a
+scan, a new session or ATTENDANCE_MATRIX_TTL seconds invalidate them.
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Iterable, NamedTuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from krs_system.models import Matakuliah, KRS, KRSDetail
+from pmb_system.models import CalonMahasiswa
+from schedule_system.models import JadwalKelas, Dosen
+
+
+ATTENDANCE_MATRIX_SIZE = 512
+ATTENDANCE_MATRIX_TTL = 300  # seconds; bounds staleness from roster changes, which do not invalidate
+
+SAFE_PERCENTAGE = 75
+WARNING_PERCENTAGE = 50
+
+
+class AttendanceMatrix(NamedTuple):
+    schedule_id: int
+    course_code: str
+    course_name: Optional[str]  # None when the course is unknown
+    lecturer_name: Optional[str]
+    has_course: bool
+    session_numbers: List[int]  # Columns, ascending
+    nims: List[str]  # Rows, the students with the course in their KRS
+    names: List[Optional[str]]  # None when the student has no PMB record
+    presence: np.ndarray  # bool, len(nims) × len(session_numbers)
+
+    @property
+    def total_sessions(self) -> int:
+        return len(self.session_numbers)
+
+    def hadir(self) -> np.ndarray:
+        return self.presence.sum(axis=1)
+
+    def percentages(self) -> np.ndarray:
+        if not self.total_sessions:
+            return np.zeros(len(self.nims))
+        return np.round(self.hadir() / self.total_sessions * 100, 2)
+
+    def statuses(self) -> np.ndarray:
+        percentages = self.percentages()
+        return np.select(
+            [percentages >= SAFE_PERCENTAGE, percentages >= WARNING_PERCENTAGE],
+            ["AMAN", "PERINGATAN"],
+            default="KRITIS"
+        )
+
+
+def build_attendance_matrix(db: Session, schedule_id: int) -> Optional[AttendanceMatrix]:
+    """Matrix of a schedule, or None when the schedule does not exist"""
+    row = db.query(JadwalKelas.kode_mk, Matakuliah.id, Matakuliah.nama, Dosen.nama).outerjoin(
+        Matakuliah, Matakuliah.kode == JadwalKelas.kode_mk
+    ).outerjoin(
+        Dosen, Dosen.id == JadwalKelas.dosen_id
+    ).filter(JadwalKelas.id == schedule_id).first()
+    if row is None:
+        return None
+    kode_mk, matakuliah_id, course_name, lecturer_name = row
+
+    session_numbers = sorted({number for (number,) in db.query(AttendanceSession.session_number).filter(
+        AttendanceSession.schedule_id == schedule_id
+    ).all()})
+
+    nims: List[str] = []
+    names: List[Optional[str]] = []
+    if matakuliah_id is not None:
+        seen = set()
+        roster = db.query(KRS.nim, CalonMahasiswa.nama_lengkap).join(
+            KRSDetail, KRS.id == KRSDetail.krs_id
+        ).outerjoin(
+            CalonMahasiswa, CalonMahasiswa.nim == KRS.nim
+        ).filter(
+            KRSDetail.matakuliah_id == matakuliah_id
+        ).distinct().order_by(KRS.nim).all()
+        for nim, nama in roster:
+            if nim not in seen:
+                seen.add(nim)
+                nims.append(nim)
+                names.append(nama)
+
+    presence = np.zeros((len(nims), len(session_numbers)), dtype=bool)
+    if nims and session_numbers:
+        pairs = db.query(AttendanceRecord.nim, AttendanceSession.session_number).join(
+            AttendanceSession, AttendanceRecord.attendance_session_id == AttendanceSession.id
+        ).filter(
+            AttendanceSession.schedule_id == schedule_id
+        ).group_by(AttendanceRecord.nim, AttendanceSession.session_number).all()
+
+        row_of = {nim: i for i, nim in enumerate(nims)}
+        column_of = {number: j for j, number in enumerate(session_numbers)}
+        cells = np.array(
+            [(row_of[nim], column_of[number]) for nim, number in pairs if nim in row_of],
+            dtype=np.int64
+        ).reshape(-1, 2)
+        presence[cells[:, 0], cells[:, 1]] = True
+
+    return AttendanceMatrix(
+        schedule_id=schedule_id,
+        course_code=kode_mk,
+        course_name=course_name,
+        lecturer_name=lecturer_name,
+        has_course=matakuliah_id is not None,
+        session_numbers=session_numbers,
+        nims=nims,
+        names=names,
+        presence=presence
+    )
+
+
+class _EngineMatrices:
+    def __init__(self):
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()  # schedule_id -> (built_at, matrix)
+        self.generation = 0
+
+
+class AttendanceMatrixCache:
+    """
+    LRU of attendance matrices per schedule, kept separately for every database engine.
+    A matrix built while an invalidation happened is not stored.
+    """
+
+    def __init__(self, max_entries: int = ATTENDANCE_MATRIX_SIZE, ttl: float = ATTENDANCE_MATRIX_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._engines: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _engine(self, db: Session) -> _EngineMatrices:
+        bind = db.get_bind()
+        cache = self._engines.get(bind)
+        if cache is None:
+            cache = self._engines[bind] = _EngineMatrices()
+        return cache
+
+    def get_or_build(self, db: Session, schedule_id: int) -> Optional[AttendanceMatrix]:
+        with self._lock:
+            cache = self._engine(db)
+            entry = cache.entries.get(schedule_id)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                cache.entries.move_to_end(schedule_id)
+                return entry[1]
+            generation = cache.generation
+
+        matrix = build_attendance_matrix(db, schedule_id)
+        if matrix is None:
+            return None
+
+        with self._lock:
+            if cache.generation == generation:
+                cache.entries[schedule_id] = (time.monotonic(), matrix)
+                cache.entries.move_to_end(schedule_id)
+                while len(cache.entries) > self.max_entries:
+                    cache.entries.popitem(last=False)
+        return matrix
+
+    def invalidate(self, db: Session, schedule_ids: Iterable[int]) -> None:
+        with self._lock:
+            cache = self._engine(db)
+            cache.generation += 1
+            for schedule_id in schedule_ids:
+                cache.entries.pop(schedule_id, None)
+
+
+attendance_matrix_cache = AttendanceMatrixCache()
+
+
+def get_attendance_matrix(db: Session, schedule_id: int) -> Optional[AttendanceMatrix]:
+    return attendance_matrix_cache.get_or_build(db, schedule_id)
+
+
+def invalidate_attendance_matrix(db: Session, schedule_ids: Iterable[int]) -> None:
+    """Drop cached matrices after scans or sessions of the schedules were written (call after the commit)"""
+    attendance_matrix_cache.invalidate(db, schedule_ids)
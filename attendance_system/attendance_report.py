@@ -5,14 +5,18 @@ from pmb_system.database import get_db
 from typing import List, Dict, Any
 import csv
 import io
+import numpy as np
 from fastapi.responses import StreamingResponse
 from datetime import datetime
 from pydantic import BaseModel
 
-from attendance_system.models import AttendanceSession, AttendanceRecord
-from schedule_system.models import JadwalKelas, JadwalMahasiswa, Dosen
-from pmb_system.models import CalonMahasiswa
-from krs_system.models import Matakuliah, KRS, KRSDetail
+from attendance_system.attendance_matrix import AttendanceMatrix, get_attendance_matrix
+from attendance_system.attendance_export import EXPORT_FORMATS, iter_attendance_csv, iter_attendance_ndjson
+from attendance_system.attendance_warnings import get_attendance_warnings, run_attendance_early_warning
+from attendance_system.router import current_dosen_id
+from auth_system.dependencies import get_current_user, role_required
+from auth_system.models import User, RoleEnum
+from typing import Optional
 
 
 router = APIRouter(prefix="/api/attendance", tags=["attendance-report"])
@@ -43,6 +47,45 @@ class EarlyWarningInsight(BaseModel):
     student_warnings: List[Dict[str, Any]]
 
 
+def _load_matrix(db: Session, schedule_id: int) -> AttendanceMatrix:
+    matrix = get_attendance_matrix(db, schedule_id)
+    if matrix is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return matrix
+
+
+def build_attendance_report(matrix: AttendanceMatrix) -> Dict[str, Any]:
+    """Report data of a schedule: attendance and status of every rostered student"""
+    students_data = []
+    # Without sessions or a known course the report is empty, like before any meeting
+    counted = bool(matrix.total_sessions and matrix.has_course)
+    if counted:
+        hadir = matrix.hadir()
+        percentages = matrix.percentages()
+        statuses = matrix.statuses()
+        students_data = [
+            {
+                "nim": nim,
+                "nama": nama or f"Student {nim}",
+                "hadir": int(hadir[i]),
+                "total_sesi": matrix.total_sessions,
+                "persentase": float(percentages[i]),
+                "status": str(statuses[i])
+            }
+            for i, (nim, nama) in enumerate(zip(matrix.nims, matrix.names))
+        ]
+
+    return {
+        "schedule_id": matrix.schedule_id,
+        "course_code": matrix.course_code,
+        "course_name": matrix.course_name or "Unknown Course",
+        "lecturer_name": matrix.lecturer_name or "Unknown Lecturer",
+        "total_students": len(students_data),
+        "total_sessions": matrix.total_sessions if counted else 0,
+        "students": students_data
+    }
+
+
 @router.get("/report/schedule/{schedule_id}")
 def get_attendance_report_by_schedule(
     schedule_id: int,
@@ -57,123 +100,12 @@ def get_attendance_report_by_schedule(
     - Status (AMAN/PERINGATAN/KRITIS)
     """
     try:
-        # Get schedule details
-        schedule = db.query(JadwalKelas).filter(JadwalKelas.id == schedule_id).first()
-        if not schedule:
-            raise HTTPException(status_code=404, detail="Schedule not found")
-
-        # Get course details
-        course = db.query(Matakuliah).filter(Matakuliah.kode == schedule.kode_mk).first()
-        course_name = course.nama if course else "Unknown Course"
-
-        # Get all attendance sessions for this schedule
-        attendance_sessions = db.query(AttendanceSession).filter(
-            AttendanceSession.schedule_id == schedule_id
-        ).all()
-
-        total_sessions = len(attendance_sessions)
-
-        if total_sessions == 0:
-            # If no sessions exist, return empty report
-            return {
-                "success": True,
-                "data": {
-                    "schedule_id": schedule_id,
-                    "course_code": schedule.kode_mk,
-                    "course_name": course_name,
-                    "lecturer_name": db.query(Dosen).filter(Dosen.id == schedule.dosen_id).first().nama if schedule.dosen_id else "Unknown",
-                    "total_students": 0,
-                    "total_sessions": 0,
-                    "students": []
-                }
-            }
-        
-        # Get all students registered for this course by finding KRS entries
-        # First, get the matakuliah_id for this schedule
-        matakuliah = db.query(Matakuliah).filter(Matakuliah.kode == schedule.kode_mk).first()
-
-        if not matakuliah:
-            # If no course found, return empty report
-            lecturer = db.query(Dosen).filter(Dosen.id == schedule.dosen_id).first()
-            lecturer_name = lecturer.nama if lecturer else "Unknown Lecturer"
-
-            return {
-                "success": True,
-                "data": {
-                    "schedule_id": schedule_id,
-                    "course_code": schedule.kode_mk,
-                    "course_name": course_name,
-                    "lecturer_name": lecturer_name,
-                    "total_students": 0,
-                    "total_sessions": 0,
-                    "students": []
-                }
-            }
-
-        # Find all KRS details that contain this matakuliah and get the associated students
-        krs_details_with_students = db.query(KRS.nim).join(
-            KRSDetail, KRS.id == KRSDetail.krs_id
-        ).filter(
-            KRSDetail.matakuliah_id == matakuliah.id
-        ).distinct().all()
-
-        # Extract unique NIMs from the query result
-        student_nims = [result.nim for result in krs_details_with_students]
-
-        students_data = []
-
-        for nim in student_nims:
-            # Count how many sessions this student attended for this schedule
-            attended_sessions = db.query(AttendanceRecord).join(
-                AttendanceSession, AttendanceRecord.attendance_session_id == AttendanceSession.id
-            ).filter(
-                AttendanceSession.schedule_id == schedule_id,
-                AttendanceRecord.nim == nim
-            ).count()
-
-            # Calculate percentage
-            if total_sessions > 0:
-                percentage = round((attended_sessions / total_sessions) * 100, 2)
-            else:
-                percentage = 0.0
-
-            # Determine status based on percentage
-            if percentage >= 75:
-                status = "AMAN"
-            elif percentage >= 50:
-                status = "PERINGATAN"
-            else:
-                status = "KRITIS"
-
-            # Get student name
-            student = db.query(CalonMahasiswa).filter(CalonMahasiswa.nim == nim).first()
-            student_name = student.nama_lengkap if student else f"Student {nim}"
-
-            students_data.append({
-                "nim": nim,
-                "nama": student_name,
-                "hadir": attended_sessions,
-                "total_sesi": total_sessions,
-                "persentase": percentage,
-                "status": status
-            })
-
-        # Get lecturer name
-        lecturer = db.query(Dosen).filter(Dosen.id == schedule.dosen_id).first()
-        lecturer_name = lecturer.nama if lecturer else "Unknown Lecturer"
-
         return {
             "success": True,
-            "data": {
-                "schedule_id": schedule_id,
-                "course_code": schedule.kode_mk,
-                "course_name": course_name,
-                "lecturer_name": lecturer_name,
-                "total_students": len(students_data),
-                "total_sessions": total_sessions,
-                "students": students_data
-            }
+            "data": build_attendance_report(_load_matrix(db, schedule_id))
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
@@ -187,18 +119,16 @@ def export_attendance_report_csv(
     Export attendance report to CSV format
     """
     try:
-        # Get the attendance report data
-        report_response = get_attendance_report_by_schedule(schedule_id, db)
-        report_data = report_response["data"]
-        
-        # Create CSV content
+        report_data = build_attendance_report(_load_matrix(db, schedule_id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+    def rows():
         output = io.StringIO()
         writer = csv.writer(output)
-        
-        # Write header
         writer.writerow(["NIM", "Nama", "Hadir", "Total Sesi", "Persentase"])
-        
-        # Write data rows
         for student in report_data["students"]:
             writer.writerow([
                 student["nim"],
@@ -207,18 +137,47 @@ def export_attendance_report_csv(
                 student["total_sesi"],
                 f"{student['persentase']}%"
             ])
-        
-        # Get CSV content
-        csv_content = output.getvalue()
-        output.close()
-        
-        # Create streaming response
-        response = StreamingResponse(io.StringIO(csv_content), media_type="text/csv")
-        response.headers["Content-Disposition"] = f"attachment; filename=attendance_report_schedule_{schedule_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        
-        return response
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+        yield output.getvalue()
+
+    response = StreamingResponse(rows(), media_type="text/csv")
+    response.headers["Content-Disposition"] = f"attachment; filename=attendance_report_schedule_{schedule_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return response
+
+
+@router.get("/export")
+def export_attendance(
+    semester: Optional[str] = None,
+    dosen_id: Optional[int] = None,
+    fakultas: Optional[str] = None,
+    schedule_id: Optional[int] = None,
+    format: str = "csv",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the attendance of every schedule matching the filters (semester, dosen, faculty),
+    one row per student with a column per session, as CSV or NDJSON.
+    Lecturers only export their own classes.
+    """
+    if current_user.role not in (RoleEnum.ADMIN, RoleEnum.DOSEN):
+        raise HTTPException(status_code=403, detail="Only lecturers and admins can export attendance")
+    if current_user.role == RoleEnum.DOSEN:
+        dosen_id = current_dosen_id(db, current_user)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format harus salah satu dari: {', '.join(EXPORT_FORMATS)}")
+
+    iter_rows = iter_attendance_csv if format == "csv" else iter_attendance_ndjson
+
+    def content():
+        try:
+            yield from iter_rows(db, semester=semester, dosen_id=dosen_id, fakultas=fakultas, schedule_id=schedule_id)
+        finally:
+            db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    response = StreamingResponse(content(), media_type=media_type)
+    response.headers["Content-Disposition"] = f"attachment; filename=attendance_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return response
 
 
 @router.get("/insights/schedule/{schedule_id}")
@@ -234,127 +193,62 @@ def get_early_warning_insights(
     - Individual student warnings
     """
     try:
-        # Get schedule details
-        schedule = db.query(JadwalKelas).filter(JadwalKelas.id == schedule_id).first()
-        if not schedule:
-            raise HTTPException(status_code=404, detail="Schedule not found")
-
-        # Get course details
-        course = db.query(Matakuliah).filter(Matakuliah.kode == schedule.kode_mk).first()
-        course_name = course.nama if course else "Unknown Course"
+        matrix = _load_matrix(db, schedule_id)
+        course_name = matrix.course_name or "Unknown Course"
 
-        # Get all attendance sessions for this schedule
-        attendance_sessions = db.query(AttendanceSession).filter(
-            AttendanceSession.schedule_id == schedule_id
-        ).all()
-
-        total_sessions = len(attendance_sessions)
-
-        if total_sessions == 0:
+        def empty(message: str) -> Dict[str, Any]:
             return {
                 "success": True,
                 "data": {
                     "schedule_id": schedule_id,
                     "class_attendance_avg": 0.0,
-                    "insights": [f"Belum ada sesi presensi yang dibuat untuk jadwal {course_name}."],
+                    "insights": [message],
                     "student_warnings": []
                 }
             }
-        
-        # Get all students registered for this course by finding KRS entries
-        # First, get the matakuliah_id for this schedule
-        matakuliah = db.query(Matakuliah).filter(Matakuliah.kode == schedule.kode_mk).first()
 
-        if not matakuliah:
-            return {
-                "success": True,
-                "data": {
-                    "schedule_id": schedule_id,
-                    "class_attendance_avg": 0.0,
-                    "insights": [f"Tidak ada mata kuliah ditemukan untuk jadwal ini ({course_name})."],
-                    "student_warnings": []
-                }
-            }
-
-        # Find all KRS details that contain this matakuliah and get the associated students
-        krs_details_with_students = db.query(KRS.nim).join(
-            KRSDetail, KRS.id == KRSDetail.krs_id
-        ).filter(
-            KRSDetail.matakuliah_id == matakuliah.id
-        ).distinct().all()
-
-        # Extract unique NIMs from the query result
-        student_nims = [result.nim for result in krs_details_with_students]
-
-        if not student_nims:
-            return {
-                "success": True,
-                "data": {
-                    "schedule_id": schedule_id,
-                    "class_attendance_avg": 0.0,
-                    "insights": ["Tidak ada mahasiswa terdaftar untuk mata kuliah ini."],
-                    "student_warnings": []
-                }
-            }
+        if matrix.total_sessions == 0:
+            return empty(f"Belum ada sesi presensi yang dibuat untuk jadwal {course_name}.")
+        if not matrix.has_course:
+            return empty(f"Tidak ada mata kuliah ditemukan untuk jadwal ini ({course_name}).")
+        if not matrix.nims:
+            return empty("Tidak ada mahasiswa terdaftar untuk mata kuliah ini.")
 
-        total_attendance_percentages = 0
+        percentages = matrix.percentages()
+        statuses = matrix.statuses()
         student_warnings = []
-
-        for nim in student_nims:
-            # Count how many sessions this student attended
-            attended_sessions = db.query(AttendanceRecord).join(
-                AttendanceSession, AttendanceRecord.attendance_session_id == AttendanceSession.id
-            ).filter(
-                AttendanceSession.schedule_id == schedule_id,
-                AttendanceRecord.nim == nim
-            ).count()
-
-            # Calculate percentage
-            if total_sessions > 0:
-                percentage = round((attended_sessions / total_sessions) * 100, 2)
+        for i in np.flatnonzero(statuses != "AMAN"):
+            nim = matrix.nims[i]
+            student_name = matrix.names[i] or "Unknown Student"
+            if statuses[i] == "KRITIS":
+                warning_message = f"Mahasiswa {student_name} ({nim}) sering tidak hadir, disarankan konseling akademik."
             else:
-                percentage = 0.0
-
-            total_attendance_percentages += percentage
-
-            # Determine if student needs warning
-            if percentage < 75:
-                student = db.query(CalonMahasiswa).filter(CalonMahasiswa.nim == nim).first()
-                student_name = student.nama_lengkap if student else "Unknown Student"
-
-                if percentage < 50:
-                    warning_message = f"Mahasiswa {student_name} ({nim}) sering tidak hadir, disarankan konseling akademik."
-                    warning_level = "KRITIS"
-                elif percentage < 75:
-                    warning_message = f"Mahasiswa {student_name} ({nim}) mulai sering absen, disarankan pemantauan."
-                    warning_level = "PERINGATAN"
-
-                student_warnings.append({
-                    "nim": nim,
-                    "nama": student_name,
-                    "persentase": percentage,
-                    "warning_message": warning_message,
-                    "warning_level": warning_level
-                })
+                warning_message = f"Mahasiswa {student_name} ({nim}) mulai sering absen, disarankan pemantauan."
+            student_warnings.append({
+                "nim": nim,
+                "nama": student_name,
+                "persentase": float(percentages[i]),
+                "warning_message": warning_message,
+                "warning_level": str(statuses[i])
+            })
 
         # Calculate class average
-        class_attendance_avg = round(total_attendance_percentages / len(student_nims), 2) if student_nims else 0.0
-        
+        class_attendance_avg = round(float(percentages.sum()) / len(matrix.nims), 2)
+
         # Generate class-level insights
         insights = []
-        
+
         if class_attendance_avg < 60:
             insights.append("Tingkat kehadiran kelas rendah, pertimbangkan evaluasi metode pengajaran atau reschedule.")
         elif class_attendance_avg < 75:
             insights.append("Tingkat kehadiran kelas perlu ditingkatkan.")
         else:
             insights.append("Tingkat kehadiran kelas baik.")
-        
+
         # Add insight about number of students with warnings
-        warning_count = len([w for w in student_warnings if w["warning_level"] in ["PERINGATAN", "KRITIS"]])
-        if warning_count > 0:
-            insights.append(f"Terdapat {warning_count} mahasiswa yang memerlukan perhatian khusus terkait kehadiran.")
-        
+        if student_warnings:
+            insights.append(f"Terdapat {len(student_warnings)} mahasiswa yang memerlukan perhatian khusus terkait kehadiran.")
+
         return {
             "success": True,
             "data": {
@@ -364,5 +258,45 @@ def get_early_warning_insights(
                 "student_warnings": student_warnings
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.get("/early-warning")
+def list_attendance_warnings(
+    semester: Optional[str] = None,
+    status: Optional[str] = None,
+    schedule_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Students below 75% attendance in any class, from the nightly sweep, most severe first.
+    Lecturers only see their own classes.
+    """
+    if current_user.role not in (RoleEnum.ADMIN, RoleEnum.DOSEN):
+        raise HTTPException(status_code=403, detail="Only lecturers and admins can view attendance warnings")
+
+    return {
+        "success": True,
+        "data": get_attendance_warnings(
+            db, semester, status, current_dosen_id(db, current_user), schedule_id, max(skip, 0), min(max(limit, 1), 500)
+        )
+    }
+
+
+@router.post("/early-warning/run")
+def run_attendance_warnings(
+    semester: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(role_required(RoleEnum.ADMIN))
+):
+    """Run the attendance early-warning sweep now (normally run by the scheduler every night)"""
+    return {
+        "success": True,
+        "data": run_attendance_early_warning(db, semester)
+    }
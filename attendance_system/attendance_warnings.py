@@ -0,0 +1,177 @@
+"""
+Nightly campus-wide attendance early-warning sweep
+
+One grouped query yields, for every (schedule, rostered student) of the semester, the
+distinct sessions attended and the sessions held; the roster is the students whose KRS of
+that semester has the schedule's course. Percentages and AMAN/PERINGATAN/KRITIS states are
+computed over all pairs at once with NumPy, using the thresholds of the per-class report.
+Students below SAFE_PERCENTAGE replace the semester's rows in attendance_warning, which
+student affairs pages through most severe first.
+"""
+from typing import Dict, Any, Optional
+
+import numpy as np
+from sqlalchemy import insert, select, and_, func, distinct
+from sqlalchemy.orm import Session
+
+from attendance_system.models import AttendanceSession, AttendanceRecord, AttendanceWarning
+from attendance_system.attendance_matrix import SAFE_PERCENTAGE, WARNING_PERCENTAGE
+from krs_system.models import Matakuliah, KRS, KRSDetail
+from schedule_system.models import JadwalKelas
+
+
+STATUS_SEVERITY = {"KRITIS": 2, "PERINGATAN": 1, "AMAN": 0}
+
+
+def compute_attendance_warnings(db: Session, semester: str) -> Dict[str, np.ndarray]:
+    """Attendance of every rostered student of the semester's schedules with sessions, as aligned arrays"""
+    totals = select(
+        AttendanceSession.schedule_id.label("schedule_id"),
+        func.count(distinct(AttendanceSession.session_number)).label("total_sesi")
+    ).group_by(AttendanceSession.schedule_id).subquery()
+
+    attended = select(
+        AttendanceSession.schedule_id.label("schedule_id"),
+        AttendanceRecord.nim.label("nim"),
+        AttendanceSession.session_number.label("session_number")
+    ).join(
+        AttendanceRecord, AttendanceRecord.attendance_session_id == AttendanceSession.id
+    ).subquery()
+
+    rows = db.query(
+        JadwalKelas.id, JadwalKelas.kode_mk, JadwalKelas.dosen_id, KRS.nim, totals.c.total_sesi,
+        func.count(distinct(attended.c.session_number)).label("hadir")
+    ).join(
+        totals, totals.c.schedule_id == JadwalKelas.id
+    ).join(
+        Matakuliah, Matakuliah.kode == JadwalKelas.kode_mk
+    ).join(
+        KRSDetail, KRSDetail.matakuliah_id == Matakuliah.id
+    ).join(
+        KRS, and_(KRS.id == KRSDetail.krs_id, KRS.semester == JadwalKelas.semester)
+    ).outerjoin(
+        attended, and_(attended.c.schedule_id == JadwalKelas.id, attended.c.nim == KRS.nim)
+    ).filter(
+        JadwalKelas.semester == semester
+    ).group_by(
+        JadwalKelas.id, JadwalKelas.kode_mk, JadwalKelas.dosen_id, KRS.nim, totals.c.total_sesi
+    ).all()
+
+    hadir = np.array([row.hadir for row in rows], dtype=np.int64)
+    total_sesi = np.array([row.total_sesi for row in rows], dtype=np.int64)
+    persentase = np.zeros(len(rows))
+    np.divide(hadir * 100.0, total_sesi, out=persentase, where=total_sesi > 0)
+    persentase = np.round(persentase, 2)
+    status = np.select(
+        [persentase >= SAFE_PERCENTAGE, persentase >= WARNING_PERCENTAGE],
+        ["AMAN", "PERINGATAN"],
+        default="KRITIS"
+    )
+
+    return {
+        "schedule_id": np.array([row.id for row in rows], dtype=np.int64),
+        "kode_mk": np.array([row.kode_mk for row in rows], dtype=object),
+        "dosen_id": np.array([row.dosen_id for row in rows], dtype=object),
+        "nim": np.array([row.nim for row in rows], dtype=object),
+        "hadir": hadir,
+        "total_sesi": total_sesi,
+        "persentase": persentase,
+        "status": status,
+        "severity": np.select([status == "KRITIS", status == "PERINGATAN"], [2, 1], default=0),
+    }
+
+
+def run_attendance_early_warning(db: Session, semester: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Recompute attendance_warning for a semester (default: the latest semester with sessions)
+
+    Returns:
+        {"semester", "students": (schedule, nim) pairs evaluated, "flagged", "by_status": {status: count}}
+    """
+    if semester is None:
+        semester = db.query(func.max(JadwalKelas.semester)).filter(
+            JadwalKelas.id.in_(select(AttendanceSession.schedule_id))
+        ).scalar()
+        if semester is None:
+            return {"semester": None, "students": 0, "flagged": 0, "by_status": {}}
+
+    signals = compute_attendance_warnings(db, semester)
+    flagged = np.flatnonzero(signals["severity"] > 0)
+    records = [
+        {
+            "semester": semester,
+            "schedule_id": int(signals["schedule_id"][i]),
+            "kode_mk": signals["kode_mk"][i],
+            "dosen_id": signals["dosen_id"][i],
+            "nim": signals["nim"][i],
+            "hadir": int(signals["hadir"][i]),
+            "total_sesi": int(signals["total_sesi"][i]),
+            "persentase": float(signals["persentase"][i]),
+            "status": str(signals["status"][i]),
+            "severity": int(signals["severity"][i]),
+        }
+        for i in flagged
+    ]
+
+    try:
+        db.query(AttendanceWarning).filter(AttendanceWarning.semester == semester).delete(synchronize_session=False)
+        if records:
+            db.execute(insert(AttendanceWarning), records)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "semester": semester,
+        "students": len(signals["nim"]),
+        "flagged": len(records),
+        "by_status": {name: int((signals["status"] == name).sum()) for name in ("PERINGATAN", "KRITIS")}
+    }
+
+
+def get_attendance_warnings(
+    db: Session,
+    semester: Optional[str] = None,
+    status: Optional[str] = None,
+    dosen_id: Optional[int] = None,
+    schedule_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 50
+) -> Dict[str, Any]:
+    """Students below the safe percentage in a semester (default: the latest computed), most severe first"""
+    if semester is None:
+        semester = db.query(func.max(AttendanceWarning.semester)).scalar()
+
+    query = db.query(AttendanceWarning).filter(AttendanceWarning.semester == semester)
+    if status:
+        query = query.filter(AttendanceWarning.status == status)
+    if dosen_id is not None:
+        query = query.filter(AttendanceWarning.dosen_id == dosen_id)
+    if schedule_id is not None:
+        query = query.filter(AttendanceWarning.schedule_id == schedule_id)
+
+    total = query.count()
+    items = query.order_by(
+        AttendanceWarning.severity.desc(), AttendanceWarning.persentase, AttendanceWarning.nim,
+        AttendanceWarning.schedule_id
+    ).offset(skip).limit(limit).all()
+    return {
+        "semester": semester,
+        "total": total,
+        "items": [
+            {
+                "schedule_id": item.schedule_id,
+                "kode_mk": item.kode_mk,
+                "dosen_id": item.dosen_id,
+                "nim": item.nim,
+                "hadir": item.hadir,
+                "total_sesi": item.total_sesi,
+                "persentase": item.persentase,
+                "status": item.status,
+                "severity": item.severity,
+                "computed_at": item.computed_at
+            }
+            for item in items
+        ]
+    }
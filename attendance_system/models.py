@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from pmb_system.database import Base
 
@@ -20,4 +20,37 @@ class AttendanceRecord(Base):
     id = Column(Integer, primary_key=True, index=True)
     attendance_session_id = Column(Integer, nullable=False)  # Foreign key reference as integer without constraint
     nim = Column(String, nullable=False)  # Changed to not use FK constraint to avoid circular import
-    scanned_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    scanned_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # One record per student per session; scans insert with ON CONFLICT DO NOTHING
+        Index('uq_attendance_record_session_nim', 'attendance_session_id', 'nim', unique=True),
+    )
+
+
+class AttendanceWarning(Base):
+    """
+    Student below the safe attendance percentage in one class, from the nightly sweep.
+    Rewritten for the semester on every run by attendance_system.attendance_warnings.
+    """
+    __tablename__ = "attendance_warning"
+
+    id = Column(Integer, primary_key=True, index=True)
+    semester = Column(String(20), nullable=False)
+    schedule_id = Column(Integer, nullable=False)
+    kode_mk = Column(String(20), nullable=False)
+    dosen_id = Column(Integer, nullable=True)  # Lecturer of the schedule
+    nim = Column(String(20), nullable=False)
+    hadir = Column(Integer, nullable=False)
+    total_sesi = Column(Integer, nullable=False)
+    persentase = Column(Float, nullable=False)
+    status = Column(String(20), nullable=False)  # PERINGATAN or KRITIS
+    severity = Column(Integer, nullable=False)  # 2 for KRITIS, 1 for PERINGATAN
+    computed_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('semester', 'schedule_id', 'nim', name='uq_attendance_warning_semester_schedule_nim'),
+        Index('idx_attendance_warning_semester_severity', 'semester', 'severity', 'persentase'),
+        Index('idx_attendance_warning_dosen', 'dosen_id', 'semester'),
+        Index('idx_attendance_warning_nim', 'nim'),
+    )
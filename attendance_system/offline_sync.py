@@ -0,0 +1,165 @@
+"""
+Bulk upload of scans collected offline by lecturer devices
+
+When the hall's Wi-Fi cannot carry hundreds of live scans, the lecturer's device records
+(qr_token or session_id, nim, scanned_at) locally and uploads them later in chunks of at
+most SYNC_MAX_SCANS. A chunk is validated with two queries whatever its size (the sessions
+it names, and the roster pairs of their schedules) and written with one multi-row
+INSERT ... ON CONFLICT DO NOTHING, so re-uploading a chunk is harmless.
+
+Rotating tokens are checked against the window of their scanned_at rather than the upload
+time: a code is accepted if it was current when the device recorded the scan.
+"""
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from attendance_system.schemas import AttendanceSyncScan
+from attendance_system.qr_tokens import QR_TOKEN_PERIOD, is_rotating_token, verify_rotating_token
+from attendance_system.records import attendance_record_insert
+from attendance_system.scan_pipeline import scan_pipeline
+from attendance_system.attendance_matrix import invalidate_attendance_matrix
+from krs_system.models import Matakuliah, KRS, KRSDetail
+from schedule_system.models import JadwalKelas
+
+
+SYNC_MAX_SCANS = 5000  # per request; 3 bind parameters a row stays under SQLite's limit
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Devices without a zone are taken to report UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def sync_offline_scans(
+    db: Session,
+    scans: List[AttendanceSyncScan],
+    dosen_id: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Validate and store a chunk of offline scans
+
+    Args:
+        dosen_id: When given, only sessions of this lecturer's schedules are accepted
+
+    Returns:
+        {"received", "accepted", "duplicate", "rejected",
+         "rejections": [{"index", "nim", "reason"}]}
+    """
+    if len(scans) > SYNC_MAX_SCANS:
+        raise ValueError(f"Upload at most {SYNC_MAX_SCANS} scans per request")
+
+    now = _as_utc(now or datetime.now(timezone.utc))
+    latest = now + timedelta(seconds=QR_TOKEN_PERIOD)
+    rejections: List[Dict[str, Any]] = []
+
+    def reject(index: int, scan: AttendanceSyncScan, reason: str) -> None:
+        rejections.append({"index": index, "nim": scan.nim, "reason": reason})
+
+    # Resolve every scan to a session id; HMAC tokens need no query
+    resolved: List[Tuple[int, AttendanceSyncScan, datetime, Optional[int], Optional[str]]] = []
+    session_ids, static_tokens = set(), set()
+    for index, scan in enumerate(scans):
+        scanned_at = _as_utc(scan.scanned_at)
+        if scanned_at > latest:
+            reject(index, scan, "scanned_at is in the future")
+            continue
+        session_id, token = scan.session_id, None
+        if session_id is None:
+            if not scan.qr_token:
+                reject(index, scan, "qr_token or session_id is required")
+                continue
+            if is_rotating_token(scan.qr_token):
+                try:
+                    session_id = verify_rotating_token(scan.qr_token, now=scanned_at.timestamp())
+                except ValueError as e:
+                    reject(index, scan, str(e))
+                    continue
+            else:
+                token = scan.qr_token
+                static_tokens.add(token)
+        if session_id is not None:
+            session_ids.add(session_id)
+        resolved.append((index, scan, scanned_at, session_id, token))
+
+    sessions = {}
+    if session_ids or static_tokens:
+        sessions = {
+            row.id: row for row in db.query(
+                AttendanceSession.id, AttendanceSession.qr_token, AttendanceSession.schedule_id, JadwalKelas.dosen_id
+            ).join(
+                JadwalKelas, JadwalKelas.id == AttendanceSession.schedule_id
+            ).filter(
+                or_(AttendanceSession.id.in_(session_ids), AttendanceSession.qr_token.in_(static_tokens))
+            ).all()
+        }
+    session_of_token = {row.qr_token: row.id for row in sessions.values()}
+
+    candidates: List[Tuple[int, AttendanceSyncScan, datetime, Any]] = []
+    for index, scan, scanned_at, session_id, token in resolved:
+        if token is not None:
+            session_id = session_of_token.get(token)
+        session = sessions.get(session_id)
+        if session is None:
+            reject(index, scan, "Invalid QR token" if token is not None else "Attendance session not found")
+        elif dosen_id is not None and session.dosen_id != dosen_id:
+            reject(index, scan, "Attendance session belongs to another lecturer")
+        else:
+            candidates.append((index, scan, scanned_at, session))
+
+    # Roster pairs of the schedules involved, as in the attendance matrix: the course is in the student's KRS
+    schedule_ids = {session.schedule_id for _, _, _, session in candidates}
+    enrolled = set()
+    if schedule_ids:
+        enrolled = set(db.query(JadwalKelas.id, KRS.nim).join(
+            Matakuliah, Matakuliah.kode == JadwalKelas.kode_mk
+        ).join(
+            KRSDetail, KRSDetail.matakuliah_id == Matakuliah.id
+        ).join(
+            KRS, KRS.id == KRSDetail.krs_id
+        ).filter(
+            JadwalKelas.id.in_(schedule_ids),
+            KRS.nim.in_({scan.nim for _, scan, _, _ in candidates})
+        ).distinct().all())
+
+    # The earliest scan of a student per session is kept; later ones in the upload are duplicates
+    rows: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    duplicate = 0
+    for index, scan, scanned_at, session in candidates:
+        if (session.schedule_id, scan.nim) not in enrolled:
+            reject(index, scan, "Student is not enrolled in this class")
+            continue
+        key = (session.id, scan.nim)
+        if key in rows:
+            duplicate += 1
+            rows[key]["scanned_at"] = min(rows[key]["scanned_at"], scanned_at)
+        else:
+            rows[key] = {"attendance_session_id": session.id, "nim": scan.nim, "scanned_at": scanned_at}
+
+    accepted = 0
+    if rows:
+        inserted = db.execute(
+            attendance_record_insert(db).values(list(rows.values())).returning(AttendanceRecord.attendance_session_id)
+        ).all()
+        db.commit()
+        accepted = len(inserted)
+        duplicate += len(rows) - accepted
+        if inserted:
+            written = {session_id for (session_id,) in inserted}
+            for session_id in written:
+                # The pipeline's cached NIMs of these sessions are stale now
+                scan_pipeline.forget_session(session_id)
+            invalidate_attendance_matrix(db, {sessions[session_id].schedule_id for session_id in written})
+
+    rejections.sort(key=lambda rejection: rejection["index"])
+    return {
+        "received": len(scans),
+        "accepted": accepted,
+        "duplicate": duplicate,
+        "rejected": len(rejections),
+        "rejections": rejections
+    }
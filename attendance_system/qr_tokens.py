@@ -0,0 +1,72 @@
+"""
+Rotating QR tokens for attendance sessions
+
+A token is "<session_id>.<window>.<signature>", where window is the index of the current
+QR_TOKEN_PERIOD-second slot and signature is an HMAC-SHA256 of (session_id, window) under
+ATTENDANCE_QR_SECRET. Verifying a token is pure CPU work: no token is stored, and a
+screenshot stops working QR_TOKEN_SKEW windows after it was taken.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import time
+from typing import Optional
+
+from auth_system.services import SECRET_KEY
+
+
+QR_TOKEN_PERIOD = int(os.getenv("ATTENDANCE_QR_PERIOD", "30"))  # seconds per code
+QR_TOKEN_SKEW = int(os.getenv("ATTENDANCE_QR_SKEW", "1"))  # windows accepted either side of now
+QR_TOKEN_SECRET = os.getenv("ATTENDANCE_QR_SECRET", SECRET_KEY).encode()
+QR_SIGNATURE_BYTES = 16
+
+
+def current_window(now: Optional[float] = None, period: int = QR_TOKEN_PERIOD) -> int:
+    return int((time.time() if now is None else now) // period)
+
+
+def _signature(session_id: int, window: int, secret: bytes) -> str:
+    digest = hmac.new(secret, f"{session_id}:{window}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:QR_SIGNATURE_BYTES]).rstrip(b"=").decode()
+
+
+def make_rotating_token(
+    session_id: int,
+    now: Optional[float] = None,
+    period: int = QR_TOKEN_PERIOD,
+    secret: bytes = QR_TOKEN_SECRET
+) -> str:
+    window = current_window(now, period)
+    return f"{session_id}.{window}.{_signature(session_id, window, secret)}"
+
+
+def is_rotating_token(token: str) -> bool:
+    # Stored tokens are token_urlsafe output, which has no dots
+    return token.count(".") == 2
+
+
+def verify_rotating_token(
+    token: str,
+    now: Optional[float] = None,
+    period: int = QR_TOKEN_PERIOD,
+    skew: int = QR_TOKEN_SKEW,
+    secret: bytes = QR_TOKEN_SECRET
+) -> int:
+    """
+    Check a rotating token and return its session id
+
+    Raises:
+        ValueError: Malformed or forged token, or a window more than skew away from now
+    """
+    try:
+        session_part, window_part, signature = token.split(".")
+        session_id, window = int(session_part), int(window_part)
+    except ValueError:
+        raise ValueError("Invalid or inactive QR token")
+
+    if not hmac.compare_digest(signature, _signature(session_id, window, secret)):
+        raise ValueError("Invalid or inactive QR token")
+    if abs(current_window(now, period) - window) > skew:
+        raise ValueError("QR token has expired")
+    return session_id
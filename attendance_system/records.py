@@ -0,0 +1,65 @@
+"""
+Idempotent attendance record writes
+
+attendance_record has a unique index on (attendance_session_id, nim), so concurrent taps
+of the same student cannot both insert and no SELECT is needed before writing:
+    • batches use INSERT ... ON CONFLICT DO NOTHING and skip pairs already stored
+    • a single scan uses INSERT ... ON CONFLICT DO UPDATE (a no-op SET nim = excluded.nim)
+      RETURNING, which hands back the stored row when the student was already recorded
+Supported on SQLite (3.35+ for RETURNING) and PostgreSQL.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from attendance_system.models import AttendanceRecord
+
+
+RECORD_CONFLICT_COLUMNS = ["attendance_session_id", "nim"]
+
+
+def _insert(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT is not supported for {dialect}")
+    return insert(AttendanceRecord)
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite hands timestamps back without their zone
+    return value.replace(tzinfo=None) if value.tzinfo is None else value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def attendance_record_insert(db: Session):
+    """INSERT INTO attendance_record that skips (attendance_session_id, nim) pairs already stored"""
+    return _insert(db).on_conflict_do_nothing(index_elements=RECORD_CONFLICT_COLUMNS)
+
+
+def insert_attendance_record(
+    db: Session,
+    attendance_session_id: int,
+    nim: str,
+    scanned_at: Optional[datetime] = None
+) -> Tuple[AttendanceRecord, bool]:
+    """
+    Record a student's attendance at a session unless it is already recorded; the caller commits
+
+    Returns:
+        (record, created): the new record, or the original one with created False
+    """
+    scanned_at = scanned_at or datetime.now(timezone.utc)
+    stmt = _insert(db).values(attendance_session_id=attendance_session_id, nim=nim, scanned_at=scanned_at)
+    # One statement either way: a conflicting row is "updated" to itself and returned
+    record = db.scalars(
+        stmt.on_conflict_do_update(
+            index_elements=RECORD_CONFLICT_COLUMNS, set_={"nim": stmt.excluded.nim}
+        ).returning(AttendanceRecord),
+        execution_options={"populate_existing": True}
+    ).one()
+    # The stored scan time tells a new record from the original one
+    return record, _utc(record.scanned_at) == _utc(scanned_at)
@@ -3,20 +3,56 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from pmb_system.database import get_db
 from attendance_system.schemas import AttendanceSessionCreate
-from attendance_system.services import create_or_update_attendance_session, record_attendance_from_qr
+from attendance_system.services import (
+    create_or_update_attendance_session, create_attendance_sessions_bulk, record_attendance_from_qr
+)
 from attendance_system.models import AttendanceSession
-from typing import Dict, Any, List
+from attendance_system.scan_pipeline import ScanPipeline, get_scan_pipeline
+from attendance_system.qr_tokens import make_rotating_token, current_window, QR_TOKEN_PERIOD
+import time
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
-from .schemas import AttendanceScanRequest
+from .schemas import AttendanceScanRequest, AttendanceSyncRequest
+from attendance_system.offline_sync import SYNC_MAX_SCANS, sync_offline_scans
+from auth_system.dependencies import role_required
+from auth_system.models import User, RoleEnum
+from schedule_system.models import Dosen, JadwalKelas
 
 class AttendanceSessionGenerateRequest(BaseModel):
     schedule_id: int
     session_number: int
 
 
+class AttendanceSessionBulkRequest(BaseModel):
+    schedule_ids: Optional[List[int]] = None
+    semester: Optional[str] = None
+    session_numbers: Optional[List[int]] = None  # 1-16 when omitted
+    is_active: bool = False
+
+
 router = APIRouter(prefix="/api/attendance", tags=["attendance"])
 
 
+def current_dosen_id(db: Session, current_user: User) -> Optional[int]:
+    """Dosen id of a lecturer, None for admins who may act on every schedule"""
+    if current_user.role != RoleEnum.DOSEN:
+        return None
+    dosen = db.query(Dosen).filter(Dosen.kode_dosen == str(current_user.kode_dosen)).first()
+    if dosen is None and str(current_user.kode_dosen).isdigit():
+        dosen = db.query(Dosen).filter(Dosen.id == int(current_user.kode_dosen)).first()
+    if dosen is None:
+        raise HTTPException(status_code=403, detail="Lecturer profile not found")
+    return dosen.id
+
+
+def check_schedule_owner(db: Session, schedule_id: int, dosen_id: Optional[int]) -> None:
+    """Raise 403 unless the schedule belongs to the lecturer (admins pass dosen_id None)"""
+    if dosen_id is None:
+        return
+    owner = db.query(JadwalKelas.dosen_id).filter(JadwalKelas.id == schedule_id).scalar()
+    if owner != dosen_id:
+        raise HTTPException(status_code=403, detail="Schedule belongs to another lecturer")
+
 
 @router.post("/session/generate")
 def generate_attendance_session(
@@ -51,14 +87,50 @@ def generate_attendance_session(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/session/bulk")
+def generate_attendance_sessions_bulk(
+    payload: AttendanceSessionBulkRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(role_required(RoleEnum.DOSEN))
+):
+    """
+    Create sessions 1-16 of many schedules at once (the given schedule_ids, or every schedule
+    of a semester) and return their ids; the presensi page fetches each code from
+    GET /session/{id}/qr. Lecturers only get their own schedules.
+    """
+    dosen_id = current_dosen_id(db, current_user)
+    try:
+        result = create_attendance_sessions_bulk(
+            db,
+            schedule_ids=payload.schedule_ids,
+            semester=payload.semester,
+            session_numbers=payload.session_numbers,
+            is_active=payload.is_active,
+            dosen_id=dosen_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+    return {
+        "success": True,
+        "message": f"{result['created']} attendance session(s) generated",
+        "data": result
+    }
+
+
 @router.get("/session/schedule/{schedule_id}")
 def get_attendance_sessions_by_schedule(
     schedule_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    current_user: User = Depends(role_required(RoleEnum.DOSEN))
 ):
     """
-    Get attendance sessions for a specific schedule
+    Get attendance sessions for a specific schedule; lecturers only see their own schedules
     """
+    check_schedule_owner(db, schedule_id, current_dosen_id(db, current_user))
     try:
         attendance_sessions = db.query(AttendanceSession).filter(
             AttendanceSession.schedule_id == schedule_id
@@ -82,6 +154,35 @@ def get_attendance_sessions_by_schedule(
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 
+@router.get("/session/{session_id}/qr")
+def get_rotating_qr_token(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(role_required(RoleEnum.DOSEN))
+):
+    """
+    Current rotating QR code of a session, for the lecturer's presensi page.
+    Computed from the session id and the clock; scans check that the session is active.
+    """
+    schedule_id = db.query(AttendanceSession.schedule_id).filter(AttendanceSession.id == session_id).scalar()
+    if schedule_id is None:
+        raise HTTPException(status_code=404, detail="Attendance session not found")
+    check_schedule_owner(db, schedule_id, current_dosen_id(db, current_user))
+
+    now = time.time()
+    window = current_window(now)
+    return {
+        "success": True,
+        "data": {
+            "session_id": session_id,
+            "qr_token": make_rotating_token(session_id, now),
+            "window": window,
+            "period": QR_TOKEN_PERIOD,
+            "expires_in": round((window + 1) * QR_TOKEN_PERIOD - now, 3)
+        }
+    }
+
+
 # @router.post("/scan")
 # def scan_attendance(
 #     qr_token: str,
@@ -116,10 +217,16 @@ def get_attendance_sessions_by_schedule(
 @router.post("/scan")
 def scan_attendance(
     payload: AttendanceScanRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    pipeline: ScanPipeline = Depends(get_scan_pipeline)
 ):
+    """
+    Record a QR scan. The scan is validated against in-memory caches and acknowledged
+    right away; the attendance_record row is written by the pipeline's next micro-batch.
+    Scanning again returns the original scan with "duplicate": true.
+    """
     try:
-        attendance_record, attendance_session = record_attendance_from_qr(
+        scan, attendance_session, created = pipeline.record(
             db,
             payload.qr_token,
             payload.nim
@@ -127,14 +234,14 @@ def scan_attendance(
 
         return {
             "success": True,
-            "message": "Attendance recorded successfully",
+            "message": "Attendance recorded successfully" if created else "Attendance already recorded",
             "data": {
-                "attendance_record_id": attendance_record.id,
                 "attendance_session_id": attendance_session.id,
                 "schedule_id": attendance_session.schedule_id,
                 "session_number": attendance_session.session_number,
-                "nim": attendance_record.nim,
-                "scanned_at": attendance_record.scanned_at
+                "nim": scan["nim"],
+                "scanned_at": scan["scanned_at"],
+                "duplicate": not created
             }
         }
     except ValueError as e:
@@ -143,4 +250,37 @@ def scan_attendance(
         raise HTTPException(
             status_code=500,
             detail=f"An error occurred: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/sync")
+def sync_offline_attendance(
+    payload: AttendanceSyncRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(role_required(RoleEnum.DOSEN))
+):
+    """
+    Upload scans a lecturer's device collected offline, each with a qr_token or session_id,
+    the nim and scanned_at. Larger backlogs are uploaded in chunks of at most SYNC_MAX_SCANS.
+    Lecturers may only sync sessions of their own schedules.
+    """
+    if len(payload.scans) > SYNC_MAX_SCANS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload at most {SYNC_MAX_SCANS} scans per request; split larger uploads into chunks"
+        )
+
+    dosen_id = current_dosen_id(db, current_user)
+    try:
+        result = sync_offline_scans(db, payload.scans, dosen_id=dosen_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+    return {
+        "success": True,
+        "message": "Offline scans synchronized",
+        "data": result
+    }
@@ -0,0 +1,305 @@
+"""
+Write-behind pipeline for QR attendance scans
+
+At the start of a class, hundreds of scans arrive within seconds. Writing each one as its
+own transaction serializes them on the single SQLite writer. Instead:
+    • rotating tokens (attendance_system.qr_tokens) are verified by their HMAC alone, and
+      active sessions are cached in memory (one lookup per session, on its first scan);
+      stored qr_token values never expire, so they are refused
+    • every session keeps the NIMs already scanned with their scan time (seeded from the
+      database once), so a repeated scan returns the original without a query
+    • an accepted scan is appended to a local journal, fsynced, and acknowledged
+    • a background thread inserts the pending scans every SCAN_FLUSH_INTERVAL seconds
+      with one multi-row INSERT ... ON CONFLICT DO NOTHING and one commit, so a scan another
+      worker already wrote is skipped by the unique (attendance_session_id, nim) index
+The journal is truncated once everything in it is committed. Scans left in it by a crash
+are replayed by start(), skipping those already in the database.
+
+The caches live in the process: run a single worker, or one pipeline per session owner.
+They hold the SCAN_CACHE_SESSIONS most recently scanned sessions; a session is dropped
+when it is closed or written outside the pipeline, and the least recently scanned one when full.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, NamedTuple, Tuple, Any
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from attendance_system.qr_tokens import is_rotating_token, verify_rotating_token
+from attendance_system.attendance_matrix import invalidate_attendance_matrix
+from attendance_system.records import attendance_record_insert
+from pmb_system.database import SessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+SCAN_FLUSH_INTERVAL = 0.2  # seconds between micro-batches
+SCAN_JOURNAL_PATH = os.getenv("ATTENDANCE_SCAN_JOURNAL", "attendance_scans.journal")
+SCAN_CACHE_SESSIONS = 512  # sessions whose token and scanned NIMs are kept in memory
+
+
+class ActiveSession(NamedTuple):
+    id: int
+    schedule_id: int
+    session_number: int
+
+
+class ScanPipeline:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        journal_path: str = SCAN_JOURNAL_PATH,
+        flush_interval: float = SCAN_FLUSH_INTERVAL,
+        max_sessions: int = SCAN_CACHE_SESSIONS
+    ):
+        self._session_factory = session_factory
+        self._journal_path = journal_path
+        self._flush_interval = flush_interval
+        self._max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._sessions: "OrderedDict[int, ActiveSession]" = OrderedDict()  # least recently scanned first
+        self._schedule_of: Dict[int, int] = {}  # session_id -> schedule_id, for matrix invalidation
+        self._attended: Dict[int, Dict[str, datetime]] = {}  # session_id -> {nim: scanned_at}
+        self._pending: List[Dict[str, Any]] = []
+        self._journal = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # Active session cache
+
+    def _active_session(self, db: Session, qr_token: str) -> Optional[ActiveSession]:
+        if not is_rotating_token(qr_token):
+            return None
+        session_id = verify_rotating_token(qr_token)
+        with self._lock:
+            active = self._sessions.get(session_id)
+            if active is not None:
+                self._sessions.move_to_end(session_id)
+                return active
+        session = db.query(AttendanceSession).filter(
+            AttendanceSession.id == session_id,
+            AttendanceSession.is_active == True
+        ).first()
+
+        if session is None:
+            return None
+        active = ActiveSession(session.id, session.schedule_id, session.session_number)
+        with self._lock:
+            self._sessions[session.id] = active
+            self._schedule_of[session.id] = session.schedule_id
+            while len(self._sessions) > self._max_sessions:
+                self._drop(next(iter(self._sessions)))
+        return active
+
+    def _attended_nims(self, db: Session, session_id: int) -> Dict[str, datetime]:
+        attended = self._attended.get(session_id)
+        if attended is not None:
+            return attended
+
+        stored = db.query(AttendanceRecord.nim, AttendanceRecord.scanned_at).filter(
+            AttendanceRecord.attendance_session_id == session_id
+        ).all()
+        with self._lock:
+            # A session dropped meanwhile is not cached again
+            attended = self._attended.setdefault(session_id, {}) if session_id in self._sessions else {}
+            for nim, scanned_at in stored:
+                attended.setdefault(nim, scanned_at)
+            for scan in self._pending:
+                if scan["attendance_session_id"] == session_id:
+                    attended.setdefault(scan["nim"], scan["scanned_at"])
+        return attended
+
+    def _drop(self, session_id: int) -> None:
+        """Called with self._lock held"""
+        self._sessions.pop(session_id, None)
+        self._attended.pop(session_id, None)
+        # Pending scans of the session still need its schedule when they are flushed
+        if not any(scan["attendance_session_id"] == session_id for scan in self._pending):
+            self._schedule_of.pop(session_id, None)
+
+    def forget_session(self, session_id: int) -> None:
+        """Drop a session from the caches after it was deactivated or written outside the pipeline"""
+        with self._lock:
+            self._drop(session_id)
+
+    # Scans
+
+    def record(self, db: Session, qr_token: str, nim: str) -> Tuple[Dict[str, Any], ActiveSession, bool]:
+        """
+        Accept a scan; it is written to the database by the next flush
+
+        Args:
+            db: Session used only when the token or its session is not cached yet
+
+        Returns:
+            (scan {"attendance_session_id", "nim", "scanned_at"}, session, created); a student
+            who already attended gets the original scan with created False
+
+        Raises:
+            ValueError: Unknown, expired or stored (non-rotating) token, or inactive session
+        """
+        active = self._active_session(db, qr_token)
+        if active is None:
+            raise ValueError("Invalid or inactive QR token")
+        attended = self._attended_nims(db, active.id)
+
+        with self._lock:
+            if nim in attended:
+                return {"attendance_session_id": active.id, "nim": nim, "scanned_at": attended[nim]}, active, False
+            scan = {
+                "attendance_session_id": active.id,
+                "nim": nim,
+                "scanned_at": datetime.now(timezone.utc)
+            }
+            self._append_journal([scan])
+            attended[nim] = scan["scanned_at"]
+            self._pending.append(scan)
+
+        if not self.running:
+            # No background writer (scripts, tests): write through
+            self.flush()
+        return scan, active, True
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Insert the pending scans with one statement; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if not batch:
+                    return 0
+                session_ids = {scan["attendance_session_id"] for scan in batch}
+                schedule_ids = {self._schedule_of[i] for i in session_ids if i in self._schedule_of}
+
+            db = self._session_factory()
+            try:
+                db.execute(attendance_record_insert(db), batch)
+                db.commit()
+                invalidate_attendance_matrix(db, schedule_ids)
+            except Exception:
+                db.rollback()
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            finally:
+                db.close()
+
+            with self._lock:
+                pending_ids = {scan["attendance_session_id"] for scan in self._pending}
+                for session_id in session_ids - pending_ids:
+                    if session_id not in self._sessions:
+                        # Dropped while its scans were pending
+                        self._schedule_of.pop(session_id, None)
+                if not self._pending:
+                    self._truncate_journal()
+            return len(batch)
+
+    # Journal
+
+    def _append_journal(self, scans: List[Dict[str, Any]]) -> None:
+        """Called with self._lock held"""
+        if self._journal is None:
+            self._journal = open(self._journal_path, "a", encoding="utf-8")
+        for scan in scans:
+            self._journal.write(json.dumps({**scan, "scanned_at": scan["scanned_at"].isoformat()}) + "\n")
+        self._journal.flush()
+        # The scan is acknowledged once this returns: it must survive a power loss
+        os.fsync(self._journal.fileno())
+
+    def _truncate_journal(self) -> None:
+        """Called with self._lock held, when every journaled scan is committed"""
+        if self._journal is not None:
+            self._journal.truncate(0)
+
+    def replay(self) -> int:
+        """Write the scans a previous process journaled but did not commit; returns the number written"""
+        if not os.path.exists(self._journal_path):
+            return 0
+        with open(self._journal_path, encoding="utf-8") as journal:
+            scans = {}
+            for line in journal:
+                if not line.strip():
+                    continue
+                try:
+                    scan = json.loads(line)
+                except ValueError:
+                    # A line cut short by the crash
+                    continue
+                scans.setdefault((scan["attendance_session_id"], scan["nim"]), scan)
+
+        written = 0
+        if scans:
+            db = self._session_factory()
+            try:
+                stored = set(db.query(AttendanceRecord.attendance_session_id, AttendanceRecord.nim).filter(
+                    tuple_(AttendanceRecord.attendance_session_id, AttendanceRecord.nim).in_(list(scans))
+                ).all())
+                missing = [
+                    {**scan, "scanned_at": datetime.fromisoformat(scan["scanned_at"])}
+                    for key, scan in scans.items() if key not in stored
+                ]
+                if missing:
+                    db.execute(attendance_record_insert(db), missing)
+                    db.commit()
+                written = len(missing)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+        open(self._journal_path, "w").close()
+        return written
+
+    # Background writer
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Attendance scan flush failed; retrying with the next batch")
+
+    def start(self) -> None:
+        """Replay the journal and start the background writer"""
+        if self.running:
+            return
+        replayed = self.replay()
+        if replayed:
+            logger.info("Replayed %d journaled attendance scan(s)", replayed)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="attendance-scan-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background writer after a last flush"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+
+scan_pipeline = ScanPipeline()
+
+
+def get_scan_pipeline() -> ScanPipeline:
+    return scan_pipeline
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 
@@ -45,4 +45,15 @@ class AttendanceRecord(AttendanceRecordBase):
 
 class AttendanceScanRequest(BaseModel):
     qr_token: str
-    nim: str
\ No newline at end of file
+    nim: str
+
+
+class AttendanceSyncScan(BaseModel):
+    qr_token: Optional[str] = None
+    session_id: Optional[int] = None
+    nim: str
+    scanned_at: datetime
+
+
+class AttendanceSyncRequest(BaseModel):
+    scans: List[AttendanceSyncScan]
@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, insert
 from attendance_system.models import AttendanceSession, AttendanceRecord
 from attendance_system.schemas import AttendanceSessionCreate, AttendanceSessionUpdate, AttendanceRecordCreate
-from typing import Optional
+from attendance_system.scan_pipeline import scan_pipeline
+from attendance_system.attendance_matrix import invalidate_attendance_matrix
+from attendance_system.records import insert_attendance_record
+from schedule_system.models import JadwalKelas
+from typing import Optional, List, Dict, Any
 import uuid
 import secrets
 import string
@@ -31,6 +35,8 @@ def create_or_update_attendance_session(db: Session, schedule_id: int, session_n
         existing_session.is_active = True
         db.commit()
         db.refresh(existing_session)
+        # The previous token must stop working
+        scan_pipeline.forget_session(existing_session.id)
         return existing_session
     else:
         # Create new session
@@ -44,9 +50,83 @@ def create_or_update_attendance_session(db: Session, schedule_id: int, session_n
         db.add(db_attendance_session)
         db.commit()
         db.refresh(db_attendance_session)
+        # A new session is a new column of the schedule's attendance matrix
+        invalidate_attendance_matrix(db, [schedule_id])
         return db_attendance_session
 
 
+def create_attendance_sessions_bulk(
+    db: Session,
+    schedule_ids: Optional[List[int]] = None,
+    semester: Optional[str] = None,
+    session_numbers: Optional[List[int]] = None,
+    is_active: bool = False,
+    dosen_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Create the missing sessions (1-16 by default) of many schedules with one bulk insert and one commit
+
+    Existing sessions are left as they are, token included. Schedules are the given ids or every
+    schedule of the semester; with dosen_id, only that lecturer's schedules. Stored tokens are
+    not returned: scans only take the rotating code of GET /session/{id}/qr.
+
+    Returns:
+        {"schedules", "created", "existing", "sessions": [{"id", ..., "created"}]}
+    """
+    if not schedule_ids and not semester:
+        raise ValueError("Provide schedule_ids or semester")
+    session_numbers = sorted(set(session_numbers or range(1, 17)))
+    if not all(1 <= number <= 16 for number in session_numbers):
+        raise ValueError("Session number must be between 1 and 16")
+
+    query = db.query(JadwalKelas.id)
+    if schedule_ids:
+        query = query.filter(JadwalKelas.id.in_(schedule_ids))
+    if semester:
+        query = query.filter(JadwalKelas.semester == semester)
+    if dosen_id is not None:
+        query = query.filter(JadwalKelas.dosen_id == dosen_id)
+    found = sorted(schedule_id for (schedule_id,) in query.all())
+    if schedule_ids:
+        missing = sorted(set(schedule_ids) - set(found))
+        if missing:
+            raise ValueError(f"Schedule not found: {', '.join(map(str, missing))}")
+
+    columns = (
+        AttendanceSession.id, AttendanceSession.schedule_id, AttendanceSession.session_number,
+        AttendanceSession.is_active, AttendanceSession.created_at
+    )
+    existing = db.query(*columns).filter(
+        AttendanceSession.schedule_id.in_(found),
+        AttendanceSession.session_number.in_(session_numbers)
+    ).all() if found else []
+    taken = {(row.schedule_id, row.session_number) for row in existing}
+
+    new_sessions = [
+        {"schedule_id": schedule_id, "session_number": number, "qr_token": generate_qr_token(), "is_active": is_active}
+        for schedule_id in found for number in session_numbers
+        if (schedule_id, number) not in taken
+    ]
+    created = []
+    if new_sessions:
+        # executemany with RETURNING: batched multi-row INSERTs in a single transaction
+        created = db.execute(insert(AttendanceSession).returning(*columns), new_sessions).all()
+        db.commit()
+        invalidate_attendance_matrix(db, {row.schedule_id for row in created})
+
+    sessions = [
+        {**row._asdict(), "created": was_created}
+        for rows, was_created in ((existing, False), (created, True)) for row in rows
+    ]
+    sessions.sort(key=lambda session: (session["schedule_id"], session["session_number"]))
+    return {
+        "schedules": len(found),
+        "created": len(created),
+        "existing": len(existing),
+        "sessions": sessions
+    }
+
+
 def get_attendance_session_by_qr_token(db: Session, qr_token: str):
     """Get attendance session by QR token"""
     return db.query(AttendanceSession).filter(
@@ -66,6 +146,7 @@ def update_attendance_session(db: Session, session_id: int, attendance_session_u
             db_session.is_active = attendance_session_update.is_active
         db.commit()
         db.refresh(db_session)
+        scan_pipeline.forget_session(db_session.id)
     return db_session
 
 
@@ -74,26 +155,27 @@ def delete_attendance_session(db: Session, session_id: int):
     if db_session:
         db.delete(db_session)
         db.commit()
+        scan_pipeline.forget_session(session_id)
+        invalidate_attendance_matrix(db, [db_session.schedule_id])
     return db_session
 
 
 def create_attendance_record(db: Session, attendance_record: AttendanceRecordCreate):
-    # Check if attendance record already exists for this session and student
-    existing_record = db.query(AttendanceRecord).filter(
-        AttendanceRecord.attendance_session_id == attendance_record.attendance_session_id,
-        AttendanceRecord.nim == attendance_record.nim
-    ).first()
-
-    if existing_record:
-        raise ValueError("Student has already attended this session")
-
-    db_attendance_record = AttendanceRecord(
-        attendance_session_id=attendance_record.attendance_session_id,
-        nim=attendance_record.nim
+    """Record attendance; a student already recorded for the session gets the original record back"""
+    db_attendance_record, created = insert_attendance_record(
+        db,
+        attendance_record.attendance_session_id,
+        attendance_record.nim
     )
-    db.add(db_attendance_record)
+    # Keep the returned values loaded: the commit would expire them
+    db.expunge(db_attendance_record)
     db.commit()
-    db.refresh(db_attendance_record)
+    if created:
+        # The pipeline's cached NIMs of this session are stale now
+        scan_pipeline.forget_session(attendance_record.attendance_session_id)
+        attendance_session = get_attendance_session(db, attendance_record.attendance_session_id)
+        if attendance_session:
+            invalidate_attendance_matrix(db, [attendance_session.schedule_id])
     return db_attendance_record
 
 
@@ -116,23 +198,12 @@ def record_attendance_from_qr(db: Session, qr_token: str, nim: str):
     if not attendance_session:
         raise ValueError("Invalid or inactive QR token")
 
-    # Check if student has already attended this session
-    existing_record = get_attendance_record_by_session_and_nim(
-        db,
-        attendance_session.id,
-        nim
-    )
-
-    if existing_record:
-        raise ValueError("Student has already attended this session")
-
-    # Create attendance record
-    attendance_record = AttendanceRecord(
-        attendance_session_id=attendance_session.id,
-        nim=nim
-    )
-    db.add(attendance_record)
+    # One INSERT ... ON CONFLICT DO NOTHING; a repeated scan returns the original record
+    attendance_record, created = insert_attendance_record(db, attendance_session.id, nim)
+    db.expunge(attendance_record)
     db.commit()
-    db.refresh(attendance_record)
+    if created:
+        scan_pipeline.forget_session(attendance_session.id)
+        invalidate_attendance_matrix(db, [attendance_session.schedule_id])
 
-    return attendance_record, attendance_session
\ No newline at end of file
+    return attendance_record, attendance_session
@@ -29,10 +29,12 @@ def create_grades_tables():
     CREATE TABLE IF NOT EXISTS grade_history (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         grade_id INTEGER NOT NULL,
+        nim VARCHAR(20),
+        matakuliah_id INTEGER,
         old_value VARCHAR(50) NOT NULL,
         new_value VARCHAR(50) NOT NULL,
         changed_by VARCHAR(255) NOT NULL,
-        changed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        changed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
         reason TEXT
     );
     """
@@ -53,6 +55,14 @@ def create_grades_tables():
     add_history_fk = """
     CREATE INDEX IF NOT EXISTS idx_grade_history_grade_id ON grade_history(grade_id);
     """
+
+    # Audit trail lookups: by user, grade, course or student over time
+    add_history_audit_indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_grade_history_changed_by_at ON grade_history(changed_by, changed_at);",
+        "CREATE INDEX IF NOT EXISTS idx_grade_history_grade_at ON grade_history(grade_id, changed_at);",
+        "CREATE INDEX IF NOT EXISTS idx_grade_history_matakuliah_at ON grade_history(matakuliah_id, changed_at);",
+        "CREATE INDEX IF NOT EXISTS idx_grade_history_nim_at ON grade_history(nim, changed_at);",
+    ]
     
     with engine.connect() as conn:
         # Create tables
@@ -64,6 +74,8 @@ def create_grades_tables():
         conn.execute(text(add_grades_fk_matakuliah))
         conn.execute(text(add_grades_fk_dosen))
         conn.execute(text(add_history_fk))
+        for index_sql in add_history_audit_indexes:
+            conn.execute(text(index_sql))
         
         # Commit the transaction
         conn.commit()
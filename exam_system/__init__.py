@@ -0,0 +1,5 @@
+# Exam Timetable System Package
+from exam_system.models import JadwalUjian
+from exam_system.router import router
+
+__all__ = ["JadwalUjian", "router"]
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from pmb_system.database import Base
+
+
+class JadwalUjian(Base):
+    """One room allocation of a course exam; a large course spans several rows of the same periode"""
+    __tablename__ = "jadwal_ujian"
+
+    id = Column(Integer, primary_key=True, index=True)
+    semester = Column(String(20), nullable=False)  # Academic semester (e.g., "2023/2024-1")
+    jenis_ujian = Column(String(10), nullable=False)  # UTS or UAS
+    matakuliah_id = Column(Integer, nullable=False)  # Foreign key reference as integer without constraint
+    kode_mk = Column(String(10), nullable=False)
+    periode = Column(Integer, nullable=False)  # Exam period number, 1-based
+    ruang_id = Column(Integer, nullable=True)  # Null when no room is large enough
+    jumlah_peserta = Column(Integer, nullable=False)  # Students seated in this room
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('idx_jadwal_ujian_semester_jenis', 'semester', 'jenis_ujian'),
+    )
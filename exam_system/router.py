@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+from pmb_system.database import get_db
+from exam_system.schemas import ExamTimetableGenerateRequest, ExamTimetableResponse, JadwalUjianResponse
+from exam_system.services import generate_exam_timetable, get_exam_timetable
+
+
+router = APIRouter(prefix="/api/exam", tags=["exam"])
+
+
+@router.post("/timetable/generate", response_model=ExamTimetableResponse)
+def generate_timetable(
+    payload: ExamTimetableGenerateRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Generate the UTS/UAS timetable of a semester from approved KRS.
+    Courses sharing a student never share a period unless max_periods forces it.
+    """
+    try:
+        result = generate_exam_timetable(payload.semester, payload.jenis_ujian, db, payload.max_periods)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return ExamTimetableResponse(semester=payload.semester, jenis_ujian=payload.jenis_ujian, **result)
+
+
+@router.get("/timetable", response_model=List[JadwalUjianResponse])
+def read_timetable(
+    semester: str,
+    jenis_ujian: str = "UAS",
+    db: Session = Depends(get_db)
+):
+    """
+    Get the stored exam timetable of a semester, one row per course and room
+    """
+    return get_exam_timetable(semester, jenis_ujian, db)
@@ -0,0 +1,44 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+
+class ExamTimetableGenerateRequest(BaseModel):
+    semester: str
+    jenis_ujian: str = "UAS"  # UTS or UAS
+    max_periods: Optional[int] = None  # None: as many periods as needed for a clash-free timetable
+
+
+class ExamRoomAllocation(BaseModel):
+    ruang_id: Optional[int] = None  # None when the students could not be seated
+    jumlah: int
+
+
+class ExamCourseSlot(BaseModel):
+    matakuliah_id: int
+    kode_mk: str
+    nama: Optional[str] = None
+    periode: int
+    peserta: int
+    ruang: List[ExamRoomAllocation]
+
+
+class ExamTimetableResponse(BaseModel):
+    semester: str
+    jenis_ujian: str
+    periods: int
+    clashes: int  # Student-exam clashes left when max_periods is too tight
+    courses: List[ExamCourseSlot]
+
+
+class JadwalUjianResponse(BaseModel):
+    id: int
+    semester: str
+    jenis_ujian: str
+    matakuliah_id: int
+    kode_mk: str
+    periode: int
+    ruang_id: Optional[int] = None
+    jumlah_peserta: int
+
+    class Config:
+        from_attributes = True
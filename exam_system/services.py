@@ -0,0 +1,314 @@
+"""
+Exam timetable generation
+
+Courses are vertices of a conflict graph; two courses are adjacent when at least one
+student took both in an approved KRS. Edge weights (shared students) come from sparse
+co-occurrence counting over each student's course list, so the work grows with the
+number of enrolments, not with courses squared.
+
+The graph is colored into exam periods with DSatur. A period can only take a course
+while it still has enough seats (sum of Ruang.kapasitas) left. When the number of
+periods is capped and DSatur cannot find a clash-free period, the course goes to the
+period with the fewest shared students, and a min-conflicts repair pass then moves
+clashing courses to better periods. Finally rooms are packed per period, largest
+course first, taking the smallest room that fits or splitting over the largest rooms;
+seats a course leaves free in a room can be used by the next course.
+"""
+import heapq
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from exam_system.models import JadwalUjian
+
+
+JENIS_UJIAN = ("UTS", "UAS")
+REPAIR_ROUNDS = 10  # Repair moves allowed per course
+
+
+def build_conflict_graph(student_courses: Dict[str, List[int]]) -> Dict[int, Counter]:
+    """
+    Sparse course-conflict graph
+
+    Args:
+        student_courses: {nim: [matakuliah_id, ...]}
+
+    Returns:
+        {matakuliah_id: Counter({neighbour_id: shared students})}; every course appears as a key
+    """
+    graph: Dict[int, Counter] = {}
+    for courses in student_courses.values():
+        courses = sorted(set(courses))
+        for course_id in courses:
+            graph.setdefault(course_id, Counter())
+        for i, a in enumerate(courses):
+            neighbours_a = graph[a]
+            for b in courses[i + 1:]:
+                neighbours_a[b] += 1
+                graph[b][a] += 1
+    return graph
+
+
+def _period_conflict(graph: Dict[int, Counter], colors: Dict[int, int], course_id: int, period: int) -> int:
+    """Students of course_id that already sit another exam in the period"""
+    return sum(weight for other, weight in graph[course_id].items() if colors.get(other) == period)
+
+
+def color_conflict_graph(
+    graph: Dict[int, Counter],
+    sizes: Dict[int, int],
+    seats_per_period: int,
+    max_periods: Optional[int] = None
+) -> Dict[int, int]:
+    """
+    Assign an exam period (0-based) to every course
+
+    Args:
+        graph: Conflict graph from build_conflict_graph
+        sizes: {matakuliah_id: number of students}
+        seats_per_period: Total seats available in one period
+        max_periods: Cap on the number of periods, None for as many as needed
+
+    Returns:
+        {matakuliah_id: period}
+    """
+    colors: Dict[int, int] = {}
+    neighbour_colors: Dict[int, set] = {course_id: set() for course_id in graph}
+    seats_used: List[int] = []
+
+    def fits(course_id: int, period: int) -> bool:
+        # A course larger than every room together still gets a period of its own
+        return seats_used[period] == 0 or seats_used[period] + sizes[course_id] <= seats_per_period
+
+    heap = [(0, -len(graph[c]), -sizes[c], c) for c in graph]
+    heapq.heapify(heap)
+    while heap:
+        neg_saturation, _, _, course_id = heapq.heappop(heap)
+        if course_id in colors or -neg_saturation != len(neighbour_colors[course_id]):
+            continue  # Already colored or a stale heap entry
+
+        blocked = neighbour_colors[course_id]
+        period = next(
+            (p for p in range(len(seats_used)) if p not in blocked and fits(course_id, p)), None
+        )
+        if period is None:
+            if max_periods is None or len(seats_used) < max_periods:
+                period = len(seats_used)
+                seats_used.append(0)
+            else:
+                # No clash-free period left: take the least clashing one, repaired below
+                candidates = [p for p in range(len(seats_used)) if fits(course_id, p)] or range(len(seats_used))
+                period = min(candidates, key=lambda p: (_period_conflict(graph, colors, course_id, p), seats_used[p]))
+
+        colors[course_id] = period
+        seats_used[period] += sizes[course_id]
+        for neighbour in graph[course_id]:
+            if neighbour not in colors and period not in neighbour_colors[neighbour]:
+                neighbour_colors[neighbour].add(period)
+                heapq.heappush(
+                    heap,
+                    (-len(neighbour_colors[neighbour]), -len(graph[neighbour]), -sizes[neighbour], neighbour)
+                )
+
+    if max_periods is not None:
+        _repair(graph, sizes, colors, seats_used, seats_per_period)
+    return colors
+
+
+def _repair(
+    graph: Dict[int, Counter],
+    sizes: Dict[int, int],
+    colors: Dict[int, int],
+    seats_used: List[int],
+    seats_per_period: int
+) -> None:
+    """Min-conflicts local search: move clashing courses to the period that clashes least"""
+    conflict = {c: _period_conflict(graph, colors, c, colors[c]) for c in colors}
+    last_moved: Dict[int, int] = {}
+    for step in range(REPAIR_ROUNDS * len(colors)):
+        moved = False
+        # Most clashing course first; a course moved in the previous step is skipped
+        for course_id in sorted((c for c in conflict if conflict[c] > 0), key=lambda c: (-conflict[c], c)):
+            if last_moved.get(course_id) == step - 1:
+                continue
+            by_period = Counter()
+            for neighbour, weight in graph[course_id].items():
+                by_period[colors[neighbour]] += weight
+            current = colors[course_id]
+            best_period, best_conflict = None, conflict[course_id]
+            for period in range(len(seats_used)):
+                if period == current or seats_used[period] + sizes[course_id] > seats_per_period:
+                    continue
+                if by_period[period] < best_conflict:
+                    best_period, best_conflict = period, by_period[period]
+            if best_period is None:
+                continue
+
+            for neighbour, weight in graph[course_id].items():
+                if colors[neighbour] == current:
+                    conflict[neighbour] -= weight
+                elif colors[neighbour] == best_period:
+                    conflict[neighbour] += weight
+            seats_used[current] -= sizes[course_id]
+            seats_used[best_period] += sizes[course_id]
+            colors[course_id] = best_period
+            conflict[course_id] = best_conflict
+            last_moved[course_id] = step
+            moved = True
+            break
+        if not moved:
+            return
+
+
+def pack_rooms(period_courses: List[Tuple[int, int]], rooms: List[Tuple[int, int]]) -> Dict[int, List[Tuple[Optional[int], int]]]:
+    """
+    Seat the courses of one period in rooms
+
+    Args:
+        period_courses: [(matakuliah_id, students)]
+        rooms: [(ruang_id, kapasitas)]
+
+    Returns:
+        {matakuliah_id: [(ruang_id, seated)]}; students left without a seat get ruang_id None
+    """
+    free = sorted(rooms, key=lambda r: (r[1], r[0]))
+    allocation: Dict[int, List[Tuple[Optional[int], int]]] = {}
+    for course_id, students in sorted(period_courses, key=lambda c: (-c[1], c[0])):
+        allocation[course_id] = []
+        remaining = students
+        while remaining > 0 and free:
+            # Smallest room that takes everyone left, otherwise the largest room
+            index = next((i for i, room in enumerate(free) if room[1] >= remaining), len(free) - 1)
+            ruang_id, kapasitas = free.pop(index)
+            seated = min(kapasitas, remaining)
+            allocation[course_id].append((ruang_id, seated))
+            remaining -= seated
+            if kapasitas > seated:
+                # Exams share rooms: the seats left over go back to the pool
+                free.append((ruang_id, kapasitas - seated))
+                free.sort(key=lambda r: (r[1], r[0]))
+        if remaining > 0:
+            allocation[course_id].append((None, remaining))
+    return allocation
+
+
+def generate_exam_timetable(
+    semester: str,
+    jenis_ujian: str,
+    db: Session,
+    max_periods: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Generate and store the exam timetable of a semester
+
+    Replaces any timetable stored earlier for the same semester and jenis_ujian.
+
+    Args:
+        semester: Academic semester (e.g. "2023/2024-1")
+        jenis_ujian: UTS or UAS
+        db: Database session
+        max_periods: Cap on the number of exam periods, None for as many as needed
+
+    Returns:
+        {"periods": int, "clashes": int, "courses": [{"matakuliah_id", "kode_mk", "nama",
+         "periode", "peserta", "ruang": [{"ruang_id", "jumlah"}]}]}
+    """
+    from krs_system.enums import KRSStatusEnum
+    from krs_system.models import KRS, KRSDetail, Matakuliah
+    from schedule_system.models import Ruang
+    from schedule_system.database import commit_with_retry
+
+    if jenis_ujian not in JENIS_UJIAN:
+        raise ValueError(f"jenis_ujian must be one of {', '.join(JENIS_UJIAN)}")
+    if max_periods is not None and max_periods < 1:
+        raise ValueError("max_periods must be at least 1")
+
+    student_courses: Dict[str, List[int]] = {}
+    for nim, matakuliah_id in db.query(KRS.nim, KRSDetail.matakuliah_id).join(
+        KRSDetail, KRSDetail.krs_id == KRS.id
+    ).filter(
+        KRS.semester == semester,
+        KRS.status == KRSStatusEnum.APPROVED
+    ).all():
+        student_courses.setdefault(nim, []).append(matakuliah_id)
+    if not student_courses:
+        raise ValueError(f"No approved KRS found for semester {semester}")
+
+    rooms = [(r.id, r.kapasitas) for r in db.query(Ruang.id, Ruang.kapasitas).all() if r.kapasitas]
+    if not rooms:
+        raise ValueError("No rooms available for exams")
+
+    graph = build_conflict_graph(student_courses)
+    sizes: Counter = Counter()
+    for courses in student_courses.values():
+        sizes.update(set(courses))
+
+    colors = color_conflict_graph(graph, sizes, sum(kapasitas for _, kapasitas in rooms), max_periods)
+
+    period_courses: Dict[int, List[Tuple[int, int]]] = {}
+    for course_id, period in colors.items():
+        period_courses.setdefault(period, []).append((course_id, sizes[course_id]))
+    allocation = {}
+    for courses in period_courses.values():
+        allocation.update(pack_rooms(courses, rooms))
+
+    matakuliah = {
+        m.id: m for m in db.query(Matakuliah.id, Matakuliah.kode, Matakuliah.nama).filter(
+            Matakuliah.id.in_(list(colors))
+        ).all()
+    }
+
+    courses = []
+    rows = []
+    for course_id in sorted(colors, key=lambda c: (colors[c], c)):
+        periode = colors[course_id] + 1
+        course = matakuliah.get(course_id)
+        kode_mk = course.kode if course else str(course_id)
+        courses.append({
+            'matakuliah_id': course_id,
+            'kode_mk': kode_mk,
+            'nama': course.nama if course else None,
+            'periode': periode,
+            'peserta': sizes[course_id],
+            'ruang': [{'ruang_id': ruang_id, 'jumlah': seated} for ruang_id, seated in allocation[course_id]]
+        })
+        rows.extend({
+            'semester': semester,
+            'jenis_ujian': jenis_ujian,
+            'matakuliah_id': course_id,
+            'kode_mk': kode_mk,
+            'periode': periode,
+            'ruang_id': ruang_id,
+            'jumlah_peserta': seated
+        } for ruang_id, seated in allocation[course_id])
+
+    clashes = sum(
+        weight for course_id, neighbours in graph.items()
+        for other, weight in neighbours.items()
+        if course_id < other and colors[course_id] == colors[other]
+    )
+
+    try:
+        db.query(JadwalUjian).filter(
+            JadwalUjian.semester == semester,
+            JadwalUjian.jenis_ujian == jenis_ujian
+        ).delete(synchronize_session=False)
+        db.execute(insert(JadwalUjian), rows)
+        commit_with_retry(db)
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        'periods': len(period_courses),
+        'clashes': clashes,
+        'courses': courses
+    }
+
+
+def get_exam_timetable(semester: str, jenis_ujian: str, db: Session) -> List[JadwalUjian]:
+    """Stored exam timetable ordered by period and course"""
+    return db.query(JadwalUjian).filter(
+        JadwalUjian.semester == semester,
+        JadwalUjian.jenis_ujian == jenis_ujian
+    ).order_by(JadwalUjian.periode, JadwalUjian.kode_mk, JadwalUjian.id).all()
@@ -0,0 +1,54 @@
+"""Create student_gpa_summary and student_best_grade tables
+
+Revision ID: 002_add_student_gpa_summary
+Revises: 001_initial_grades
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '002_add_student_gpa_summary'
+down_revision = '001_initial_grades'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create student_gpa_summary table
+    op.create_table(
+        'student_gpa_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nim', sa.String(length=20), nullable=False),
+        sa.Column('semester', sa.String(length=20), nullable=False),
+        sa.Column('total_mutu', sa.Float(), nullable=False),
+        sa.Column('total_sks', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nim', 'semester', name='uq_student_gpa_summary_nim_semester')
+    )
+    op.create_index(op.f('ix_student_gpa_summary_id'), 'student_gpa_summary', ['id'], unique=False)
+
+    # Create student_best_grade table
+    op.create_table(
+        'student_best_grade',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nim', sa.String(length=20), nullable=False),
+        sa.Column('matakuliah_id', sa.Integer(), nullable=False),
+        sa.Column('grade_id', sa.Integer(), nullable=False),
+        sa.Column('nilai_angka', sa.Float(), nullable=False),
+        sa.Column('sks', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nim', 'matakuliah_id', name='uq_student_best_grade_nim_matakuliah')
+    )
+    op.create_index(op.f('ix_student_best_grade_id'), 'student_best_grade', ['id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_student_best_grade_id'), table_name='student_best_grade')
+    op.drop_table('student_best_grade')
+
+    op.drop_index(op.f('ix_student_gpa_summary_id'), table_name='student_gpa_summary')
+    op.drop_table('student_gpa_summary')
@@ -0,0 +1,56 @@
+"""Create course_grade_stats table and fill it from grades
+
+Revision ID: 003_add_course_grade_stats
+Revises: 002_add_student_gpa_summary
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003_add_course_grade_stats'
+down_revision = '002_add_student_gpa_summary'
+branch_labels = None
+depends_on = None
+
+LETTERS = ('a', 'b', 'c', 'd', 'e')
+
+
+def upgrade():
+    # Create course_grade_stats table
+    op.create_table(
+        'course_grade_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('matakuliah_id', sa.Integer(), nullable=False),
+        sa.Column('semester', sa.String(length=20), nullable=False),
+        sa.Column('dosen_id', sa.Integer(), nullable=False),
+        *[sa.Column(f'count_{letter}', sa.Integer(), nullable=False) for letter in LETTERS],
+        sa.Column('total_nilai', sa.Float(), nullable=False),
+        *[sa.Column(f'presensi_{letter}', sa.Float(), nullable=False) for letter in LETTERS],
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('matakuliah_id', 'semester', 'dosen_id', name='uq_course_grade_stats_course_semester_dosen')
+    )
+    op.create_index(op.f('ix_course_grade_stats_id'), 'course_grade_stats', ['id'], unique=False)
+
+    # Backfill from the existing grades in one INSERT ... SELECT
+    counts = ', '.join(f'count_{letter}' for letter in LETTERS)
+    presensi = ', '.join(f'presensi_{letter}' for letter in LETTERS)
+    count_sums = ', '.join(
+        f"SUM(CASE WHEN nilai_huruf = '{letter.upper()}' THEN 1 ELSE 0 END)" for letter in LETTERS
+    )
+    presensi_sums = ', '.join(
+        f"SUM(CASE WHEN nilai_huruf = '{letter.upper()}' THEN COALESCE(presensi, 0) ELSE 0 END)" for letter in LETTERS
+    )
+    op.execute(
+        f"INSERT INTO course_grade_stats (matakuliah_id, semester, dosen_id, {counts}, total_nilai, {presensi}) "
+        f"SELECT matakuliah_id, semester, dosen_id, {count_sums}, SUM(nilai_angka), {presensi_sums} "
+        f"FROM grades GROUP BY matakuliah_id, semester, dosen_id"
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_course_grade_stats_id'), table_name='course_grade_stats')
+    op.drop_table('course_grade_stats')
@@ -0,0 +1,48 @@
+"""Create academic_warning table
+
+Revision ID: 004_add_academic_warning
+Revises: 003_add_course_grade_stats
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_add_academic_warning'
+down_revision = '003_add_course_grade_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create academic_warning table
+    op.create_table(
+        'academic_warning',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nim', sa.String(length=20), nullable=False),
+        sa.Column('semester', sa.String(length=20), nullable=False),
+        sa.Column('dosen_pa_id', sa.Integer(), nullable=True),
+        sa.Column('ips', sa.Float(), nullable=False),
+        sa.Column('previous_ips', sa.Float(), nullable=True),
+        sa.Column('ips_drop', sa.Float(), nullable=False),
+        sa.Column('sks_lulus', sa.Integer(), nullable=False),
+        sa.Column('sks_shortfall', sa.Integer(), nullable=False),
+        sa.Column('e_count', sa.Integer(), nullable=False),
+        sa.Column('flags', sa.String(length=100), nullable=False),
+        sa.Column('severity', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('semester', 'nim', name='uq_academic_warning_semester_nim')
+    )
+    op.create_index(op.f('ix_academic_warning_id'), 'academic_warning', ['id'], unique=False)
+    op.create_index('idx_academic_warning_semester_severity', 'academic_warning', ['semester', 'severity'], unique=False)
+    op.create_index('idx_academic_warning_dosen_pa', 'academic_warning', ['dosen_pa_id', 'semester'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_academic_warning_dosen_pa', table_name='academic_warning')
+    op.drop_index('idx_academic_warning_semester_severity', table_name='academic_warning')
+    op.drop_index(op.f('ix_academic_warning_id'), table_name='academic_warning')
+    op.drop_table('academic_warning')
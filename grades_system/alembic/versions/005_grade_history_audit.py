@@ -0,0 +1,44 @@
+"""Denormalize nim/matakuliah_id onto grade_history and add audit indexes
+
+Revision ID: 005_grade_history_audit
+Revises: 004_add_academic_warning
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_grade_history_audit'
+down_revision = '004_add_academic_warning'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('grade_history', sa.Column('nim', sa.String(length=20), nullable=True))
+    op.add_column('grade_history', sa.Column('matakuliah_id', sa.Integer(), nullable=True))
+
+    # Backfill from the grades the history rows belong to
+    op.execute(
+        "UPDATE grade_history SET "
+        "nim = (SELECT grades.nim FROM grades WHERE grades.id = grade_history.grade_id), "
+        "matakuliah_id = (SELECT grades.matakuliah_id FROM grades WHERE grades.id = grade_history.grade_id)"
+    )
+
+    op.create_index('idx_grade_history_changed_by_at', 'grade_history', ['changed_by', 'changed_at'], unique=False)
+    op.create_index('idx_grade_history_grade_at', 'grade_history', ['grade_id', 'changed_at'], unique=False)
+    op.create_index('idx_grade_history_matakuliah_at', 'grade_history', ['matakuliah_id', 'changed_at'], unique=False)
+    op.create_index('idx_grade_history_nim_at', 'grade_history', ['nim', 'changed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_grade_history_nim_at', table_name='grade_history')
+    op.drop_index('idx_grade_history_matakuliah_at', table_name='grade_history')
+    op.drop_index('idx_grade_history_grade_at', table_name='grade_history')
+    op.drop_index('idx_grade_history_changed_by_at', table_name='grade_history')
+
+    with op.batch_alter_table('grade_history') as batch_op:
+        batch_op.drop_column('matakuliah_id')
+        batch_op.drop_column('nim')
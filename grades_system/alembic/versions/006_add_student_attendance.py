@@ -0,0 +1,41 @@
+"""Create student_attendance table
+
+Revision ID: 006_add_student_attendance
+Revises: 005_grade_history_audit
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_add_student_attendance'
+down_revision = '005_grade_history_audit'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create student_attendance table; filled by the nightly presensi sync
+    op.create_table(
+        'student_attendance',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nim', sa.String(length=20), nullable=False),
+        sa.Column('matakuliah_id', sa.Integer(), nullable=False),
+        sa.Column('semester', sa.String(length=20), nullable=False),
+        sa.Column('hadir', sa.Integer(), nullable=False),
+        sa.Column('total_sesi', sa.Integer(), nullable=False),
+        sa.Column('persentase', sa.Float(), nullable=False),
+        sa.Column('synced_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('nim', 'matakuliah_id', 'semester', name='uq_student_attendance_nim_matakuliah_semester')
+    )
+    op.create_index(op.f('ix_student_attendance_id'), 'student_attendance', ['id'], unique=False)
+    op.create_index('idx_student_attendance_matakuliah_semester', 'student_attendance', ['matakuliah_id', 'semester'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_student_attendance_matakuliah_semester', table_name='student_attendance')
+    op.drop_index(op.f('ix_student_attendance_id'), table_name='student_attendance')
+    op.drop_table('student_attendance')
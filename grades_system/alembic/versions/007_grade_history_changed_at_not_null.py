@@ -0,0 +1,40 @@
+"""Make grade_history.changed_at non-null
+
+Revision ID: 007_grade_history_changed_at_not_null
+Revises: 006_add_student_attendance
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007_grade_history_changed_at_not_null'
+down_revision = '006_add_student_attendance'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The audit trail pages on (changed_at, id); rows without a timestamp take their grade's
+    # last update, or the migration time when the grade is gone
+    op.execute(
+        "UPDATE grade_history SET changed_at = COALESCE("
+        "(SELECT grades.updated_at FROM grades WHERE grades.id = grade_history.grade_id), "
+        "CURRENT_TIMESTAMP) "
+        "WHERE changed_at IS NULL"
+    )
+
+    with op.batch_alter_table('grade_history') as batch_op:
+        batch_op.alter_column(
+            'changed_at',
+            existing_type=sa.DateTime(),
+            nullable=False,
+            server_default=sa.func.current_timestamp()
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('grade_history') as batch_op:
+        batch_op.alter_column('changed_at', existing_type=sa.DateTime(), nullable=True, server_default=None)
@@ -1,6 +1,10 @@
 """
 Service module for handling audit trail logic for grades
 """
+import csv
+import io
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterator, Tuple
 from sqlalchemy.orm import Session
 from grades_system.models import Grade, GradeHistory
 from grades_system.schemas import GradeHistoryCreate
@@ -14,7 +18,9 @@ def create_grade_history(
     new_nilai_huruf: str,
     new_nilai_angka: float,
     changed_by: str,
-    reason: str
+    reason: str,
+    nim: str = None,
+    matakuliah_id: int = None
 ):
     """
     Create a new audit trail entry for grade changes
@@ -28,15 +34,25 @@ def create_grade_history(
         new_nilai_angka: New numeric grade
         changed_by: Username of person making the change
         reason: Reason for the change
+        nim: Student of the grade (looked up from the grade when omitted)
+        matakuliah_id: Course of the grade (looked up from the grade when omitted)
     
     Returns:
         GradeHistory: Created history record
     """
+    if nim is None or matakuliah_id is None:
+        grade = db.get(Grade, grade_id)
+        if grade is not None:
+            nim = grade.nim if nim is None else nim
+            matakuliah_id = grade.matakuliah_id if matakuliah_id is None else matakuliah_id
+
     old_value = f"{old_nilai_huruf}({old_nilai_angka})"
     new_value = f"{new_nilai_huruf}({new_nilai_angka})"
     
     history = GradeHistory(
         grade_id=grade_id,
+        nim=nim,
+        matakuliah_id=matakuliah_id,
         old_value=old_value,
         new_value=new_value,
         changed_by=changed_by,
@@ -109,4 +125,109 @@ def validate_grade_audit_data(
     if new_nilai_angka < 0.0 or new_nilai_angka > 4.0:
         raise ValueError("New nilai_angka must be between 0.0 and 4.0")
 
-    return True
\ No newline at end of file
+    return True
+
+# Cursor of the audit trail: changed_at and id of the last row of the previous page
+AUDIT_CURSOR_SEPARATOR = "_"
+
+
+def encode_audit_cursor(history: GradeHistory) -> str:
+    return f"{history.changed_at.isoformat()}{AUDIT_CURSOR_SEPARATOR}{history.id}"
+
+
+def decode_audit_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError for a malformed cursor"""
+    changed_at, _, history_id = cursor.rpartition(AUDIT_CURSOR_SEPARATOR)
+    if not changed_at:
+        raise ValueError("Cursor tidak valid")
+    return datetime.fromisoformat(changed_at), int(history_id)
+
+
+def _audit_query(
+    db: Session,
+    changed_by: Optional[str] = None,
+    nim: Optional[str] = None,
+    matakuliah_id: Optional[int] = None,
+    grade_id: Optional[int] = None,
+    changed_from: Optional[datetime] = None,
+    changed_to: Optional[datetime] = None
+):
+    query = db.query(GradeHistory)
+    if changed_by:
+        query = query.filter(GradeHistory.changed_by == changed_by)
+    if nim:
+        query = query.filter(GradeHistory.nim == nim)
+    if matakuliah_id is not None:
+        query = query.filter(GradeHistory.matakuliah_id == matakuliah_id)
+    if grade_id is not None:
+        query = query.filter(GradeHistory.grade_id == grade_id)
+    if changed_from is not None:
+        query = query.filter(GradeHistory.changed_at >= changed_from)
+    if changed_to is not None:
+        query = query.filter(GradeHistory.changed_at < changed_to)
+    return query
+
+
+def search_grade_history(
+    db: Session,
+    changed_by: Optional[str] = None,
+    nim: Optional[str] = None,
+    matakuliah_id: Optional[int] = None,
+    grade_id: Optional[int] = None,
+    changed_from: Optional[datetime] = None,
+    changed_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50
+) -> Dict[str, Any]:
+    """
+    Search the audit trail, newest first, with keyset pagination
+
+    Every filter is served by one of the (column, changed_at) indexes of grade_history.
+    Pass the returned next_cursor to get the following page; it is None on the last page.
+
+    Returns:
+        {"items": List[GradeHistory], "next_cursor": Optional[str]}
+    """
+    query = _audit_query(db, changed_by, nim, matakuliah_id, grade_id, changed_from, changed_to)
+    if cursor:
+        last_changed_at, last_id = decode_audit_cursor(cursor)
+        query = query.filter(
+            (GradeHistory.changed_at < last_changed_at)
+            | ((GradeHistory.changed_at == last_changed_at) & (GradeHistory.id < last_id))
+        )
+
+    items = query.order_by(GradeHistory.changed_at.desc(), GradeHistory.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_audit_cursor(items[limit - 1]) if len(items) > limit else None
+    return {"items": items[:limit], "next_cursor": next_cursor}
+
+
+AUDIT_CSV_COLUMNS = ["id", "changed_at", "changed_by", "nim", "matakuliah_id", "grade_id", "old_value", "new_value", "reason"]
+
+
+def iter_grade_history_csv(db: Session, batch_size: int = 1000, **filters) -> Iterator[str]:
+    """
+    Audit trail as CSV text, produced batch by batch from a server-side cursor so the
+    export never holds more than batch_size rows
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(AUDIT_CSV_COLUMNS)
+
+    query = _audit_query(db, **filters).order_by(GradeHistory.changed_at.desc(), GradeHistory.id.desc())
+    for index, history in enumerate(query.yield_per(batch_size), start=1):
+        writer.writerow([
+            history.id,
+            history.changed_at.isoformat() if history.changed_at else "",
+            history.changed_by,
+            history.nim or "",
+            history.matakuliah_id if history.matakuliah_id is not None else "",
+            history.grade_id,
+            history.old_value,
+            history.new_value,
+            history.reason or ""
+        ])
+        if index % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, case, insert, update
 from grades_system.models import Grade, GradeHistory
 from grades_system.schemas import GradeCreate, GradeUpdate
 from grades_system import audit_service
+from grades_system.services.gpa_summary import apply_grade_change, grade_state, refresh_students
+from grades_system.services.gpa_service import invalidate_transcripts
+from grades_system.services.course_stats import apply_course_stats_change, course_stats_state, refresh_course_stats
+from grades_system.services.presensi_sync import get_synced_attendance
 from krs_system.models import Matakuliah
 from pmb_system.models import CalonMahasiswa
 from schedule_system.models import Dosen, JadwalMahasiswa
@@ -36,8 +40,17 @@ def get_grades_by_course(db: Session, matakuliah_id: int):
     )
 
 
-def get_attendance_percentage(db: Session, nim: str, matakuliah_id: int):
-    """Get attendance percentage for a student in a specific course based on schedule system"""
+def get_attendance_percentage(db: Session, nim: str, matakuliah_id: int, semester: str = None):
+    """
+    Get attendance percentage for a student in a specific course
+
+    Reads the QR attendance precomputed by the nightly presensi sync; students it has not
+    seen yet fall back to their jadwal_mahasiswa placements.
+    """
+    synced = get_synced_attendance(db, matakuliah_id, [nim], semester)
+    if nim in synced:
+        return synced[nim]
+
     # Get the course schedule for this course
     # This is a simplified version - in a real system, you'd need to map from matakuliah_id to jadwal_kelas_id
     # For now, we'll calculate attendance from the JadwalMahasiswa table
@@ -81,25 +94,27 @@ def get_attendance_percentage(db: Session, nim: str, matakuliah_id: int):
     return round(attendance_percentage, 2)
 
 
+NILAI_ANGKA_MAP = {
+    'A': 4.0,
+    'B': 3.0,
+    'C': 2.0,
+    'D': 1.0,
+    'E': 0.0
+}
+
+
 def create_grade(db: Session, grade: GradeCreate, current_user: str):
     """Create a new grade record"""
     # Validate nilai_huruf
-    if grade.nilai_huruf.upper() not in ['A', 'B', 'C', 'D', 'E']:
+    if grade.nilai_huruf.upper() not in NILAI_ANGKA_MAP:
         raise ValueError("Nilai huruf harus A, B, C, D, atau E")
 
     # Calculate nilai_angka based on nilai_huruf
-    nilai_angka_map = {
-        'A': 4.0,
-        'B': 3.0,
-        'C': 2.0,
-        'D': 1.0,
-        'E': 0.0
-    }
-    nilai_angka = nilai_angka_map.get(grade.nilai_huruf.upper(), 0.0)
+    nilai_angka = NILAI_ANGKA_MAP[grade.nilai_huruf.upper()]
 
     # Check attendance requirement (>= 75%)
     # For now, use the provided presensi, but in the future, calculate from attendance records
-    calculated_attendance = get_attendance_percentage(db, grade.nim, grade.matakuliah_id)
+    calculated_attendance = get_attendance_percentage(db, grade.nim, grade.matakuliah_id, grade.semester)
 
     # Use the minimum of provided presensi and calculated attendance
     final_presensi = min(grade.presensi, calculated_attendance) if calculated_attendance < 100.0 else grade.presensi
@@ -135,11 +150,171 @@ def create_grade(db: Session, grade: GradeCreate, current_user: str):
         presensi=final_presensi
     )
     db.add(db_grade)
+    apply_grade_change(db, db_grade.nim, db_grade.matakuliah_id, None, grade_state(db_grade))
+    apply_course_stats_change(db, None, course_stats_state(db_grade))
     db.commit()
+    invalidate_transcripts(db, [db_grade.nim])
     db.refresh(db_grade)
     return db_grade
 
 
+def get_class_attendance_percentages(db: Session, matakuliah: Matakuliah, nims, semester: str = None) -> dict:
+    """
+    Attendance percentage per student of a course, with at most two queries.
+    Same rule as get_attendance_percentage: synced QR attendance first, then placements;
+    students with neither are absent (they count as 100%).
+    """
+    from schedule_system.models import JadwalKelas
+
+    attendance = get_synced_attendance(db, matakuliah.id, nims, semester)
+    nims = set(nims) - set(attendance)
+    if not nims:
+        return attendance
+
+    rows = db.query(
+        JadwalMahasiswa.nim,
+        func.count(JadwalMahasiswa.id),
+        func.sum(case((JadwalMahasiswa.status_kehadiran != "belum_hadir", 1), else_=0))
+    ).join(
+        JadwalKelas, JadwalKelas.id == JadwalMahasiswa.jadwal_kelas_id
+    ).filter(
+        JadwalKelas.kode_mk == matakuliah.kode,
+        JadwalMahasiswa.nim.in_(list(nims))
+    ).group_by(JadwalMahasiswa.nim).all()
+
+    attendance.update(
+        (nim, round((attended or 0) / total * 100, 2))
+        for nim, total, attended in rows if total
+    )
+    return attendance
+
+
+def bulk_upsert_course_grades(
+    db: Session,
+    matakuliah: Matakuliah,
+    semester: str,
+    rows: list,
+    dosen_id: int,
+    current_user: str,
+    reason: str = "Upload nilai massal"
+) -> list:
+    """
+    Create or update the grades of a whole class
+
+    The roster and the attendance of every uploaded student are loaded with two queries,
+    existing grades with a third; every row is validated in memory and all accepted rows,
+    their GradeHistory entries and the IPS/IPK summary are written in one transaction.
+
+    Args:
+        matakuliah: Course being graded
+        semester: Semester stored on new grades
+        rows: [{"nim", "nilai_huruf", "presensi" (optional)}]
+        dosen_id: Dosen stored on new grades
+        current_user: Username recorded in the history
+        reason: Reason recorded in the history of updated grades
+
+    Returns:
+        One {"nim", "status", "detail"} per row; status is created, updated, unchanged or rejected
+    """
+    nims = {str(row.get('nim') or "").strip() for row in rows} - {""}
+    roster = {nim for (nim,) in db.query(CalonMahasiswa.nim).filter(CalonMahasiswa.nim.in_(nims)).all()}
+    attendance = get_class_attendance_percentages(db, matakuliah, nims, semester)
+    existing = {
+        grade.nim: grade for grade in db.query(Grade).filter(
+            Grade.matakuliah_id == matakuliah.id,
+            Grade.nim.in_(nims)
+        ).all()
+    }
+
+    results = []
+    new_grades = []
+    grade_updates = []
+    histories = []
+    seen = set()
+    for row in rows:
+        nim = str(row.get('nim') or "").strip()
+        nilai_huruf = str(row.get('nilai_huruf') or "").strip().upper()
+        result = {'nim': nim, 'status': "rejected", 'detail': None}
+        results.append(result)
+
+        if not nim:
+            result['detail'] = "NIM wajib diisi"
+            continue
+        if nim in seen:
+            result['detail'] = "NIM muncul lebih dari sekali"
+            continue
+        seen.add(nim)
+        if nim not in roster:
+            result['detail'] = "Mahasiswa tidak ditemukan"
+            continue
+        if nilai_huruf not in NILAI_ANGKA_MAP:
+            result['detail'] = "Nilai huruf harus A, B, C, D, atau E"
+            continue
+        try:
+            presensi = float(row.get('presensi') if row.get('presensi') not in (None, "") else 100.0)
+        except (TypeError, ValueError):
+            result['detail'] = "Presensi harus berupa angka"
+            continue
+
+        calculated_attendance = attendance.get(nim, 100.0)
+        final_presensi = min(presensi, calculated_attendance) if calculated_attendance < 100.0 else presensi
+        if final_presensi < 75.0:
+            result['detail'] = "Presensi kurang dari 75%, tidak dapat memberikan nilai"
+            continue
+
+        nilai_angka = NILAI_ANGKA_MAP[nilai_huruf]
+        grade = existing.get(nim)
+        if grade is None:
+            new_grades.append({
+                'nim': nim,
+                'matakuliah_id': matakuliah.id,
+                'semester': semester,
+                'nilai_huruf': nilai_huruf,
+                'nilai_angka': nilai_angka,
+                'sks': matakuliah.sks,
+                'dosen_id': dosen_id,
+                'presensi': final_presensi
+            })
+            result['status'] = "created"
+        elif grade.nilai_huruf == nilai_huruf and grade.presensi == final_presensi:
+            result['status'] = "unchanged"
+        else:
+            grade_updates.append({
+                'id': grade.id,
+                'nilai_huruf': nilai_huruf,
+                'nilai_angka': nilai_angka,
+                'presensi': final_presensi
+            })
+            histories.append({
+                'grade_id': grade.id,
+                'nim': grade.nim,
+                'matakuliah_id': grade.matakuliah_id,
+                'old_value': f"{grade.nilai_huruf}({grade.nilai_angka})",
+                'new_value': f"{nilai_huruf}({nilai_angka})",
+                'changed_by': current_user,
+                'reason': reason
+            })
+            result['status'] = "updated"
+
+    if new_grades or grade_updates:
+        try:
+            if new_grades:
+                db.execute(insert(Grade), new_grades)
+            if grade_updates:
+                db.execute(update(Grade), grade_updates)
+                db.execute(insert(GradeHistory), histories)
+            changed_nims = [r['nim'] for r in results if r['status'] in ("created", "updated")]
+            refresh_students(db, changed_nims)
+            refresh_course_stats(db, [matakuliah.id])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        invalidate_transcripts(db, changed_nims)
+
+    return results
+
+
 def update_grade(db: Session, grade_id: int, grade_update: GradeUpdate, current_user: str):
     """Update an existing grade and create history record"""
     db_grade = get_grade_by_id(db, grade_id)
@@ -149,6 +324,8 @@ def update_grade(db: Session, grade_id: int, grade_update: GradeUpdate, current_
     # Save old values for history
     old_nilai_huruf = db_grade.nilai_huruf
     old_nilai_angka = db_grade.nilai_angka
+    old_state = grade_state(db_grade)
+    old_stats_state = course_stats_state(db_grade)
 
     # Validate the audit data before making changes
     audit_service.validate_grade_audit_data(
@@ -183,13 +360,17 @@ def update_grade(db: Session, grade_id: int, grade_update: GradeUpdate, current_
         if grade_update.presensi < 75.0:
             raise ValueError("Presensi kurang dari 75%, tidak dapat memberikan nilai")
         # Recalculate attendance if needed
-        calculated_attendance = get_attendance_percentage(db, db_grade.nim, db_grade.matakuliah_id)
+        calculated_attendance = get_attendance_percentage(db, db_grade.nim, db_grade.matakuliah_id, db_grade.semester)
         final_presensi = min(grade_update.presensi, calculated_attendance) if calculated_attendance < 100.0 else grade_update.presensi
         db_grade.presensi = final_presensi
 
     # Get the new nilai_angka after all updates are done
     new_nilai_angka = db_grade.nilai_angka
 
+    # IPS/IPK summary; committed together with the grade by create_grade_history
+    apply_grade_change(db, db_grade.nim, db_grade.matakuliah_id, old_state, grade_state(db_grade))
+    apply_course_stats_change(db, old_stats_state, course_stats_state(db_grade))
+
     # Create history record using the audit service
     audit_service.create_grade_history(
         db=db,
@@ -199,10 +380,13 @@ def update_grade(db: Session, grade_id: int, grade_update: GradeUpdate, current_
         new_nilai_huruf=db_grade.nilai_huruf,
         new_nilai_angka=new_nilai_angka,
         changed_by=current_user,
-        reason=grade_update.reason
+        reason=grade_update.reason,
+        nim=db_grade.nim,
+        matakuliah_id=db_grade.matakuliah_id
     )
 
     db.commit()
+    invalidate_transcripts(db, [db_grade.nim])
     db.refresh(db_grade)
     return db_grade
 
@@ -213,8 +397,13 @@ def delete_grade(db: Session, grade_id: int):
     if not db_grade:
         return None
     
+    old_state = grade_state(db_grade)
+    old_stats_state = course_stats_state(db_grade)
     db.delete(db_grade)
+    apply_grade_change(db, db_grade.nim, db_grade.matakuliah_id, old_state, None)
+    apply_course_stats_change(db, old_stats_state, None)
     db.commit()
+    invalidate_transcripts(db, [db_grade.nim])
     return db_grade
 
 
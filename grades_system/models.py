@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from pmb_system.database import Base
@@ -32,15 +32,140 @@ class GradeHistory(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     grade_id = Column(Integer, ForeignKey('grades.id'), nullable=False)  # FK to grades.id
+    nim = Column(String(20), nullable=True)  # Copied from the grade so audits can filter without a join
+    matakuliah_id = Column(Integer, nullable=True)  # Copied from the grade
     old_value = Column(String(50), nullable=False)  # Previous value (huruf/angka)
     new_value = Column(String(50), nullable=False)  # New value (huruf/angka)
     changed_by = Column(String(255), nullable=False)  # Username of the person who changed
-    changed_at = Column(DateTime, default=func.now())  # Timestamp
+    changed_at = Column(DateTime, nullable=False, default=func.now(), server_default=func.now())  # Timestamp
     reason = Column(Text, nullable=True)  # Reason for the change
 
     # Relationships
     grade = relationship("Grade", back_populates="history")
 
+    __table_args__ = (
+        Index('idx_grade_history_changed_by_at', 'changed_by', 'changed_at'),
+        Index('idx_grade_history_grade_at', 'grade_id', 'changed_at'),
+        Index('idx_grade_history_matakuliah_at', 'matakuliah_id', 'changed_at'),
+        Index('idx_grade_history_nim_at', 'nim', 'changed_at'),
+    )
+
+
+class StudentGpaSummary(Base):
+    """
+    IPS/IPK read model: Σ(sks × nilai_angka) and Σsks of passing grades per (nim, semester).
+    The row with semester == "KUMULATIF" holds the IPK totals over the best grade per course.
+    Maintained by grades_system.services.gpa_summary together with every grade change.
+    """
+    __tablename__ = 'student_gpa_summary'
+
+    id = Column(Integer, primary_key=True, index=True)
+    nim = Column(String(20), nullable=False)
+    semester = Column(String(20), nullable=False)  # Semester string or "KUMULATIF"
+    total_mutu = Column(Float, nullable=False, default=0.0)  # Σ(sks × nilai_angka)
+    total_sks = Column(Integer, nullable=False, default=0)  # Σsks
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('nim', 'semester', name='uq_student_gpa_summary_nim_semester'),
+    )
+
+
+class StudentBestGrade(Base):
+    """Best passing grade per (nim, matakuliah_id), the courses counted in the KUMULATIF row"""
+    __tablename__ = 'student_best_grade'
+
+    id = Column(Integer, primary_key=True, index=True)
+    nim = Column(String(20), nullable=False)
+    matakuliah_id = Column(Integer, nullable=False)
+    grade_id = Column(Integer, nullable=False)
+    nilai_angka = Column(Float, nullable=False)
+    sks = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('nim', 'matakuliah_id', name='uq_student_best_grade_nim_matakuliah'),
+    )
+
+
+class CourseGradeStats(Base):
+    """
+    Grade distribution per (matakuliah_id, semester, dosen_id): count and summed presensi per letter,
+    plus Σnilai_angka. Maintained by grades_system.services.course_stats together with every grade change.
+    """
+    __tablename__ = 'course_grade_stats'
+
+    id = Column(Integer, primary_key=True, index=True)
+    matakuliah_id = Column(Integer, nullable=False)
+    semester = Column(String(20), nullable=False)
+    dosen_id = Column(Integer, nullable=False)
+    count_a = Column(Integer, nullable=False, default=0)
+    count_b = Column(Integer, nullable=False, default=0)
+    count_c = Column(Integer, nullable=False, default=0)
+    count_d = Column(Integer, nullable=False, default=0)
+    count_e = Column(Integer, nullable=False, default=0)
+    total_nilai = Column(Float, nullable=False, default=0.0)  # Σnilai_angka
+    presensi_a = Column(Float, nullable=False, default=0.0)  # Σpresensi of the A grades
+    presensi_b = Column(Float, nullable=False, default=0.0)
+    presensi_c = Column(Float, nullable=False, default=0.0)
+    presensi_d = Column(Float, nullable=False, default=0.0)
+    presensi_e = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('matakuliah_id', 'semester', 'dosen_id', name='uq_course_grade_stats_course_semester_dosen'),
+    )
+
+
+class AcademicWarning(Base):
+    """
+    Student flagged by the nightly academic early-warning batch for one semester.
+    Rewritten for the semester on every run by grades_system.services.early_warning.
+    """
+    __tablename__ = 'academic_warning'
+
+    id = Column(Integer, primary_key=True, index=True)
+    nim = Column(String(20), nullable=False)
+    semester = Column(String(20), nullable=False)  # Evaluated semester
+    dosen_pa_id = Column(Integer, nullable=True)  # Advisor from the student's KRS of the semester
+    ips = Column(Float, nullable=False)
+    previous_ips = Column(Float, nullable=True)  # IPS of the student's previous semester with grades
+    ips_drop = Column(Float, nullable=False, default=0.0)
+    sks_lulus = Column(Integer, nullable=False)  # Passed SKS so far, best grade per course
+    sks_shortfall = Column(Integer, nullable=False, default=0)  # Behind TARGET_SKS_PER_SEMESTER × semesters
+    e_count = Column(Integer, nullable=False, default=0)  # E grades in the evaluated semester
+    flags = Column(String(100), nullable=False)  # Comma separated: IPS_TURUN, SKS_KURANG, NILAI_E
+    severity = Column(Integer, nullable=False)  # Number of flags
+    computed_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('semester', 'nim', name='uq_academic_warning_semester_nim'),
+        Index('idx_academic_warning_semester_severity', 'semester', 'severity'),
+        Index('idx_academic_warning_dosen_pa', 'dosen_pa_id', 'semester'),
+    )
+
+
+class StudentAttendance(Base):
+    """
+    QR attendance of a student in a course and semester: sessions attended over sessions held
+    in the student's sections. Rewritten nightly by grades_system.services.presensi_sync and
+    read by grade entry instead of recounting attendance on every request.
+    """
+    __tablename__ = 'student_attendance'
+
+    id = Column(Integer, primary_key=True, index=True)
+    nim = Column(String(20), nullable=False)
+    matakuliah_id = Column(Integer, nullable=False)
+    semester = Column(String(20), nullable=False)
+    hadir = Column(Integer, nullable=False, default=0)  # Distinct sessions with an attendance_record
+    total_sesi = Column(Integer, nullable=False, default=0)  # Sessions generated for the student's sections
+    persentase = Column(Float, nullable=False, default=0.0)  # 100 × hadir / total_sesi, 2 decimals
+    synced_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('nim', 'matakuliah_id', 'semester', name='uq_student_attendance_nim_matakuliah_semester'),
+        Index('idx_student_attendance_matakuliah_semester', 'matakuliah_id', 'semester'),
+    )
+
 
 # Add back-populates relationships to existing models
 # This would need to be done in the actual models to avoid circular imports
@@ -51,4 +176,4 @@ def add_grade_relationships():
     This should be called after all models are defined to avoid circular imports
     """
     # Add these relationships to existing models after they are fully loaded
-    pass
\ No newline at end of file
+    pass
@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
+import csv
+import io
+import json
 
 from grades_system import crud, schemas, audit_service
+from grades_system.services.early_warning import get_academic_warnings, run_academic_early_warning
+from grades_system.services.course_stats import get_course_stats, list_course_stats, rebuild_course_grade_stats
+from grades_system.services.presensi_sync import sync_grade_presensi
 from pmb_system.database import get_db
 from auth_system.dependencies import get_current_user, role_required
 from auth_system.models import User, RoleEnum
 from krs_system.models import Matakuliah
 from pmb_system.models import CalonMahasiswa
-from schedule_system.models import Dosen
+from attendance_system.router import current_dosen_id
 
 router = APIRouter(prefix="/api/grades", tags=["Grades"])
 
@@ -146,6 +155,220 @@ def get_course_grades(
     return result
 
 
+@router.get("/course/{matakuliah_id}/stats", response_model=schemas.CourseGradeStatsResponse)
+def get_course_grade_stats(
+    matakuliah_id: int,
+    semester: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Distribusi nilai satu mata kuliah per semester dan dosen, dari course_grade_stats"""
+    if current_user.role == RoleEnum.DOSEN:
+        if not crud.validate_dosen_teaching_course(db, int(current_user.kode_dosen), matakuliah_id):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Anda tidak mengajar mata kuliah ini"
+            )
+    elif current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Tidak memiliki akses untuk melihat statistik mata kuliah ini"
+        )
+
+    return get_course_stats(db, matakuliah_id, semester)
+
+
+@router.get("/stats", response_model=schemas.CourseGradeStatsListResponse)
+def list_grade_stats(
+    semester: Optional[str] = None,
+    dosen_id: Optional[int] = None,
+    program_studi: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Statistik nilai seluruh mata kuliah (per semester dan dosen), dengan filter opsional"""
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya admin yang dapat melihat statistik seluruh fakultas"
+        )
+
+    return list_course_stats(db, semester, dosen_id, program_studi, skip, min(limit, 500))
+
+
+@router.post("/stats/rebuild")
+def rebuild_grade_stats(
+    matakuliah_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Hitung ulang course_grade_stats dari tabel grades (semua, atau satu mata kuliah)"""
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya admin yang dapat membangun ulang statistik nilai"
+        )
+
+    return rebuild_course_grade_stats(db, matakuliah_id)
+
+
+@router.get("/early-warning", response_model=schemas.AcademicWarningListResponse)
+def list_academic_warnings(
+    semester: Optional[str] = None,
+    flag: Optional[str] = None,
+    dosen_pa_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Mahasiswa yang ditandai peringatan dini akademik; dosen hanya melihat mahasiswa bimbingannya"""
+    if current_user.role == RoleEnum.DOSEN:
+        dosen_pa_id = int(current_user.kode_dosen)
+    elif current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya dosen wali atau admin yang dapat melihat peringatan dini"
+        )
+
+    return get_academic_warnings(db, semester, dosen_pa_id, flag, skip, min(limit, 500))
+
+
+@router.post("/early-warning/run")
+def run_early_warning(
+    semester: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Jalankan batch peringatan dini akademik sekarang (biasanya dijalankan scheduler tiap malam)"""
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya admin yang dapat menjalankan peringatan dini"
+        )
+
+    return run_academic_early_warning(db, semester)
+
+
+@router.post("/presensi/sync")
+def sync_presensi(
+    semester: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Sinkronkan presensi nilai dari data presensi QR sekarang (biasanya dijalankan scheduler tiap malam)"""
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya admin yang dapat menyinkronkan presensi"
+        )
+
+    return sync_grade_presensi(db, semester)
+
+
+# Upper bound for one class-wide upload
+BULK_GRADE_MAX_ROWS = 1000
+
+
+def _parse_bulk_grade_rows(body: bytes, content_type: str) -> List[dict]:
+    """
+    Parse a class-wide upload as CSV (header nim,nilai_huruf[,presensi])
+    or JSON (a list of objects, or {"rows": [...]})
+    """
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        return [
+            {key.strip(): (value.strip() if value is not None else None) for key, value in raw.items() if key}
+            for raw in reader
+        ]
+
+    data = json.loads(body or b"[]")
+    if isinstance(data, dict):
+        data = data.get("rows")
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise ValueError("JSON body must be a list of {nim, nilai_huruf} objects or an object with a 'rows' list")
+    return data
+
+
+def _upload_course_grades(
+    db: Session,
+    matakuliah_id: int,
+    semester: str,
+    reason: str,
+    raw_rows: List[dict],
+    current_user: User
+) -> schemas.BulkGradeResponse:
+    if current_user.role != RoleEnum.DOSEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya dosen yang dapat menginput nilai"
+        )
+    # 403 when the lecturer has no Dosen profile
+    dosen_id = current_dosen_id(db, current_user)
+    if not crud.validate_dosen_teaching_course(db, int(current_user.kode_dosen), matakuliah_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Dosen tidak mengajar mata kuliah ini"
+        )
+
+    course = db.query(Matakuliah).filter(Matakuliah.id == matakuliah_id).first()
+    if not course:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Mata kuliah tidak ditemukan"
+        )
+
+    results = crud.bulk_upsert_course_grades(
+        db, course, semester, raw_rows, dosen_id, current_user.username, reason
+    )
+    rows = [schemas.BulkGradeRowResult(row=index + 1, **result) for index, result in enumerate(results)]
+    counts = {name: sum(1 for r in rows if r.status == name) for name in ("created", "updated", "unchanged", "rejected")}
+    return schemas.BulkGradeResponse(
+        matakuliah_id=matakuliah_id, semester=semester, total=len(rows), rows=rows, **counts
+    )
+
+
+@router.post("/course/{matakuliah_id}/bulk", response_model=schemas.BulkGradeResponse)
+async def upload_course_grades(
+    matakuliah_id: int,
+    semester: str,
+    request: Request,
+    reason: str = "Upload nilai massal",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Input nilai satu kelas sekaligus dari CSV (Content-Type: text/csv) atau JSON.
+    Baris yang valid disimpan dalam satu transaksi; hasil per baris dikembalikan.
+    """
+    if not reason.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Reason is required for grade changes"
+        )
+
+    try:
+        raw_rows = _parse_bulk_grade_rows(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Upload tidak valid: {str(e)}"
+        )
+
+    if len(raw_rows) > BULK_GRADE_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Maksimal {BULK_GRADE_MAX_ROWS} baris per upload"
+        )
+
+    # Database work is blocking, keep it off the event loop
+    return await run_in_threadpool(
+        _upload_course_grades, db, matakuliah_id, semester, reason, raw_rows, current_user
+    )
+
+
 @router.put("/{id}", response_model=schemas.GradeResponse)
 def update_grade(
     id: int,
@@ -248,4 +471,66 @@ def get_grade_history(
 
     # Get history records for this grade
     history_records = audit_service.get_grade_history(db, grade_id)
-    return history_records
\ No newline at end of file
+    return history_records
+
+@router.get("/audit", response_model=schemas.GradeAuditPage)
+def search_grade_audit(
+    changed_by: Optional[str] = None,
+    nim: Optional[str] = None,
+    matakuliah_id: Optional[int] = None,
+    grade_id: Optional[int] = None,
+    changed_from: Optional[datetime] = None,
+    changed_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Cari histori perubahan nilai (terbaru dulu) dengan filter dan keyset pagination"""
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya admin yang dapat mengaudit perubahan nilai"
+        )
+
+    try:
+        return audit_service.search_grade_history(
+            db, changed_by, nim, matakuliah_id, grade_id, changed_from, changed_to,
+            cursor, max(1, min(limit, 500))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/audit/export")
+def export_grade_audit(
+    changed_by: Optional[str] = None,
+    nim: Optional[str] = None,
+    matakuliah_id: Optional[int] = None,
+    grade_id: Optional[int] = None,
+    changed_from: Optional[datetime] = None,
+    changed_to: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Ekspor histori perubahan nilai sebagai CSV yang di-stream"""
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya admin yang dapat mengaudit perubahan nilai"
+        )
+
+    def content():
+        try:
+            yield from audit_service.iter_grade_history_csv(
+                db, changed_by=changed_by, nim=nim, matakuliah_id=matakuliah_id, grade_id=grade_id,
+                changed_from=changed_from, changed_to=changed_to
+            )
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        content(),
+        media_type="text/csv",
+        headers={'Content-Disposition': 'attachment; filename="audit_nilai.csv"'}
+    )
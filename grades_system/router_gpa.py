@@ -1,24 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from fastapi.responses import FileResponse
-import os
-from pathlib import Path
+from typing import List, Optional
 
 from pmb_system.database import get_db
 from auth_system.dependencies import get_current_user
 from auth_system.models import User, RoleEnum
 from grades_system.services.gpa_service import calculate_ips, calculate_ipk, get_transcript
+from grades_system.services.gpa_summary import rebuild_gpa_summary
+from grades_system.services.cohort_gpa import get_cohort_gpa, IPK_BIN_WIDTH
+from grades_system.services.cohort_transcripts import count_cohort, stream_cohort_transcripts_zip
+from grades_system.services.transcript_pdf import transcript_pdf_cache, transcript_hash, make_transcript_etag
 from grades_system.schemas import StudentGradeResponse
 
-# Import for PDF generation with ReportLab
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from datetime import datetime
-
 router = APIRouter(prefix="/api/gpa", tags=["GPA"])
 
 
@@ -73,6 +67,84 @@ def get_ipk(
     return {"nim": nim, "ipk": ipk}
 
 
+@router.get("/cohort")
+def get_cohort_ranking(
+    program_studi_id: Optional[int] = None,
+    angkatan: Optional[str] = None,
+    bin_width: float = IPK_BIN_WIDTH,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """IPK ranking, percentiles, predikat breakdown and histogram of a program studi and/or angkatan"""
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.DOSEN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Tidak memiliki akses untuk melihat data ini"
+        )
+
+    try:
+        return get_cohort_gpa(db, program_studi_id, angkatan, bin_width)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.post("/summary/rebuild")
+def rebuild_summary(
+    nim: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recompute student_gpa_summary from the grades table (all students, or one with ?nim=)"""
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya admin yang dapat membangun ulang ringkasan IPK"
+        )
+
+    return rebuild_gpa_summary(db, nim)
+
+
+@router.get("/transcripts/cohort")
+def get_cohort_transcripts_zip(
+    program_studi_id: Optional[int] = None,
+    angkatan: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Transcript PDFs of every student of a program studi and/or angkatan, streamed as one ZIP"""
+    if current_user.role != RoleEnum.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Hanya admin yang dapat mengunduh transkrip satu angkatan"
+        )
+
+    try:
+        total = count_cohort(db, program_studi_id, angkatan)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if total == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tidak ada mahasiswa pada angkatan/program studi ini"
+        )
+
+    def content():
+        try:
+            yield from stream_cohort_transcripts_zip(db, program_studi_id, angkatan)
+        finally:
+            db.close()
+
+    filename = "_".join(["transkrip"] + [str(part) for part in (program_studi_id, angkatan) if part]) + ".zip"
+    return StreamingResponse(
+        content(),
+        media_type="application/zip",
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Total-Transcripts': str(total)
+        }
+    )
+
+
 @router.get("/transcript/{nim}")
 def get_student_transcript(
     nim: str,
@@ -107,10 +179,11 @@ def get_student_transcript(
 @router.get("/transcript/{nim}/pdf")
 def get_student_transcript_pdf(
     nim: str,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Generate academic transcript as PDF using ReportLab"""
+    """Academic transcript as PDF, cached by transcript content and served with an ETag"""
     # Check if current user has access to view this student's data
     if current_user.role == RoleEnum.MAHASISWA:
         if current_user.nim != nim:
@@ -133,167 +206,17 @@ def get_student_transcript_pdf(
             detail="Data mahasiswa tidak ditemukan"
         )
 
-    # Define output directory and create if not exists
-    output_dir = Path("generated_pdfs")
-    output_dir.mkdir(exist_ok=True)
-
-    # Create PDF file path
-    pdf_path = output_dir / f"transkrip_{nim}.pdf"
-
-    # Create PDF using ReportLab
-    doc = SimpleDocTemplate(str(pdf_path), pagesize=A4, topMargin=50)
-    elements = []
-
-    # Get styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        alignment=1,  # Center alignment
-        spaceAfter=12,
-        spaceBefore=12,
-    )
-
-    # Add header with logo and title
-    logo_path = Path("web_dashboard/static/logoistn.png")
-    if logo_path.exists():
-        logo = Image(str(logo_path), width=80, height=80)
-        elements.append(logo)
-        elements.append(Spacer(1, 12))
-
-    # Title
-    elements.append(Paragraph("TRANSKRIP AKADEMIK", title_style))
-
-    # Horizontal line
-    elements.append(Spacer(1, 12))
-    # Create a line separator
-    line = Table([['']], colWidths=500)
-    line.setStyle(TableStyle([
-        ('LINEBELOW', (0, 0), (-1, -1), 2, colors.black),
-    ]))
-    elements.append(line)
-
-    # Biodata section
-    elements.append(Spacer(1, 20))
-    biodata_data = [
-        ['NIM', ':', transcript['biodata']['nim']],
-        ['Nama', ':', transcript['biodata']['nama']],
-        ['Program Studi', ':', transcript['biodata']['program_studi']],
-        ['Fakultas', ':', transcript['biodata']['fakultas']],
-    ]
-
-    biodata_table = Table(biodata_data, colWidths=[100, 20, 300])
-    biodata_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'CENTER'),
-        ('ALIGN', (2, 0), (2, -1), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-    ]))
-    elements.append(biodata_table)
+    content_hash = transcript_hash(transcript)
+    etag = make_transcript_etag(content_hash)
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
-    # Add space before courses
-    elements.append(Spacer(1, 20))
-
-    # Courses per semester
-    for semester_data in transcript['semester_list']:
-        # Semester title
-        semester_title = Paragraph(f"Semester {semester_data['semester']}", styles['Heading2'])
-        elements.append(semester_title)
-
-        # Course table
-        # Define table headers
-        course_data = [['Kode MK', 'Nama MK', 'SKS', 'Nilai Huruf', 'Mutu']]
-
-        # Add course rows
-        for course in semester_data['courses']:
-            course_data.append([
-                course['kode'],
-                course['nama'],
-                str(course['sks']),
-                course['nilai_huruf'],
-                f"{course['mutu']:.2f}"
-            ])
-
-        # Create table with style
-        course_table = Table(course_data)
-        course_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-
-        elements.append(course_table)
-        elements.append(Spacer(1, 20))
-
-    # Footer section - Total SKS, IPK, Predikat
-    footer_data = [
-        ['Total SKS', str(transcript['total_sks'])],
-        ['IPK', f"{transcript['ipk']:.2f}"],
-        ['Predikat', transcript['predikat']],
-    ]
-
-    footer_table = Table(footer_data, colWidths=[150, 200])
-    footer_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),
-    ]))
-    elements.append(footer_table)
-
-    # Signature area
-    elements.append(Spacer(1, 30))
-
-    # Signature table
-    signature_data = [
-        ['Dekan,', 'Jakarta, ____________ 20__'],
-        ['', ''],
-        ['______________________', ''],
-        ['(Nama Dekan)', '']
-    ]
-
-    signature_table = Table(signature_data, colWidths=[200, 200])
-    signature_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-    ]))
-
-    elements.append(signature_table)
-
-    # Build PDF
-    doc.build(elements)
-
-    # Return the PDF file
-    return FileResponse(
-        path=str(pdf_path),
+    _, pdf = transcript_pdf_cache.get_or_render(transcript, content_hash)
+    return Response(
+        content=pdf,
         media_type="application/pdf",
-        filename=f"transkrip_{nim}.pdf",
         headers={
+            'ETag': etag,
             'Content-Disposition': f'attachment; filename="transkrip_{nim}.pdf"'
         }
-    )
\ No newline at end of file
+    )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -54,6 +54,17 @@ class GradeHistoryResponse(GradeHistoryBase):
         from_attributes = True
 
 
+# Row of the searchable audit trail
+class GradeAuditEntry(GradeHistoryResponse):
+    nim: Optional[str] = None
+    matakuliah_id: Optional[int] = None
+
+
+class GradeAuditPage(BaseModel):
+    items: List[GradeAuditEntry]
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page
+
+
 # Response for student grades with course information
 class StudentGradeResponse(BaseModel):
     id: int
@@ -81,4 +92,81 @@ class CourseGradeResponse(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Result of one row of a class-wide grade upload
+class BulkGradeRowResult(BaseModel):
+    row: int  # 1-based row number in the upload
+    nim: str
+    status: str  # created | updated | unchanged | rejected
+    detail: Optional[str] = None
+
+
+class BulkGradeResponse(BaseModel):
+    matakuliah_id: int
+    semester: str
+    total: int
+    created: int
+    updated: int
+    unchanged: int
+    rejected: int
+    rows: List[BulkGradeRowResult]
+
+
+# Grade distribution of a course, read from course_grade_stats
+class GradeStatsSummary(BaseModel):
+    total: int
+    counts: Dict[str, int]  # A..E
+    mean_nilai: float
+    pass_rate: float  # % of grades D or better
+    mean_presensi: float
+    presensi_by_grade: Dict[str, Optional[float]]  # Mean presensi per letter, None when no grade
+
+
+class ClassGradeStats(GradeStatsSummary):
+    matakuliah_id: int
+    semester: str
+    dosen_id: int
+
+
+class CourseGradeStatsResponse(BaseModel):
+    matakuliah_id: int
+    semester: Optional[str] = None
+    overall: GradeStatsSummary
+    classes: List[ClassGradeStats]  # Per (semester, dosen)
+
+
+class CourseGradeStatsListItem(ClassGradeStats):
+    kode_mk: Optional[str] = None
+    nama_mk: Optional[str] = None
+    nama_dosen: Optional[str] = None
+
+
+class CourseGradeStatsListResponse(BaseModel):
+    total: int
+    items: List[CourseGradeStatsListItem]
+
+
+# Student flagged by the academic early-warning batch
+class AcademicWarningResponse(BaseModel):
+    nim: str
+    semester: str
+    dosen_pa_id: Optional[int] = None
+    ips: float
+    previous_ips: Optional[float] = None
+    ips_drop: float
+    sks_lulus: int
+    sks_shortfall: int
+    e_count: int
+    flags: str  # Comma separated: IPS_TURUN, SKS_KURANG, NILAI_E
+    severity: int
+    computed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class AcademicWarningListResponse(BaseModel):
+    semester: Optional[str] = None
+    total: int
+    items: List[AcademicWarningResponse]
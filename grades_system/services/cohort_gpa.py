@@ -0,0 +1,171 @@
+"""
+IPK ranking and distribution of a cohort (program studi and/or angkatan)
+
+All grades of the cohort are read in one query and the IPK of every student is computed
+with NumPy grouped reductions: grades are sorted by (student, course, nilai desc, id),
+np.maximum.reduceat picks the best nilai of every (student, course) group and
+np.add.reduceat sums mutu and SKS per student. The rules are the same as calculate_ipk
+and get_transcript: only the best passing grade (>= D) of each course counts.
+"""
+from typing import Dict, Any, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from grades_system.models import Grade
+from grades_system.services.cohort_transcripts import cohort_filters
+from grades_system.services.gpa_service import PREDIKAT_THRESHOLDS, LOWEST_PREDIKAT
+from grades_system.services.gpa_summary import PASSING_NILAI
+from pmb_system.models import CalonMahasiswa
+
+
+IPK_BIN_WIDTH = 0.25
+SUMMARY_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _group_starts(*keys: np.ndarray) -> np.ndarray:
+    """Start index of every run of equal keys in sorted arrays"""
+    change = np.zeros(len(keys[0]), dtype=bool)
+    change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def compute_cohort_ipk(
+    student_idx: np.ndarray,
+    course_ids: np.ndarray,
+    grade_ids: np.ndarray,
+    sks: np.ndarray,
+    nilai: np.ndarray,
+    n_students: int
+):
+    """
+    IPK per student from flat grade arrays
+
+    Returns:
+        (ipk, sks_lulus) arrays of length n_students; students without a passing grade get 0.0
+    """
+    total_mutu = np.zeros(n_students)
+    total_sks = np.zeros(n_students, dtype=np.int64)
+
+    passing = nilai >= PASSING_NILAI
+    if passing.any():
+        student_idx, course_ids, grade_ids = student_idx[passing], course_ids[passing], grade_ids[passing]
+        sks, nilai = sks[passing], nilai[passing]
+
+        # Best attempt first within every (student, course); ties go to the oldest grade
+        order = np.lexsort((grade_ids, -nilai, course_ids, student_idx))
+        student_idx, course_ids, sks, nilai = student_idx[order], course_ids[order], sks[order], nilai[order]
+
+        starts = _group_starts(student_idx, course_ids)
+        best_nilai = np.maximum.reduceat(nilai, starts)
+        best_sks = sks[starts]
+        best_student = student_idx[starts]
+
+        student_starts = _group_starts(best_student)
+        students = best_student[student_starts]
+        total_mutu[students] = np.add.reduceat(best_sks * best_nilai, student_starts)
+        total_sks[students] = np.add.reduceat(best_sks, student_starts)
+
+    ipk = np.zeros(n_students)
+    has_sks = total_sks > 0
+    ipk[has_sks] = np.round(total_mutu[has_sks] / total_sks[has_sks], 2)
+    return ipk, total_sks
+
+
+def predikat_codes(ipk: np.ndarray) -> np.ndarray:
+    """Index into PREDIKAT_THRESHOLDS per student, len(PREDIKAT_THRESHOLDS) for LOWEST_PREDIKAT"""
+    minimums = np.array([minimum for minimum, _ in PREDIKAT_THRESHOLDS])
+    # Thresholds are descending: count how many a student does not reach
+    return (ipk[:, None] < minimums[None, :]).sum(axis=1)
+
+
+def get_cohort_gpa(
+    db: Session,
+    program_studi_id: Optional[int] = None,
+    angkatan: Optional[str] = None,
+    bin_width: float = IPK_BIN_WIDTH
+) -> Dict[str, Any]:
+    """
+    Ranking, percentiles, predikat breakdown and IPK histogram of a cohort
+
+    Ranks are competition ranks (equal IPK, equal rank). The percentile of a student is the
+    share of the cohort below them plus half of those with the same IPK.
+
+    Raises:
+        ValueError: No filter given or an invalid bin width
+    """
+    if bin_width <= 0 or bin_width > 4:
+        raise ValueError("Lebar kelas histogram harus di antara 0 dan 4")
+
+    rows = db.query(
+        CalonMahasiswa.nim, Grade.id, Grade.matakuliah_id, Grade.sks, Grade.nilai_angka
+    ).outerjoin(
+        Grade, Grade.nim == CalonMahasiswa.nim
+    ).filter(*cohort_filters(program_studi_id, angkatan)).all()
+
+    labels = [predikat for _, predikat in PREDIKAT_THRESHOLDS] + [LOWEST_PREDIKAT]
+    nims, student_idx = np.unique(np.array([row[0] for row in rows], dtype=object), return_inverse=True)
+    n_students = len(nims)
+    result = {
+        "program_studi_id": program_studi_id,
+        "angkatan": angkatan,
+        "total_students": n_students,
+        "mean_ipk": 0.0,
+        "percentiles": {},
+        "predikat": {label: 0 for label in labels},
+        "histogram": [],
+        "students": []
+    }
+    if n_students == 0:
+        return result
+
+    graded = np.array([row[1] is not None for row in rows], dtype=bool)
+    graded_rows = [row for row in rows if row[1] is not None]
+    ipk, sks_lulus = compute_cohort_ipk(
+        student_idx[graded],
+        np.array([row[2] for row in graded_rows], dtype=np.int64),
+        np.array([row[1] for row in graded_rows], dtype=np.int64),
+        np.array([row[3] for row in graded_rows], dtype=np.int64),
+        np.array([row[4] for row in graded_rows], dtype=float),
+        n_students
+    )
+
+    ascending = np.sort(ipk)
+    below = np.searchsorted(ascending, ipk, side="left")
+    not_above = np.searchsorted(ascending, ipk, side="right")
+    ranks = n_students - not_above + 1
+    percentile = np.round(100.0 * (below + 0.5 * (not_above - below)) / n_students, 1)
+
+    codes = predikat_codes(ipk)
+    counts = np.bincount(codes, minlength=len(labels))
+    result["predikat"] = {label: int(count) for label, count in zip(labels, counts)}
+
+    n_bins = int(np.ceil(4.0 / bin_width - 1e-9))
+    edges = np.minimum(np.arange(n_bins + 1) * bin_width, 4.0)
+    histogram, edges = np.histogram(ipk, bins=edges)
+    result["histogram"] = [
+        {"lower": round(float(lower), 2), "upper": round(float(upper), 2), "count": int(count)}
+        for lower, upper, count in zip(edges[:-1], edges[1:], histogram)
+    ]
+
+    result["mean_ipk"] = round(float(ipk.mean()), 2)
+    result["percentiles"] = {
+        f"p{p}": round(float(value), 2)
+        for p, value in zip(SUMMARY_PERCENTILES, np.percentile(ipk, SUMMARY_PERCENTILES))
+    }
+
+    order = np.lexsort((np.arange(n_students), -ipk))
+    result["students"] = [
+        {
+            "nim": nims[i],
+            "ipk": float(ipk[i]),
+            "sks_lulus": int(sks_lulus[i]),
+            "rank": int(ranks[i]),
+            "percentile": float(percentile[i]),
+            "predikat": labels[codes[i]]
+        }
+        for i in order
+    ]
+    return result
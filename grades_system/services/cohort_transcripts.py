@@ -0,0 +1,206 @@
+"""
+Transcript PDFs for a whole cohort (program studi and/or angkatan) as one streaming ZIP
+
+Students are read in chunks of COHORT_CHUNK_SIZE: one query for their biodata and one for
+all their grades joined with the course. Each transcript is rendered in a process pool
+(or taken from transcript_pdf_cache) and written to the ZIP as soon as it is ready.
+At most COHORT_CHUNK_SIZE transcripts and a few in-flight PDFs per worker are held in
+memory at once, however large the cohort is.
+"""
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import get_context
+from typing import Dict, Any, Iterator, Optional, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from grades_system.models import Grade
+from grades_system.services.gpa_service import TranscriptRow, build_transcript
+from grades_system.services.transcript_pdf import render_transcript_pdf, transcript_hash, transcript_pdf_cache
+from krs_system.models import Matakuliah
+from pmb_system.models import CalonMahasiswa, ProgramStudi
+
+
+COHORT_CHUNK_SIZE = 200
+COHORT_RENDER_WORKERS = min(4, os.cpu_count() or 1)
+IN_FLIGHT_PER_WORKER = 2
+
+
+def cohort_filters(program_studi_id: Optional[int], angkatan: Optional[str]) -> list:
+    """CalonMahasiswa filters selecting a program studi and/or angkatan; at least one is required"""
+    if program_studi_id is None and not angkatan:
+        raise ValueError("Pilih program studi atau angkatan")
+    filters = [CalonMahasiswa.nim.isnot(None)]
+    if program_studi_id is not None:
+        filters.append(CalonMahasiswa.program_studi_id == program_studi_id)
+    if angkatan:
+        # NIM = tahun angkatan + kode prodi + nomor urut
+        filters.append(CalonMahasiswa.nim.like(f"{angkatan}%"))
+    return filters
+
+
+def count_cohort(db: Session, program_studi_id: Optional[int] = None, angkatan: Optional[str] = None) -> int:
+    return db.query(CalonMahasiswa).filter(*cohort_filters(program_studi_id, angkatan)).count()
+
+
+def iter_cohort_transcripts(
+    db: Session,
+    program_studi_id: Optional[int] = None,
+    angkatan: Optional[str] = None,
+    chunk_size: int = COHORT_CHUNK_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """Yield the transcript of every student of the cohort, in NIM order, two queries per chunk"""
+    filters = cohort_filters(program_studi_id, angkatan)
+    last_nim = None
+    while True:
+        query = db.query(
+            CalonMahasiswa.nim, CalonMahasiswa.nama_lengkap, ProgramStudi.nama, ProgramStudi.fakultas
+        ).outerjoin(
+            ProgramStudi, ProgramStudi.id == CalonMahasiswa.program_studi_id
+        ).filter(*filters)
+        if last_nim is not None:
+            query = query.filter(CalonMahasiswa.nim > last_nim)
+        students = query.order_by(CalonMahasiswa.nim).limit(chunk_size).all()
+        if not students:
+            return
+
+        grades: Dict[str, List[TranscriptRow]] = {student.nim: [] for student in students}
+        rows = db.query(
+            Grade.nim, Grade.matakuliah_id, Grade.semester, Grade.sks, Grade.nilai_huruf, Grade.nilai_angka,
+            Matakuliah.kode, Matakuliah.nama
+        ).outerjoin(
+            Matakuliah, Matakuliah.id == Grade.matakuliah_id
+        ).filter(Grade.nim.in_(list(grades))).order_by(Grade.id).all()
+        for row in rows:
+            grades[row.nim].append(TranscriptRow(
+                row.matakuliah_id, row.semester, row.sks, row.nilai_huruf, row.nilai_angka, row.kode, row.nama
+            ))
+
+        for nim, nama, program_studi, fakultas in students:
+            biodata = {
+                "nim": nim,
+                "nama": nama,
+                "program_studi": program_studi or "",
+                "fakultas": fakultas or ""
+            }
+            yield build_transcript(biodata, grades[nim])
+
+        last_nim = students[-1].nim
+        if len(students) < chunk_size:
+            return
+
+
+class _ZipStream:
+    """Write-only, non-seekable file object that hands out what zipfile wrote so far"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_transcript_zip(
+    transcripts: Iterator[Dict[str, Any]],
+    workers: int = COHORT_RENDER_WORKERS
+) -> Iterator[bytes]:
+    """
+    Render transcripts and yield a ZIP archive piece by piece, one transkrip_{nim}.pdf per
+    transcript in completion order. workers=0 renders in the calling process.
+    """
+    sink = _ZipStream()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+
+    def add_entry(nim: str, pdf: bytes) -> bytes:
+        archive.writestr(f"transkrip_{nim}.pdf", pdf)
+        return sink.drain()
+
+    def cached_or_none(transcript: Dict[str, Any]) -> Tuple[str, Optional[bytes]]:
+        nim = transcript["biodata"]["nim"]
+        return nim, transcript_pdf_cache.get(transcript_hash(transcript))
+
+    if workers <= 0:
+        for transcript in transcripts:
+            nim, pdf = cached_or_none(transcript)
+            yield add_entry(nim, pdf if pdf is not None else render_transcript_pdf(transcript))
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        try:
+            pending = {}
+            for transcript in transcripts:
+                nim, pdf = cached_or_none(transcript)
+                if pdf is not None:
+                    yield add_entry(nim, pdf)
+                    continue
+                pending[executor.submit(render_transcript_pdf, transcript)] = nim
+                # Bounded window: never queue more PDFs than the workers are about to produce
+                while len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield add_entry(pending.pop(future), future.result())
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield add_entry(pending.pop(future), future.result())
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    archive.close()
+    yield sink.drain()
+
+
+def stream_cohort_transcripts_zip(
+    db: Session,
+    program_studi_id: Optional[int] = None,
+    angkatan: Optional[str] = None,
+    workers: int = COHORT_RENDER_WORKERS
+) -> Iterator[bytes]:
+    """ZIP of every transcript of the cohort, as an iterator of byte chunks"""
+    return stream_transcript_zip(iter_cohort_transcripts(db, program_studi_id, angkatan), workers)
+
+
+def write_cohort_transcripts_zip(
+    db: Session,
+    path: str,
+    program_studi_id: Optional[int] = None,
+    angkatan: Optional[str] = None,
+    workers: int = COHORT_RENDER_WORKERS
+) -> int:
+    """Batch job: write the cohort ZIP to a file; returns the number of transcripts"""
+    total = count_cohort(db, program_studi_id, angkatan)
+    with open(path, "wb") as output:
+        for chunk in stream_cohort_transcripts_zip(db, program_studi_id, angkatan, workers):
+            output.write(chunk)
+    return total
+
+
+if __name__ == "__main__":
+    # python -m grades_system.services.cohort_transcripts --program-studi-id 1 --angkatan 2021 -o transkrip.zip
+    import argparse
+    from pmb_system.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Transkrip PDF satu angkatan/prodi dalam satu ZIP")
+    parser.add_argument("--program-studi-id", type=int)
+    parser.add_argument("--angkatan")
+    parser.add_argument("--workers", type=int, default=COHORT_RENDER_WORKERS)
+    parser.add_argument("-o", "--output", default="transkrip.zip")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        written = write_cohort_transcripts_zip(
+            session, args.output, args.program_studi_id, args.angkatan, args.workers
+        )
+        print(f"Wrote {written} transcripts to {args.output}")
+    finally:
+        session.close()
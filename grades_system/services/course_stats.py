@@ -0,0 +1,221 @@
+"""
+Incrementally maintained grade distribution per course
+
+course_grade_stats keeps, per (matakuliah_id, semester, dosen_id), the number of grades of
+every letter, the summed presensi of every letter and Σnilai_angka. crud.create_grade,
+update_grade and delete_grade call apply_course_stats_change before committing, so reading
+the statistics of a course is a lookup of a few rows however many grades it has.
+rebuild_course_grade_stats recomputes everything from the grades table.
+"""
+from typing import Optional, Tuple, Dict, Any, Iterable, List
+from sqlalchemy import insert, func, case, tuple_
+from sqlalchemy.orm import Session
+from grades_system.models import Grade, CourseGradeStats
+from krs_system.models import Matakuliah
+from schedule_system.models import Dosen
+
+
+GRADE_LETTERS = ("A", "B", "C", "D", "E")
+
+# (matakuliah_id, semester, dosen_id) of a stats row
+StatsKey = Tuple[int, str, int]
+# (key, nilai_huruf, nilai_angka, presensi) of a grade before or after a change
+CourseStatsState = Tuple[StatsKey, str, float, float]
+
+
+def course_stats_state(grade: Grade) -> CourseStatsState:
+    return (
+        (grade.matakuliah_id, grade.semester, grade.dosen_id),
+        grade.nilai_huruf,
+        grade.nilai_angka,
+        grade.presensi or 0.0
+    )
+
+
+def _stats_row(db: Session, key: StatsKey) -> Optional[CourseGradeStats]:
+    matakuliah_id, semester, dosen_id = key
+    return db.query(CourseGradeStats).filter(
+        CourseGradeStats.matakuliah_id == matakuliah_id,
+        CourseGradeStats.semester == semester,
+        CourseGradeStats.dosen_id == dosen_id
+    ).first()
+
+
+def _add_grade(row: CourseGradeStats, state: CourseStatsState, sign: int) -> None:
+    _, huruf, nilai_angka, presensi = state
+    letter = huruf.lower()
+    setattr(row, f"count_{letter}", (getattr(row, f"count_{letter}") or 0) + sign)
+    setattr(row, f"presensi_{letter}", (getattr(row, f"presensi_{letter}") or 0.0) + sign * presensi)
+    row.total_nilai = (row.total_nilai or 0.0) + sign * nilai_angka
+
+
+def apply_course_stats_change(
+    db: Session,
+    old: Optional[CourseStatsState],
+    new: Optional[CourseStatsState]
+) -> None:
+    """
+    Update the statistics for one grade change; the caller commits
+
+    Args:
+        db: Database session with the grade change already applied (it is flushed here)
+        old: State before the change, None for a new grade
+        new: State after the change, None for a deleted grade
+    """
+    db.flush()
+
+    rows: Dict[StatsKey, CourseGradeStats] = {}
+    untracked = []
+    for state in (old, new):
+        if state is None or state[0] in rows or state[0] in untracked:
+            continue
+        row = _stats_row(db, state[0])
+        if row is None:
+            # First grade seen for this class (grades may predate the table): count it from the grades table
+            untracked.append(state[0])
+        else:
+            rows[state[0]] = row
+
+    if untracked:
+        _rebuild_rows(db, keys=untracked)
+    if old is not None and old[0] in rows:
+        _add_grade(rows[old[0]], old, -1)
+    if new is not None and new[0] in rows:
+        _add_grade(rows[new[0]], new, 1)
+    db.flush()
+
+
+def _rebuild_rows(
+    db: Session,
+    matakuliah_ids: Optional[Iterable[int]] = None,
+    keys: Optional[List[StatsKey]] = None
+) -> int:
+    """Replace the stats rows of some courses, some keys, or everything with one grouped query; no commit"""
+    columns = [Grade.matakuliah_id, Grade.semester, Grade.dosen_id]
+    aggregates = []
+    for letter in GRADE_LETTERS:
+        is_letter = Grade.nilai_huruf == letter
+        aggregates.append(func.sum(case((is_letter, 1), else_=0)).label(f"count_{letter.lower()}"))
+        aggregates.append(
+            func.sum(case((is_letter, func.coalesce(Grade.presensi, 0.0)), else_=0.0)).label(f"presensi_{letter.lower()}")
+        )
+    aggregates.append(func.sum(Grade.nilai_angka).label("total_nilai"))
+
+    query = db.query(*columns, *aggregates)
+    delete = db.query(CourseGradeStats)
+    if matakuliah_ids is not None:
+        matakuliah_ids = list(set(matakuliah_ids))
+        query = query.filter(Grade.matakuliah_id.in_(matakuliah_ids))
+        delete = delete.filter(CourseGradeStats.matakuliah_id.in_(matakuliah_ids))
+    if keys is not None:
+        query = query.filter(tuple_(*columns).in_(keys))
+        delete = delete.filter(tuple_(
+            CourseGradeStats.matakuliah_id, CourseGradeStats.semester, CourseGradeStats.dosen_id
+        ).in_(keys))
+    rows = query.group_by(*columns).all()
+
+    delete.delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(CourseGradeStats), [dict(row._mapping) for row in rows])
+    return len(rows)
+
+
+def refresh_course_stats(db: Session, matakuliah_ids: Iterable[int]) -> None:
+    """Recompute the statistics of the given courses in the caller's transaction (used by bulk grade writes)"""
+    db.flush()
+    _rebuild_rows(db, matakuliah_ids=matakuliah_ids)
+
+
+def rebuild_course_grade_stats(db: Session, matakuliah_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Recompute the statistics from the grades table, for one course or all of them
+
+    Returns:
+        {"rows": int}
+    """
+    try:
+        count = _rebuild_rows(db, matakuliah_ids=[matakuliah_id] if matakuliah_id is not None else None)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"rows": count}
+
+
+def _summarize(counts: Dict[str, int], presensi: Dict[str, float], total_nilai: float) -> Dict[str, Any]:
+    total = sum(counts.values())
+    passed = sum(counts[letter] for letter in GRADE_LETTERS if letter != "E")
+    return {
+        "total": total,
+        "counts": counts,
+        "mean_nilai": round(total_nilai / total, 2) if total else 0.0,
+        "pass_rate": round(100.0 * passed / total, 1) if total else 0.0,
+        "mean_presensi": round(sum(presensi.values()) / total, 1) if total else 0.0,
+        # Mean presensi of the students who got each letter
+        "presensi_by_grade": {
+            letter: round(presensi[letter] / counts[letter], 1) if counts[letter] else None
+            for letter in GRADE_LETTERS
+        }
+    }
+
+
+def format_course_stats(row: CourseGradeStats) -> Dict[str, Any]:
+    counts = {letter: getattr(row, f"count_{letter.lower()}") or 0 for letter in GRADE_LETTERS}
+    presensi = {letter: getattr(row, f"presensi_{letter.lower()}") or 0.0 for letter in GRADE_LETTERS}
+    return {
+        "matakuliah_id": row.matakuliah_id,
+        "semester": row.semester,
+        "dosen_id": row.dosen_id,
+        **_summarize(counts, presensi, row.total_nilai or 0.0)
+    }
+
+
+def get_course_stats(db: Session, matakuliah_id: int, semester: Optional[str] = None) -> Dict[str, Any]:
+    """Statistics of one course: per (semester, dosen) and combined"""
+    query = db.query(CourseGradeStats).filter(CourseGradeStats.matakuliah_id == matakuliah_id)
+    if semester:
+        query = query.filter(CourseGradeStats.semester == semester)
+    rows = query.order_by(CourseGradeStats.semester, CourseGradeStats.dosen_id).all()
+
+    counts = {letter: sum(getattr(row, f"count_{letter.lower()}") or 0 for row in rows) for letter in GRADE_LETTERS}
+    presensi = {letter: sum(getattr(row, f"presensi_{letter.lower()}") or 0.0 for row in rows) for letter in GRADE_LETTERS}
+    return {
+        "matakuliah_id": matakuliah_id,
+        "semester": semester,
+        "overall": _summarize(counts, presensi, sum(row.total_nilai or 0.0 for row in rows)),
+        "classes": [format_course_stats(row) for row in rows]
+    }
+
+
+def list_course_stats(
+    db: Session,
+    semester: Optional[str] = None,
+    dosen_id: Optional[int] = None,
+    program_studi: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+) -> Dict[str, Any]:
+    """Faculty-wide listing of the stats rows with course and lecturer names"""
+    query = db.query(CourseGradeStats, Matakuliah.kode, Matakuliah.nama, Dosen.nama).outerjoin(
+        Matakuliah, Matakuliah.id == CourseGradeStats.matakuliah_id
+    ).outerjoin(
+        Dosen, Dosen.id == CourseGradeStats.dosen_id
+    )
+    if semester:
+        query = query.filter(CourseGradeStats.semester == semester)
+    if dosen_id is not None:
+        query = query.filter(CourseGradeStats.dosen_id == dosen_id)
+    if program_studi:
+        query = query.filter(Dosen.program_studi == program_studi)
+
+    total = query.count()
+    rows = query.order_by(
+        Matakuliah.kode, CourseGradeStats.semester, CourseGradeStats.dosen_id
+    ).offset(skip).limit(limit).all()
+    return {
+        "total": total,
+        "items": [
+            {**format_course_stats(stats), "kode_mk": kode, "nama_mk": nama_mk, "nama_dosen": nama_dosen}
+            for stats, kode, nama_mk, nama_dosen in rows
+        ]
+    }
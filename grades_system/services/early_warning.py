@@ -0,0 +1,178 @@
+"""
+Nightly academic early-warning batch
+
+For every student with grades in the evaluated semester, three signals are computed over
+the whole student body at once with NumPy:
+    • IPS_TURUN: IPS dropped by IPS_DROP_THRESHOLD or more since the student's previous semester
+    • SKS_KURANG: passed SKS (best grade per course) at least SKS_SHORTFALL_THRESHOLD behind
+      TARGET_SKS_PER_SEMESTER × the number of semesters the student has grades in
+    • NILAI_E: E_COUNT_THRESHOLD or more E grades in the evaluated semester
+Grades are read in one query and the advisors in another. Flagged students replace the
+semester's rows in academic_warning, which the advisors' endpoint pages through.
+"""
+from typing import Dict, Any, Optional
+
+import numpy as np
+from sqlalchemy import insert, func
+from sqlalchemy.orm import Session
+
+from grades_system.models import Grade, AcademicWarning
+from grades_system.services.cohort_gpa import compute_cohort_ipk
+from grades_system.services.gpa_summary import PASSING_NILAI
+from krs_system.models import KRS
+
+
+IPS_DROP_THRESHOLD = 0.5
+TARGET_SKS_PER_SEMESTER = 18  # 144 SKS in 8 semesters
+SKS_SHORTFALL_THRESHOLD = 9
+E_COUNT_THRESHOLD = 1
+
+FLAG_IPS_DROP = "IPS_TURUN"
+FLAG_SKS_SHORTFALL = "SKS_KURANG"
+FLAG_E_GRADES = "NILAI_E"
+
+
+def compute_academic_warnings(db: Session, semester: str) -> Dict[str, np.ndarray]:
+    """Signals of every student with grades in the semester, as arrays aligned on "nim" """
+    active = db.query(Grade.nim).filter(Grade.semester == semester)
+    rows = db.query(
+        Grade.nim, Grade.id, Grade.matakuliah_id, Grade.semester, Grade.sks, Grade.nilai_angka, Grade.nilai_huruf
+    ).filter(Grade.semester <= semester, Grade.nim.in_(active)).all()
+    if not rows:
+        return {"nim": np.array([], dtype=object)}
+
+    nims, student_idx = np.unique(np.array([row.nim for row in rows], dtype=object), return_inverse=True)
+    semesters, semester_idx = np.unique(np.array([row.semester for row in rows], dtype=object), return_inverse=True)
+    n_students, n_semesters = len(nims), len(semesters)
+    target = int(np.searchsorted(semesters, semester))
+
+    grade_ids = np.array([row.id for row in rows], dtype=np.int64)
+    course_ids = np.array([row.matakuliah_id for row in rows], dtype=np.int64)
+    sks = np.array([row.sks for row in rows], dtype=np.int64)
+    nilai = np.array([row.nilai_angka for row in rows], dtype=float)
+    is_e = np.array([row.nilai_huruf == "E" for row in rows], dtype=bool)
+
+    # IPS of every (student, semester) cell: passing grades only, like calculate_ips
+    cell = student_idx * n_semesters + semester_idx
+    passing = nilai >= PASSING_NILAI
+    size = n_students * n_semesters
+    mutu = np.bincount(cell, weights=sks * nilai * passing, minlength=size).reshape(n_students, n_semesters)
+    sks_passed = np.bincount(cell, weights=sks * passing, minlength=size).reshape(n_students, n_semesters)
+    has_grades = np.bincount(cell, minlength=size).reshape(n_students, n_semesters) > 0
+    ips = np.zeros((n_students, n_semesters))
+    np.divide(mutu, sks_passed, out=ips, where=sks_passed > 0)
+    ips = np.round(ips, 2)
+
+    current_ips = ips[:, target]
+    earlier = has_grades[:, :target]
+    has_previous = earlier.any(axis=1) if target else np.zeros(n_students, dtype=bool)
+    previous_idx = target - 1 - np.argmax(earlier[:, ::-1], axis=1) if target else np.zeros(n_students, dtype=int)
+    previous_ips = np.where(has_previous, ips[np.arange(n_students), previous_idx], np.nan)
+    ips_drop = np.where(has_previous, np.round(previous_ips - current_ips, 2), 0.0)
+
+    _, sks_lulus = compute_cohort_ipk(student_idx, course_ids, grade_ids, sks, nilai, n_students)
+    expected = TARGET_SKS_PER_SEMESTER * has_grades.sum(axis=1)
+    sks_shortfall = np.maximum(expected - sks_lulus, 0)
+
+    e_count = np.bincount(student_idx, weights=is_e & (semester_idx == target), minlength=n_students).astype(int)
+
+    return {
+        "nim": nims,
+        "ips": current_ips,
+        "previous_ips": previous_ips,
+        "ips_drop": ips_drop,
+        "sks_lulus": sks_lulus,
+        "sks_shortfall": sks_shortfall,
+        "e_count": e_count,
+        FLAG_IPS_DROP: ips_drop >= IPS_DROP_THRESHOLD,
+        FLAG_SKS_SHORTFALL: sks_shortfall >= SKS_SHORTFALL_THRESHOLD,
+        FLAG_E_GRADES: e_count >= E_COUNT_THRESHOLD,
+    }
+
+
+def run_academic_early_warning(db: Session, semester: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Recompute academic_warning for a semester (default: the latest semester with grades)
+
+    Returns:
+        {"semester", "students", "flagged", "by_flag": {flag: count}}
+    """
+    if semester is None:
+        semester = db.query(func.max(Grade.semester)).scalar()
+        if semester is None:
+            return {"semester": None, "students": 0, "flagged": 0, "by_flag": {}}
+
+    signals = compute_academic_warnings(db, semester)
+    flag_names = [FLAG_IPS_DROP, FLAG_SKS_SHORTFALL, FLAG_E_GRADES]
+    n_students = len(signals["nim"])
+    if n_students:
+        flag_matrix = np.column_stack([signals[name] for name in flag_names])
+        severity = flag_matrix.sum(axis=1)
+        flagged = np.flatnonzero(severity > 0)
+    else:
+        flag_matrix = np.zeros((0, len(flag_names)), dtype=bool)
+        severity = np.zeros(0, dtype=int)
+        flagged = np.zeros(0, dtype=int)
+
+    advisors = dict(db.query(KRS.nim, KRS.dosen_pa_id).filter(
+        KRS.semester == semester,
+        KRS.nim.in_([signals["nim"][i] for i in flagged])
+    ).all()) if len(flagged) else {}
+
+    records = [
+        {
+            "nim": signals["nim"][i],
+            "semester": semester,
+            "dosen_pa_id": advisors.get(signals["nim"][i]),
+            "ips": float(signals["ips"][i]),
+            "previous_ips": None if np.isnan(signals["previous_ips"][i]) else float(signals["previous_ips"][i]),
+            "ips_drop": float(signals["ips_drop"][i]),
+            "sks_lulus": int(signals["sks_lulus"][i]),
+            "sks_shortfall": int(signals["sks_shortfall"][i]),
+            "e_count": int(signals["e_count"][i]),
+            "flags": ",".join(name for name, raised in zip(flag_names, flag_matrix[i]) if raised),
+            "severity": int(severity[i]),
+        }
+        for i in flagged
+    ]
+
+    try:
+        db.query(AcademicWarning).filter(AcademicWarning.semester == semester).delete(synchronize_session=False)
+        if records:
+            db.execute(insert(AcademicWarning), records)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "semester": semester,
+        "students": n_students,
+        "flagged": len(records),
+        "by_flag": {name: int(flag_matrix[:, k].sum()) for k, name in enumerate(flag_names)}
+    }
+
+
+def get_academic_warnings(
+    db: Session,
+    semester: Optional[str] = None,
+    dosen_pa_id: Optional[int] = None,
+    flag: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50
+) -> Dict[str, Any]:
+    """Flagged students of a semester (default: the latest computed), most severe first"""
+    if semester is None:
+        semester = db.query(func.max(AcademicWarning.semester)).scalar()
+
+    query = db.query(AcademicWarning).filter(AcademicWarning.semester == semester)
+    if dosen_pa_id is not None:
+        query = query.filter(AcademicWarning.dosen_pa_id == dosen_pa_id)
+    if flag:
+        query = query.filter(AcademicWarning.flags.contains(flag))
+
+    total = query.count()
+    items = query.order_by(
+        AcademicWarning.severity.desc(), AcademicWarning.ips_drop.desc(), AcademicWarning.nim
+    ).offset(skip).limit(limit).all()
+    return {"semester": semester, "total": total, "items": items}
@@ -1,11 +1,100 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterable, NamedTuple, Optional
 from grades_system.models import Grade
+from grades_system.services.gpa_summary import lookup_gpa, CUMULATIVE
 from krs_system.models import Matakuliah
-from pmb_system.models import CalonMahasiswa
+from pmb_system.models import CalonMahasiswa, ProgramStudi
 from sqlalchemy import and_, func
 
 
+class TranscriptRow(NamedTuple):
+    """One grade of a transcript with its course"""
+    matakuliah_id: int
+    semester: str
+    sks: int
+    nilai_huruf: str
+    nilai_angka: float
+    kode: str
+    nama: str
+
+
+TRANSCRIPT_MEMO_SIZE = 4096  # Transcripts kept per database
+TRANSCRIPT_MEMO_TTL = 300  # seconds; bounds staleness from biodata and course changes, which do not invalidate
+
+
+class _EngineTranscripts:
+    def __init__(self):
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # nim -> (stored_at, transcript)
+        self.generation = 0
+
+
+class TranscriptMemo:
+    """
+    LRU of assembled transcripts per NIM, kept separately for every database engine.
+    A transcript computed while an invalidation happened is not stored, so a read that
+    raced with a grade write cannot put back the old transcript. Entries expire after
+    ttl seconds, so renamed students, prodi and courses show up without an invalidation.
+    """
+
+    def __init__(self, max_entries: int = TRANSCRIPT_MEMO_SIZE, ttl: float = TRANSCRIPT_MEMO_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._engines: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _engine(self, db: Session) -> _EngineTranscripts:
+        bind = db.get_bind()
+        memo = self._engines.get(bind)
+        if memo is None:
+            memo = self._engines[bind] = _EngineTranscripts()
+        return memo
+
+    def generation(self, db: Session) -> int:
+        with self._lock:
+            return self._engine(db).generation
+
+    def get(self, db: Session, nim: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            memo = self._engine(db)
+            entry = memo.entries.get(nim)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl:
+                del memo.entries[nim]
+                return None
+            memo.entries.move_to_end(nim)
+            return entry[1]
+
+    def put(self, db: Session, nim: str, transcript: Dict[str, Any], generation: int) -> None:
+        with self._lock:
+            memo = self._engine(db)
+            if memo.generation != generation:
+                return
+            memo.entries[nim] = (time.monotonic(), transcript)
+            memo.entries.move_to_end(nim)
+            while len(memo.entries) > self.max_entries:
+                memo.entries.popitem(last=False)
+
+    def invalidate(self, db: Session, nims: Iterable[str]) -> None:
+        with self._lock:
+            memo = self._engine(db)
+            memo.generation += 1
+            for nim in nims:
+                memo.entries.pop(nim, None)
+
+
+transcript_memo = TranscriptMemo()
+
+
+def invalidate_transcripts(db: Session, nims: Iterable[str]) -> None:
+    """Drop memoized transcripts after their grades changed (call after the commit)"""
+    transcript_memo.invalidate(db, nims)
+
+
 def calculate_ips(db: Session, nim: str, semester: str) -> float:
     """
     Calculate IPS (Index Prestasi Semester) for a student in a specific semester
@@ -14,7 +103,12 @@ def calculate_ips(db: Session, nim: str, semester: str) -> float:
     • hanya hitung MK dengan nilai_angka >= 1.0 (nilai D ke atas)
     • IPS = Σ(SKS × nilai_angka) / Σ(SKS)
     • jika tidak ada nilai → return 0.0
+    Dibaca dari student_gpa_summary bila mahasiswa sudah punya ringkasan.
     """
+    summary_ips = lookup_gpa(db, nim, semester)
+    if summary_ips is not None:
+        return summary_ips
+
     # Get grades for the student in the specified semester with passing grades (>= D)
     grades = db.query(Grade).filter(
         and_(
@@ -51,7 +145,12 @@ def calculate_ipk(db: Session, nim: str) -> float:
     • hanya hitung MK dengan nilai >= D
     • IPK = Σ(SKS × nilai_angka) / Σ(SKS)
     • jika mahasiswa semester 1 → return 0.0
+    Dibaca dari student_gpa_summary bila mahasiswa sudah punya ringkasan.
     """
+    summary_ipk = lookup_gpa(db, nim, CUMULATIVE)
+    if summary_ipk is not None:
+        return summary_ipk
+
     # Get all grades for the student with passing grades (>= D)
     all_grades = db.query(Grade).filter(
         and_(
@@ -104,11 +203,46 @@ def get_transcript(db: Session, nim: str) -> Dict[str, Any]:
       "ipk": float,
       "predikat": "Cum Laude" / "Sangat Memuaskan" / "Memuaskan"
     }
+    Memoized per NIM; grade writes in grades_system.crud invalidate the student's entry,
+    other changes (biodata, prodi, course names) show up within TRANSCRIPT_MEMO_TTL seconds.
+    The returned dict is shared with later callers and must not be modified.
     """
-    # Get student information
-    student = db.query(CalonMahasiswa).filter(CalonMahasiswa.nim == nim).first()
-    
-    if not student:
+    cached = transcript_memo.get(db, nim)
+    if cached is not None:
+        return cached
+
+    generation = transcript_memo.generation(db)
+    transcript = _load_transcript(db, nim)
+    if transcript["biodata"]:
+        transcript_memo.put(db, nim, transcript, generation)
+    return transcript
+
+
+def _load_transcript(db: Session, nim: str) -> Dict[str, Any]:
+    """Student, prodi, grades and courses in one joined query (one row per grade)"""
+    student_id = db.query(func.min(CalonMahasiswa.id)).filter(CalonMahasiswa.nim == nim).scalar_subquery()
+    rows = db.query(
+        CalonMahasiswa.nim,
+        CalonMahasiswa.nama_lengkap,
+        ProgramStudi.nama.label("program_studi"),
+        ProgramStudi.fakultas,
+        Grade.id.label("grade_id"),
+        Grade.matakuliah_id,
+        Grade.semester,
+        Grade.sks,
+        Grade.nilai_huruf,
+        Grade.nilai_angka,
+        Matakuliah.kode,
+        Matakuliah.nama.label("nama_mk")
+    ).outerjoin(
+        ProgramStudi, ProgramStudi.id == CalonMahasiswa.program_studi_id
+    ).outerjoin(
+        Grade, Grade.nim == CalonMahasiswa.nim
+    ).outerjoin(
+        Matakuliah, Matakuliah.id == Grade.matakuliah_id
+    ).filter(CalonMahasiswa.id == student_id).order_by(Grade.id).all()
+
+    if not rows:
         return {
             "biodata": {},
             "semester_list": [],
@@ -116,103 +250,94 @@ def get_transcript(db: Session, nim: str) -> Dict[str, Any]:
             "ipk": 0.0,
             "predikat": ""
         }
-    
-    # Get all grades for the student (including all grades, not just passing)
-    all_grades = db.query(Grade).filter(Grade.nim == nim).all()
-    
-    # Get course information for each grade
-    course_info = {}
-    for grade in all_grades:
-        if grade.matakuliah_id not in course_info:
-            matakuliah = db.query(Matakuliah).filter(Matakuliah.id == grade.matakuliah_id).first()
-            if matakuliah:
-                course_info[grade.matakuliah_id] = {
-                    "kode": matakuliah.kode,
-                    "nama": matakuliah.nama
-                }
-    
+
+    first = rows[0]
+    biodata = {
+        "nim": first.nim,
+        "nama": first.nama_lengkap,
+        "program_studi": first.program_studi or "",
+        "fakultas": first.fakultas or ""
+    }
+    grades = [
+        TranscriptRow(row.matakuliah_id, row.semester, row.sks, row.nilai_huruf, row.nilai_angka, row.kode, row.nama_mk)
+        for row in rows if row.grade_id is not None
+    ]
+    return build_transcript(biodata, grades)
+
+
+# (IPK minimum, predikat), highest first; below the last threshold the predikat is LOWEST_PREDIKAT
+PREDIKAT_THRESHOLDS = [
+    (3.50, "Cum Laude"),
+    (3.00, "Sangat Memuaskan"),
+    (2.50, "Memuaskan"),
+    (2.00, "Cukup"),
+]
+LOWEST_PREDIKAT = "Kurang"
+
+
+def get_predikat(ipk: float) -> str:
+    """Predikat kelulusan berdasarkan IPK"""
+    for minimum, predikat in PREDIKAT_THRESHOLDS:
+        if ipk >= minimum:
+            return predikat
+    return LOWEST_PREDIKAT
+
+
+def build_transcript(biodata: Dict[str, Any], grades: Iterable[TranscriptRow]) -> Dict[str, Any]:
+    """
+    Assemble the get_transcript structure from biodata and the student's grade rows
+    (in grade id order), without touching the database
+    """
+    grades = list(grades)
+
     # Group grades by semester and by course (to handle repeats)
     semester_courses = {}
     all_best_grades = {}  # For IPK calculation - best grade per course
     
-    for grade in all_grades:
-        semester = grade.semester
-        matakuliah_id = grade.matakuliah_id
-        
-        # Group by semester
-        if semester not in semester_courses:
-            semester_courses[semester] = []
-        
+    for grade in grades:
         # For calculating best grades per course
-        if matakuliah_id not in all_best_grades or grade.nilai_angka > all_best_grades[matakuliah_id].nilai_angka:
-            all_best_grades[matakuliah_id] = grade
+        if grade.matakuliah_id not in all_best_grades or grade.nilai_angka > all_best_grades[grade.matakuliah_id].nilai_angka:
+            all_best_grades[grade.matakuliah_id] = grade
         
         # Add course to semester
-        course_data = {
-            "kode": course_info.get(matakuliah_id, {}).get("kode", ""),
-            "nama": course_info.get(matakuliah_id, {}).get("nama", ""),
+        semester_courses.setdefault(grade.semester, []).append({
+            "kode": grade.kode or "",
+            "nama": grade.nama or "",
             "sks": grade.sks,
             "nilai_huruf": grade.nilai_huruf,
             "nilai_angka": grade.nilai_angka,
             "mutu": grade.sks * grade.nilai_angka
-        }
-        semester_courses[semester].append(course_data)
+        })
     
     # Calculate IPK using best grades per course (only passing grades)
-    passing_best_grades = {k: v for k, v in all_best_grades.items() if v.nilai_angka >= 1.0}
-    
     total_sks_ipk = 0
     total_sks_mutu_ipk = 0.0
     
-    for grade in passing_best_grades.values():
-        total_sks_mutu_ipk += grade.sks * grade.nilai_angka
-        total_sks_ipk += grade.sks
+    for grade in all_best_grades.values():
+        if grade.nilai_angka >= 1.0:
+            total_sks_mutu_ipk += grade.sks * grade.nilai_angka
+            total_sks_ipk += grade.sks
     
     ipk = 0.0
     if total_sks_ipk > 0:
-        ipk = total_sks_mutu_ipk / total_sks_ipk
-        ipk = round(ipk, 2)
+        ipk = round(total_sks_mutu_ipk / total_sks_ipk, 2)
     
     # Calculate total SKS (including failed courses)
-    total_sks = sum(grade.sks for grade in all_grades)
-    
-    # Determine predikat based on IPK
-    predikat = ""
-    if ipk >= 3.50:
-        predikat = "Cum Laude"
-    elif ipk >= 3.00:
-        predikat = "Sangat Memuaskan"
-    elif ipk >= 2.50:
-        predikat = "Memuaskan"
-    elif ipk >= 2.00:
-        predikat = "Cukup"
-    else:
-        predikat = "Kurang"
+    total_sks = sum(grade.sks for grade in grades)
     
     # Format semester list
-    semester_list = []
-    for semester, courses in sorted(semester_courses.items()):
-        semester_data = {
+    semester_list = [
+        {
             "semester": semester,
             "courses": sorted(courses, key=lambda x: x["kode"])
         }
-        semester_list.append(semester_data)
-    
-    # Sort semesters
-    semester_list = sorted(semester_list, key=lambda x: x["semester"])
-    
-    # Create result
-    result = {
-        "biodata": {
-            "nim": student.nim,
-            "nama": student.nama_lengkap,
-            "program_studi": student.program_studi.nama if student.program_studi else "",
-            "fakultas": student.program_studi.fakultas if student.program_studi else ""
-        },
+        for semester, courses in sorted(semester_courses.items())
+    ]
+    
+    return {
+        "biodata": biodata,
         "semester_list": semester_list,
         "total_sks": total_sks,
         "ipk": ipk,
-        "predikat": predikat
+        "predikat": get_predikat(ipk)
     }
-    
-    return result
\ No newline at end of file
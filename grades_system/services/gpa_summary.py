@@ -0,0 +1,210 @@
+"""
+Incrementally maintained IPS/IPK totals
+
+student_gpa_summary keeps Σ(sks × nilai_angka) and Σsks of passing grades (nilai_angka >= 1.0)
+per (nim, semester), plus a KUMULATIF row over the best passing grade of every course, which
+student_best_grade tracks. crud.create_grade, update_grade and delete_grade call
+apply_grade_change before committing, so the totals change in the same transaction as the
+grade. rebuild_gpa_summary recomputes everything from the grades table.
+"""
+from typing import Optional, Tuple, Dict, Any, Iterable
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from grades_system.models import Grade, StudentGpaSummary, StudentBestGrade
+
+
+CUMULATIVE = "KUMULATIF"
+PASSING_NILAI = 1.0  # Nilai D ke atas
+
+# (semester, sks, nilai_angka) of a grade before or after a change
+GradeState = Tuple[str, int, float]
+
+
+def grade_state(grade: Grade) -> GradeState:
+    return grade.semester, grade.sks, grade.nilai_angka
+
+
+def _add_totals(db: Session, nim: str, semester: str, mutu: float, sks: int) -> None:
+    summary = db.query(StudentGpaSummary).filter(
+        StudentGpaSummary.nim == nim,
+        StudentGpaSummary.semester == semester
+    ).first()
+    if summary is None:
+        summary = StudentGpaSummary(nim=nim, semester=semester, total_mutu=0.0, total_sks=0)
+        db.add(summary)
+    summary.total_mutu = (summary.total_mutu or 0.0) + mutu
+    summary.total_sks = (summary.total_sks or 0) + sks
+    db.flush()
+
+
+def apply_grade_change(
+    db: Session,
+    nim: str,
+    matakuliah_id: int,
+    old: Optional[GradeState],
+    new: Optional[GradeState]
+) -> None:
+    """
+    Update the summary for one grade change; the caller commits
+
+    Args:
+        db: Database session with the grade change already applied (it is flushed here)
+        nim: Student of the grade
+        matakuliah_id: Course of the grade
+        old: State before the change, None for a new grade
+        new: State after the change, None for a deleted grade
+    """
+    db.flush()
+
+    tracked = db.query(StudentGpaSummary.id).filter(
+        StudentGpaSummary.nim == nim,
+        StudentGpaSummary.semester == CUMULATIVE
+    ).first()
+    if tracked is None:
+        # First change seen for this student (grades may predate the summary): start from the grades table
+        _rebuild_rows(db, [nim])
+        return
+
+    # IPS: every passing grade of the semester counts
+    if old is not None and old[2] >= PASSING_NILAI:
+        _add_totals(db, nim, old[0], -old[1] * old[2], -old[1])
+    if new is not None and new[2] >= PASSING_NILAI:
+        _add_totals(db, nim, new[0], new[1] * new[2], new[1])
+
+    # IPK: only the best passing grade of the course counts
+    best = db.query(Grade).filter(
+        Grade.nim == nim,
+        Grade.matakuliah_id == matakuliah_id,
+        Grade.nilai_angka >= PASSING_NILAI
+    ).order_by(Grade.nilai_angka.desc(), Grade.id).first()
+    current = db.query(StudentBestGrade).filter(
+        StudentBestGrade.nim == nim,
+        StudentBestGrade.matakuliah_id == matakuliah_id
+    ).first()
+
+    mutu_delta, sks_delta = 0.0, 0
+    if current is not None:
+        mutu_delta -= current.sks * current.nilai_angka
+        sks_delta -= current.sks
+    if best is None:
+        if current is not None:
+            db.delete(current)
+    else:
+        if current is None:
+            current = StudentBestGrade(nim=nim, matakuliah_id=matakuliah_id)
+            db.add(current)
+        current.grade_id = best.id
+        current.nilai_angka = best.nilai_angka
+        current.sks = best.sks
+        mutu_delta += best.sks * best.nilai_angka
+        sks_delta += best.sks
+    # Always touch the KUMULATIF row: its presence marks the student as tracked
+    _add_totals(db, nim, CUMULATIVE, mutu_delta, sks_delta)
+
+
+def _index(total_mutu: float, total_sks: int) -> float:
+    if not total_sks:
+        return 0.0
+    return round(total_mutu / total_sks, 2)
+
+
+def lookup_gpa(db: Session, nim: str, semester: str = CUMULATIVE) -> Optional[float]:
+    """
+    IPS of a semester (or IPK for KUMULATIF) from the summary in a single query.
+    Returns None when the student has no summary yet, so the caller can fall back to grades.
+    """
+    rows = dict(
+        (row.semester, row) for row in db.query(StudentGpaSummary).filter(
+            StudentGpaSummary.nim == nim,
+            StudentGpaSummary.semester.in_({semester, CUMULATIVE})
+        ).all()
+    )
+    if CUMULATIVE not in rows:
+        return None
+    row = rows.get(semester)
+    if row is None:
+        return 0.0
+    return _index(row.total_mutu, row.total_sks)
+
+
+def _rebuild_rows(db: Session, nims: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Replace the summary rows of some students (or everyone) with totals computed from grades; no commit"""
+    if nims is not None:
+        nims = list(set(nims))
+    query = db.query(Grade.id, Grade.nim, Grade.matakuliah_id, Grade.semester, Grade.sks, Grade.nilai_angka)
+    if nims is not None:
+        query = query.filter(Grade.nim.in_(nims))
+
+    totals: Dict[Tuple[str, str], list] = {}
+    best: Dict[Tuple[str, int], Any] = {}
+    for grade in query.order_by(Grade.id).all():
+        totals.setdefault((grade.nim, CUMULATIVE), [0.0, 0])
+        if grade.nilai_angka < PASSING_NILAI:
+            continue
+        semester_totals = totals.setdefault((grade.nim, grade.semester), [0.0, 0])
+        semester_totals[0] += grade.sks * grade.nilai_angka
+        semester_totals[1] += grade.sks
+        key = (grade.nim, grade.matakuliah_id)
+        if key not in best or grade.nilai_angka > best[key].nilai_angka:
+            best[key] = grade
+
+    for (student, _), grade in best.items():
+        cumulative = totals[(student, CUMULATIVE)]
+        cumulative[0] += grade.sks * grade.nilai_angka
+        cumulative[1] += grade.sks
+
+    for model in (StudentGpaSummary, StudentBestGrade):
+        delete = db.query(model)
+        if nims is not None:
+            delete = delete.filter(model.nim.in_(nims))
+        delete.delete(synchronize_session=False)
+    if totals:
+        db.execute(insert(StudentGpaSummary), [
+            {'nim': student, 'semester': semester, 'total_mutu': mutu, 'total_sks': sks}
+            for (student, semester), (mutu, sks) in totals.items()
+        ])
+    if best:
+        db.execute(insert(StudentBestGrade), [
+            {'nim': student, 'matakuliah_id': matakuliah_id, 'grade_id': grade.id,
+             'nilai_angka': grade.nilai_angka, 'sks': grade.sks}
+            for (student, matakuliah_id), grade in best.items()
+        ])
+
+    return {
+        'students': sum(1 for _, semester in totals if semester == CUMULATIVE),
+        'rows': len(totals)
+    }
+
+
+def refresh_students(db: Session, nims: Iterable[str]) -> None:
+    """Recompute the summary of the given students in the caller's transaction (used by bulk grade writes)"""
+    db.flush()
+    _rebuild_rows(db, nims)
+
+
+def rebuild_gpa_summary(db: Session, nim: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Recompute the summary from the grades table, for one student or everyone
+
+    Returns:
+        {"students": int, "rows": int}
+    """
+    try:
+        result = _rebuild_rows(db, [nim] if nim is not None else None)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+
+if __name__ == "__main__":
+    # python -m grades_system.services.gpa_summary
+    from pmb_system.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        result = rebuild_gpa_summary(session)
+        print(f"Rebuilt student_gpa_summary: {result['students']} students, {result['rows']} rows")
+    finally:
+        session.close()
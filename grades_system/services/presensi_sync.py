@@ -0,0 +1,134 @@
+"""
+Nightly sync of grades.presensi from the QR attendance data
+
+One grouped query computes, per (nim, course, semester), the distinct sessions a student
+scanned into over the sessions generated for their sections. Sections come from the
+student's jadwal_mahasiswa placements and from the scans themselves, so a placed student
+who never scanned gets 0%. The result replaces student_attendance, and one UPDATE copies
+it onto the matching grades. Grade entry reads student_attendance instead of recounting.
+"""
+from typing import Dict, Any, Optional, Iterable
+
+from sqlalchemy import insert, update, select, union, exists, and_, or_, func, distinct
+from sqlalchemy.orm import Session
+
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from grades_system.models import Grade, StudentAttendance
+from grades_system.services.course_stats import refresh_course_stats
+from krs_system.models import Matakuliah
+from schedule_system.models import JadwalKelas, JadwalMahasiswa
+
+
+def _attendance_query(db: Session, semester: Optional[str] = None):
+    """(nim, matakuliah_id, semester, hadir, total_sesi) of every student of a section with sessions"""
+    totals = db.query(
+        AttendanceSession.schedule_id.label("schedule_id"),
+        func.count(AttendanceSession.id).label("total_sesi")
+    ).group_by(AttendanceSession.schedule_id).subquery()
+
+    scans = db.query(
+        AttendanceSession.schedule_id.label("schedule_id"),
+        AttendanceRecord.nim.label("nim"),
+        func.count(distinct(AttendanceRecord.attendance_session_id)).label("hadir")
+    ).join(
+        AttendanceRecord, AttendanceRecord.attendance_session_id == AttendanceSession.id
+    ).group_by(AttendanceSession.schedule_id, AttendanceRecord.nim).subquery()
+
+    members = union(
+        select(JadwalMahasiswa.jadwal_kelas_id.label("schedule_id"), JadwalMahasiswa.nim.label("nim")),
+        select(scans.c.schedule_id, scans.c.nim)
+    ).subquery()
+
+    query = db.query(
+        members.c.nim,
+        Matakuliah.id.label("matakuliah_id"),
+        JadwalKelas.semester,
+        func.sum(func.coalesce(scans.c.hadir, 0)).label("hadir"),
+        func.sum(totals.c.total_sesi).label("total_sesi")
+    ).select_from(members).join(
+        JadwalKelas, JadwalKelas.id == members.c.schedule_id
+    ).join(
+        Matakuliah, Matakuliah.kode == JadwalKelas.kode_mk
+    ).join(
+        totals, totals.c.schedule_id == members.c.schedule_id
+    ).outerjoin(
+        scans, and_(scans.c.schedule_id == members.c.schedule_id, scans.c.nim == members.c.nim)
+    )
+    if semester:
+        query = query.filter(JadwalKelas.semester == semester)
+    return query.group_by(members.c.nim, Matakuliah.id, JadwalKelas.semester)
+
+
+def sync_grade_presensi(db: Session, semester: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Recompute student_attendance from the QR scans and copy it onto grades.presensi,
+    for one semester or all of them
+
+    Returns:
+        {"semester", "students": rows written to student_attendance, "grades_updated": int}
+    """
+    records = [
+        {
+            "nim": row.nim,
+            "matakuliah_id": row.matakuliah_id,
+            "semester": row.semester,
+            "hadir": int(row.hadir),
+            "total_sesi": int(row.total_sesi),
+            "persentase": round(100.0 * row.hadir / row.total_sesi, 2)
+        }
+        for row in _attendance_query(db, semester).all()
+    ]
+
+    match = and_(
+        StudentAttendance.nim == Grade.nim,
+        StudentAttendance.matakuliah_id == Grade.matakuliah_id,
+        StudentAttendance.semester == Grade.semester
+    )
+    synced_presensi = select(StudentAttendance.persentase).where(match).scalar_subquery()
+    copy_to_grades = update(Grade).where(
+        exists().where(match),
+        or_(Grade.presensi.is_(None), Grade.presensi != synced_presensi)
+    ).values(presensi=synced_presensi)
+
+    clear = db.query(StudentAttendance)
+    if semester:
+        clear = clear.filter(StudentAttendance.semester == semester)
+        copy_to_grades = copy_to_grades.where(Grade.semester == semester)
+
+    try:
+        clear.delete(synchronize_session=False)
+        if records:
+            db.execute(insert(StudentAttendance), records)
+        grades_updated = db.execute(
+            copy_to_grades.execution_options(synchronize_session=False)
+        ).rowcount
+        if grades_updated:
+            # course_grade_stats sums presensi per letter
+            refresh_course_stats(db, {record["matakuliah_id"] for record in records})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {"semester": semester, "students": len(records), "grades_updated": grades_updated}
+
+
+def get_synced_attendance(
+    db: Session,
+    matakuliah_id: int,
+    nims: Iterable[str],
+    semester: Optional[str] = None
+) -> Dict[str, float]:
+    """
+    Synced attendance percentage per student of a course, from one query; students the
+    nightly sync has not seen yet are absent. Without a semester, the latest one counts.
+    """
+    query = db.query(StudentAttendance.nim, StudentAttendance.persentase).filter(
+        StudentAttendance.matakuliah_id == matakuliah_id,
+        StudentAttendance.nim.in_(list(nims))
+    )
+    if semester:
+        query = query.filter(StudentAttendance.semester == semester)
+
+    # Ascending semester order lets the latest semester win
+    return dict(query.order_by(StudentAttendance.semester).all())
@@ -0,0 +1,236 @@
+"""
+Transcript PDF rendering and content-addressed cache
+
+PDFs are rendered into memory, never to a shared file. The cache key is a hash of the
+transcript content (biodata, every grade, IPK and predikat), so two requests for an
+unchanged transcript share one rendering and the key doubles as the HTTP ETag. Paragraph
+and table styles and the logo bytes are built once per process.
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+
+
+LOGO_PATH = Path("web_dashboard/static/logoistn.png")
+TRANSCRIPT_PDF_CACHE_BYTES = 64 * 1024 * 1024  # Total size of cached PDFs
+
+
+@lru_cache(maxsize=1)
+def get_pdf_styles() -> Dict[str, Any]:
+    """Paragraph and table styles shared by every transcript of this process"""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            alignment=1,  # Center alignment
+            spaceAfter=12,
+            spaceBefore=12,
+        ),
+        'semester': styles['Heading2'],
+        'line': TableStyle([
+            ('LINEBELOW', (0, 0), (-1, -1), 2, colors.black),
+        ]),
+        'biodata': TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'CENTER'),
+            ('ALIGN', (2, 0), (2, -1), 'LEFT'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]),
+        'courses': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]),
+        'footer': TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+            ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),
+        ]),
+        'signature': TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ]),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_logo_bytes() -> Optional[bytes]:
+    """Logo image read once per process; None when the file is missing"""
+    if not LOGO_PATH.exists():
+        return None
+    return LOGO_PATH.read_bytes()
+
+
+def transcript_hash(transcript: Dict[str, Any]) -> str:
+    """Stable hash of everything printed on the transcript"""
+    payload = json.dumps(transcript, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_transcript_etag(content_hash: str) -> str:
+    return f'"transkrip-{content_hash[:32]}"'
+
+
+def render_transcript_pdf(transcript: Dict[str, Any]) -> bytes:
+    """Render a transcript (as returned by get_transcript) to PDF bytes"""
+    styles = get_pdf_styles()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=50)
+    elements = []
+
+    # Add header with logo and title
+    logo_bytes = get_logo_bytes()
+    if logo_bytes:
+        elements.append(Image(io.BytesIO(logo_bytes), width=80, height=80))
+        elements.append(Spacer(1, 12))
+
+    elements.append(Paragraph("TRANSKRIP AKADEMIK", styles['title']))
+
+    # Horizontal line
+    elements.append(Spacer(1, 12))
+    line = Table([['']], colWidths=500)
+    line.setStyle(styles['line'])
+    elements.append(line)
+
+    # Biodata section
+    elements.append(Spacer(1, 20))
+    biodata = transcript['biodata']
+    biodata_table = Table([
+        ['NIM', ':', biodata['nim']],
+        ['Nama', ':', biodata['nama']],
+        ['Program Studi', ':', biodata['program_studi']],
+        ['Fakultas', ':', biodata['fakultas']],
+    ], colWidths=[100, 20, 300])
+    biodata_table.setStyle(styles['biodata'])
+    elements.append(biodata_table)
+    elements.append(Spacer(1, 20))
+
+    # Courses per semester
+    for semester_data in transcript['semester_list']:
+        elements.append(Paragraph(f"Semester {semester_data['semester']}", styles['semester']))
+
+        course_data = [['Kode MK', 'Nama MK', 'SKS', 'Nilai Huruf', 'Mutu']]
+        for course in semester_data['courses']:
+            course_data.append([
+                course['kode'],
+                course['nama'],
+                str(course['sks']),
+                course['nilai_huruf'],
+                f"{course['mutu']:.2f}"
+            ])
+        course_table = Table(course_data)
+        course_table.setStyle(styles['courses'])
+        elements.append(course_table)
+        elements.append(Spacer(1, 20))
+
+    # Footer section - Total SKS, IPK, Predikat
+    footer_table = Table([
+        ['Total SKS', str(transcript['total_sks'])],
+        ['IPK', f"{transcript['ipk']:.2f}"],
+        ['Predikat', transcript['predikat']],
+    ], colWidths=[150, 200])
+    footer_table.setStyle(styles['footer'])
+    elements.append(footer_table)
+
+    # Signature area
+    elements.append(Spacer(1, 30))
+    signature_table = Table([
+        ['Dekan,', 'Jakarta, ____________ 20__'],
+        ['', ''],
+        ['______________________', ''],
+        ['(Nama Dekan)', '']
+    ], colWidths=[200, 200])
+    signature_table.setStyle(styles['signature'])
+    elements.append(signature_table)
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+class TranscriptPdfCache:
+    """LRU of rendered PDFs keyed by transcript hash, bounded by the total size of the PDFs"""
+
+    def __init__(self, max_bytes: int = TRANSCRIPT_PDF_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, content_hash: str) -> Optional[bytes]:
+        with self._lock:
+            pdf = self._entries.get(content_hash)
+            if pdf is not None:
+                self._entries.move_to_end(content_hash)
+            return pdf
+
+    def put(self, content_hash: str, pdf: bytes) -> None:
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(content_hash, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[content_hash] = pdf
+            self._size += len(pdf)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_or_render(self, transcript: Dict[str, Any], content_hash: Optional[str] = None) -> Tuple[str, bytes]:
+        """Return (content hash, PDF bytes), rendering only on a cache miss"""
+        if content_hash is None:
+            content_hash = transcript_hash(transcript)
+        pdf = self.get(content_hash)
+        if pdf is None:
+            pdf = render_transcript_pdf(transcript)
+            self.put(content_hash, pdf)
+        return content_hash, pdf
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+transcript_pdf_cache = TranscriptPdfCache()
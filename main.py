@@ -15,7 +15,9 @@ from auth_system import models as auth_models
 from grades_system import models as grades_models  # Import grades models
 from payment_system import models as payment_models  # Import payment models
 from attendance_system import models as attendance_models  # Import attendance models
+from exam_system import models as exam_models  # Import exam timetable models
 from payment_system.scheduler import start_scheduler, stop_scheduler
+from attendance_system.scan_pipeline import scan_pipeline
 from apscheduler.schedulers.background import BackgroundScheduler
 
 
@@ -73,6 +75,10 @@ app.include_router(attendance_router)  # Using default prefix /api/attendance fr
 from attendance_system.attendance_report import router as attendance_report_router
 app.include_router(attendance_report_router)  # Using default prefix /api/attendance from router
 
+# Include exam timetable router
+from exam_system.router import router as exam_router
+app.include_router(exam_router)  # Using default prefix /api/exam from router
+
 # Include admin API router
 from admin_api import router as admin_api_router
 app.include_router(admin_api_router, prefix="/api")  # Add /api prefix so endpoints become /api/admin/*
@@ -88,6 +94,8 @@ def startup_event():
     global scheduler
     print("Starting scheduler...")
     scheduler = start_scheduler()
+    # Replays journaled QR scans, then writes new ones in micro-batches
+    scan_pipeline.start()
 
 
 @app.on_event("shutdown")
@@ -96,6 +104,7 @@ def shutdown_event():
     if scheduler:
         print("Stopping scheduler...")
         stop_scheduler(scheduler)
+    scan_pipeline.stop()
 
 
 # Root endpoint
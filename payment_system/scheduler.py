@@ -9,6 +9,9 @@ from pmb_system.database import SessionLocal, engine
 from .models import Billing
 import logging
 from krs_system.models import KRS
+from grades_system.services.early_warning import run_academic_early_warning
+from grades_system.services.presensi_sync import sync_grade_presensi
+from attendance_system.attendance_warnings import run_attendance_early_warning
 
 
 def calculate_penalty(total_amount: int, weeks_late: int) -> int:
@@ -72,6 +75,49 @@ def process_billing_reminders_and_penalties():
         db.close()
 
 
+def process_academic_early_warning():
+    db = SessionLocal()
+    try:
+        result = run_academic_early_warning(db)
+        print(
+            f"[SCHEDULER] Academic early warning {result['semester']}: "
+            f"{result['flagged']} of {result['students']} student(s) flagged"
+        )
+    except Exception as e:
+        print(f"[ERROR] Academic early warning failed: {e}")
+        raise e
+    finally:
+        db.close()
+
+
+def process_presensi_sync():
+    db = SessionLocal()
+    try:
+        result = sync_grade_presensi(db)
+        print(
+            f"[SCHEDULER] Presensi sync: {result['students']} student-course row(s), "
+            f"{result['grades_updated']} grade(s) updated"
+        )
+    except Exception as e:
+        print(f"[ERROR] Presensi sync failed: {e}")
+        raise e
+    finally:
+        db.close()
+
+
+def process_attendance_early_warning():
+    db = SessionLocal()
+    try:
+        result = run_attendance_early_warning(db)
+        print(
+            f"[SCHEDULER] Attendance early warning {result['semester']}: "
+            f"{result['flagged']} of {result['students']} student-class pair(s) below 75%"
+        )
+    except Exception as e:
+        print(f"[ERROR] Attendance early warning failed: {e}")
+        raise e
+    finally:
+        db.close()
 
 
 def start_scheduler():
@@ -90,8 +136,35 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Copy the day's QR attendance onto grades.presensi
+    scheduler.add_job(
+        func=process_presensi_sync,
+        trigger=CronTrigger.from_crontab("0 1 * * *"),  # Every day at 01:00
+        id='presensi_sync_job',
+        name='Sync grade presensi from QR attendance',
+        replace_existing=True
+    )
+
+    # Academic early warning after the billing job, once grades of the day are in
+    scheduler.add_job(
+        func=process_academic_early_warning,
+        trigger=CronTrigger.from_crontab("30 1 * * *"),  # Every day at 01:30
+        id='academic_early_warning_job',
+        name='Compute academic early warnings',
+        replace_existing=True
+    )
+
+    # Attendance early warning once the day's scans are written
+    scheduler.add_job(
+        func=process_attendance_early_warning,
+        trigger=CronTrigger.from_crontab("15 1 * * *"),  # Every day at 01:15
+        id='attendance_early_warning_job',
+        name='Compute attendance early warnings',
+        replace_existing=True
+    )
+
     scheduler.start()
-    print("Scheduler started for billing reminders and penalties")
+    print("Scheduler started for billing reminders, penalties, presensi sync and academic and attendance early warnings")
     
     return scheduler
 
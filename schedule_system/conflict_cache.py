@@ -0,0 +1,221 @@
+"""
+Version-stamped cache for schedule conflict detection
+
+The schedule version is the highest id in jadwal_kelas_event. Each cached
+semester keeps its conflict pairs indexed by schedule, so a newer version only
+replays the events since the cached one and reconciles the touched schedules
+against their day bucket instead of recomputing every pair.
+"""
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from schedule_system.models import JadwalKelas, JadwalKelasEvent
+from schedule_system.services import ConflictResult, detect_schedule_conflicts, _check_time_overlap
+
+
+# Same ordering detect_schedule_conflicts emits for a single pair
+CONFLICT_TYPE_ORDER = {"room_conflict": 0, "lecturer_conflict": 1, "time_overlap": 2}
+
+# Replaying more events than this fraction of the cached schedules is slower than a rebuild
+REBUILD_RATIO = 0.5
+
+
+def get_schedule_version(db: Session) -> int:
+    """Get the current schedule version (0 when no schedule was ever changed)"""
+    return db.query(func.coalesce(func.max(JadwalKelasEvent.id), 0)).scalar()
+
+
+def make_conflicts_etag(semester: Optional[str], version: int) -> str:
+    """Build the ETag for the conflict list of a semester at a schedule version"""
+    return f'"conflicts-{semester or "all"}-{version}"'
+
+
+def _schedule_to_dict(schedule: JadwalKelas) -> Dict[str, Any]:
+    """Convert a JadwalKelas row to the format expected by detect_schedule_conflicts"""
+    return {
+        'id': schedule.id,
+        'hari': schedule.hari,
+        'jam_mulai': schedule.jam_mulai,
+        'jam_selesai': schedule.jam_selesai,
+        'ruangan_id': schedule.ruang_id,
+        'dosen_id': schedule.dosen_id
+    }
+
+
+def _pair_conflict_types(schedule1: Dict[str, Any], schedule2: Dict[str, Any]) -> List[str]:
+    """
+    Classify a pair of schedules on the same day exactly like detect_schedule_conflicts
+    """
+    if not _check_time_overlap(schedule1['jam_mulai'], schedule1['jam_selesai'],
+                               schedule2['jam_mulai'], schedule2['jam_selesai']):
+        return []
+
+    types = []
+    if schedule1['ruangan_id'] == schedule2['ruangan_id']:
+        types.append("room_conflict")
+    if schedule1['dosen_id'] == schedule2['dosen_id']:
+        types.append("lecturer_conflict")
+    if not types:
+        types.append("time_overlap")
+    return types
+
+
+def _order_pair(schedule1: Dict[str, Any], schedule2: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Order a pair by start time then id, the order detect_schedule_conflicts reports it in"""
+    if (schedule1['jam_mulai'], schedule1['id']) <= (schedule2['jam_mulai'], schedule2['id']):
+        return schedule1, schedule2
+    return schedule2, schedule1
+
+
+class ConflictIndex:
+    """
+    Conflict pairs of one semester (or of every schedule when semester is None)
+    at a given schedule version
+    """
+
+    def __init__(self, semester: Optional[str] = None):
+        self.semester = semester
+        self.version = -1
+        self.lock = threading.Lock()
+        self._schedules: Dict[int, Dict[str, Any]] = {}
+        self._days: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._pairs: Dict[Tuple[int, int, str], ConflictResult] = {}
+        self._pairs_by_schedule: Dict[int, set] = {}
+        self._sorted: Optional[List[ConflictResult]] = None
+
+    def _query(self, db: Session):
+        query = db.query(JadwalKelas)
+        if self.semester is not None:
+            query = query.filter(JadwalKelas.semester == self.semester)
+        return query
+
+    def _add_pair(self, conflict_type: str, schedule1: Dict[str, Any], schedule2: Dict[str, Any]) -> None:
+        schedule1, schedule2 = _order_pair(schedule1, schedule2)
+        key = (schedule1['id'], schedule2['id'], conflict_type)
+        self._pairs[key] = ConflictResult(type=conflict_type, schedule_1=schedule1, schedule_2=schedule2)
+        self._pairs_by_schedule.setdefault(schedule1['id'], set()).add(key)
+        self._pairs_by_schedule.setdefault(schedule2['id'], set()).add(key)
+
+    def _remove_schedule(self, schedule_id: int) -> None:
+        for key in self._pairs_by_schedule.pop(schedule_id, set()):
+            self._pairs.pop(key, None)
+            other_id = key[1] if key[0] == schedule_id else key[0]
+            other_keys = self._pairs_by_schedule.get(other_id)
+            if other_keys is not None:
+                other_keys.discard(key)
+
+        schedule = self._schedules.pop(schedule_id, None)
+        if schedule is not None:
+            self._days.get(schedule['hari'], {}).pop(schedule_id, None)
+
+    def _insert_schedule(self, schedule: Dict[str, Any]) -> None:
+        self._schedules[schedule['id']] = schedule
+        self._days.setdefault(schedule['hari'], {})[schedule['id']] = schedule
+
+    def rebuild(self, db: Session, version: int) -> None:
+        """Recompute every conflict of the semester with the all-conflicts engine"""
+        schedules = [_schedule_to_dict(s) for s in self._query(db).order_by(JadwalKelas.id).all()]
+
+        self._schedules = {}
+        self._days = {}
+        self._pairs = {}
+        self._pairs_by_schedule = {}
+        for schedule in schedules:
+            self._insert_schedule(schedule)
+        for conflict in detect_schedule_conflicts(schedules):
+            self._add_pair(conflict.type, conflict.schedule_1, conflict.schedule_2)
+
+        self.version = version
+        self._sorted = None
+
+    def reconcile(self, db: Session, version: int) -> None:
+        """
+        Replay the schedule events since the cached version, only re-checking the
+        touched schedules against the other schedules of their day
+        """
+        touched_ids = {
+            row.jadwal_kelas_id for row in db.query(JadwalKelasEvent.jadwal_kelas_id).filter(
+                JadwalKelasEvent.id > self.version,
+                JadwalKelasEvent.id <= version
+            ).distinct().all()
+        }
+
+        if len(touched_ids) > max(1, len(self._schedules) * REBUILD_RATIO):
+            self.rebuild(db, version)
+            return
+
+        # Reload the touched schedules; deleted ones (and ones moved to another semester) drop out
+        reloaded = []
+        if touched_ids:
+            reloaded = [_schedule_to_dict(s) for s in self._query(db).filter(JadwalKelas.id.in_(touched_ids)).all()]
+
+        for schedule_id in touched_ids:
+            self._remove_schedule(schedule_id)
+        for schedule in reloaded:
+            self._insert_schedule(schedule)
+
+        # Pairs between two touched schedules are produced twice under the same key
+        for schedule in reloaded:
+            for other in self._days[schedule['hari']].values():
+                if other['id'] == schedule['id']:
+                    continue
+                for conflict_type in _pair_conflict_types(schedule, other):
+                    self._add_pair(conflict_type, schedule, other)
+
+        self.version = version
+        self._sorted = None
+
+    def conflicts(self) -> List[ConflictResult]:
+        """Get the conflicts in a stable order (day, then by start time of the pair)"""
+        if self._sorted is None:
+            self._sorted = sorted(
+                self._pairs.values(),
+                key=lambda c: (
+                    c.schedule_1['hari'],
+                    c.schedule_1['jam_mulai'], c.schedule_1['id'],
+                    c.schedule_2['jam_mulai'], c.schedule_2['id'],
+                    CONFLICT_TYPE_ORDER[c.type]
+                )
+            )
+        return self._sorted
+
+
+class ScheduleConflictCache:
+    """Per-semester conflict indexes shared by all requests of this process"""
+
+    def __init__(self):
+        self._indexes: Dict[Optional[str], ConflictIndex] = {}
+        self._lock = threading.Lock()
+
+    def _get_index(self, semester: Optional[str]) -> ConflictIndex:
+        with self._lock:
+            index = self._indexes.get(semester)
+            if index is None:
+                index = ConflictIndex(semester)
+                self._indexes[semester] = index
+            return index
+
+    def get_conflicts(self, db: Session, semester: Optional[str] = None) -> Tuple[int, List[ConflictResult]]:
+        """
+        Get the conflicts of a semester (all schedules when semester is None)
+
+        Returns:
+            Tuple of (schedule version, list of ConflictResult)
+        """
+        index = self._get_index(semester)
+        with index.lock:
+            version = get_schedule_version(db)
+            if index.version < 0 or version < index.version:
+                index.rebuild(db, version)
+            elif version != index.version:
+                index.reconcile(db, version)
+            return index.version, index.conflicts()
+
+    def clear(self) -> None:
+        """Drop every cached semester"""
+        with self._lock:
+            self._indexes = {}
+
+
+conflict_cache = ScheduleConflictCache()
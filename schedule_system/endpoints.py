@@ -1,10 +1,14 @@
 """
 Schedule System FastAPI Endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response, Request
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session, joinedload
 from typing import List
 from datetime import time, datetime
+import csv
+import io
+import json
 from schedule_system.models import JadwalKelas, Ruang
 from pmb_system.models import CalonMahasiswa, StatusEnum  # Importing PMB model to validate NIM
 from krs_system.models import Matakuliah  # Importing KRS model for course validation
@@ -13,10 +17,16 @@ from schedule_system.services import (
     create_schedule as create_schedule_service,
     update_schedule as update_schedule_service,
     delete_schedule as delete_schedule_service,
+    bulk_create_schedules,
+    copy_semester,
     detect_schedule_conflicts,
     check_capacity,
     invalidate_affected_krs
 )
+from schedule_system.conflict_cache import conflict_cache, get_schedule_version, make_conflicts_etag
+from schedule_system.impact import impact_analyzer
+from schedule_system.section_assignment import assign_sections
+from schedule_system.room_utilization import room_utilization_cache
 from schedule_system.models import JadwalKelas
 
 
@@ -24,8 +34,12 @@ router = APIRouter(tags=["Schedule"])
 
 
 # Pydantic models for request/response
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Dict
+
+
+# Upper bound for one POST /bulk upload
+BULK_SCHEDULE_MAX_ROWS = 2000
 
 
 class JadwalKelasCreate(BaseModel):
@@ -187,6 +201,199 @@ def create_schedule_endpoint(
         )
 
 
+class BulkScheduleRowResult(BaseModel):
+    """Result for one row of a bulk schedule import"""
+    row: int  # 1-based row number in the upload
+    status: str  # "created" | "invalid" | "conflict"
+    id: Optional[int] = None
+    detail: Optional[str] = None
+    conflicts: Optional[List[dict]] = None
+    suggestions: Optional[List[ScheduleSuggestionResponse]] = None
+
+
+class BulkScheduleResponse(BaseModel):
+    """Response model for a bulk schedule import"""
+    total: int
+    created: int
+    rejected: int
+    rows: List[BulkScheduleRowResult]
+
+
+def _parse_bulk_schedule_rows(body: bytes, content_type: str) -> List[dict]:
+    """
+    Parse a bulk upload as CSV (header row with the JadwalKelasCreate fields)
+    or JSON (a list of objects, or {"rows": [...]})
+    """
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(body.decode("utf-8-sig")))
+        return [
+            {key.strip(): (value.strip() or None if value is not None else None) for key, value in raw.items() if key}
+            for raw in reader
+        ]
+
+    data = json.loads(body or b"[]")
+    if isinstance(data, dict):
+        data = data.get("rows")
+    if not isinstance(data, list):
+        raise ValueError("JSON body must be a list of schedules or an object with a 'rows' list")
+    return data
+
+
+# 1b. POST /bulk
+@router.post("/bulk", response_model=BulkScheduleResponse,
+             summary="Create many schedules at once",
+             description="Import schedules from a CSV (Content-Type: text/csv) or JSON body. Every row is validated against the existing schedules and against the other rows in one pass; all valid rows are inserted in a single transaction and a per-row report is returned. Alternative slots for conflicting rows are only computed when suggest=true.")
+async def bulk_create_schedule_endpoint(
+    request: Request,
+    suggest: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Bulk import schedules
+    """
+    try:
+        raw_rows = _parse_bulk_schedule_rows(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid bulk upload: {str(e)}"
+        )
+
+    if len(raw_rows) > BULK_SCHEDULE_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {BULK_SCHEDULE_MAX_ROWS} rows can be imported at once"
+        )
+
+    # Field validation per row; only well-formed rows reach the service
+    row_results = [None] * len(raw_rows)
+    valid_indexes = []
+    valid_rows = []
+    for index, raw in enumerate(raw_rows):
+        try:
+            valid_rows.append(JadwalKelasCreate.model_validate(raw).model_dump())
+            valid_indexes.append(index)
+        except ValidationError as e:
+            detail = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+            row_results[index] = {"status": "invalid", "detail": detail}
+
+    # The service does blocking database work, keep it off the event loop
+    service_results = await run_in_threadpool(
+        bulk_create_schedules, valid_rows, db, suggest
+    ) if valid_rows else []
+    for index, result in zip(valid_indexes, service_results):
+        row_results[index] = result
+
+    rows = [BulkScheduleRowResult(row=index + 1, **result) for index, result in enumerate(row_results)]
+    created = sum(1 for r in rows if r.status == "created")
+    return BulkScheduleResponse(total=len(rows), created=created, rejected=len(rows) - created, rows=rows)
+
+
+class CopySemesterRequest(BaseModel):
+    """Request model for copying a semester timetable forward"""
+    from_semester: str
+    to_semester: str
+    ruang_overrides: Dict[int, int] = {}  # {retired ruang_id: replacement ruang_id}
+    dosen_overrides: Dict[int, int] = {}  # {retired dosen_id: replacement dosen_id}
+
+
+class CopySemesterResponse(BaseModel):
+    """Response model for a semester copy"""
+    from_semester: str
+    to_semester: str
+    copied: int
+    conflicts: List[JadwalConflictResponse]
+
+
+# 1c. POST /semester/copy
+@router.post("/semester/copy", response_model=CopySemesterResponse,
+             summary="Copy a previous semester's timetable",
+             description="Clone every schedule of from_semester into to_semester in one statement, replacing retired rooms and lecturers with the given overrides, and return the conflicts of the new timetable.")
+def copy_semester_endpoint(
+    payload: CopySemesterRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Copy a semester timetable forward
+    """
+    try:
+        result = copy_semester(
+            from_semester=payload.from_semester,
+            to_semester=payload.to_semester,
+            db=db,
+            ruang_overrides=payload.ruang_overrides,
+            dosen_overrides=payload.dosen_overrides
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return CopySemesterResponse(
+        from_semester=payload.from_semester,
+        to_semester=payload.to_semester,
+        copied=result['copied'],
+        conflicts=[JadwalConflictResponse(**c) for c in result['conflicts']]
+    )
+
+
+class AssignSectionsRequest(BaseModel):
+    """Request model for assigning students to sections"""
+    semester: str
+
+
+class UnassignedStudent(BaseModel):
+    nim: str
+    kode_mk: str
+    reason: str
+
+
+class SectionLoad(BaseModel):
+    id: int
+    kode_mk: str
+    kelas: Optional[str] = None
+    load: int
+    capacity: int
+
+
+class AssignSectionsResponse(BaseModel):
+    """Response model for a section assignment run"""
+    semester: str
+    assigned: int
+    already_assigned: int
+    unassigned: List[UnassignedStudent]
+    sections: List[SectionLoad]
+
+
+# 1d. POST /sections/assign
+@router.post("/sections/assign", response_model=AssignSectionsResponse,
+             summary="Assign students to sections from approved KRS",
+             description="Place every student with an approved KRS in one section per course, respecting kapasitas_kelas and room capacity, avoiding collisions with the student's other classes and keeping section sizes balanced.")
+def assign_sections_endpoint(
+    payload: AssignSectionsRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Populate jadwal_mahasiswa for a semester
+    """
+    try:
+        result = assign_sections(payload.semester, db)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error assigning sections: {str(e)}"
+        )
+
+    return AssignSectionsResponse(semester=payload.semester, **result)
+
+
 # 2. PUT /{id}/update
 @router.put("/{id}/update", response_model=JadwalKelasResponse,
             summary="Update an existing schedule",
@@ -243,6 +450,70 @@ def update_schedule_endpoint(
         )
 
 
+class ScheduleImpactRequest(BaseModel):
+    """Proposed new slot for an existing schedule"""
+    hari: str
+    jam_mulai: time
+    jam_selesai: time
+    ruang_id: Optional[int] = None  # Keep the current room when omitted
+
+
+class ScheduleImpactResponse(BaseModel):
+    """Response model for a what-if schedule move"""
+    schedule_id: int
+    student_count: int
+    students: List[dict]
+    lecturer_count: int
+    lecturers: List[dict]
+    room_conflicts: List[int]
+    affected_krs: int  # KRS that update_schedule would set to REVISION
+
+
+# 2b. POST /{id}/impact
+@router.post("/{id}/impact", response_model=ScheduleImpactResponse,
+             summary="Preview the impact of moving a schedule",
+             description="Without changing anything, report which enrolled students and which lecturers would have overlapping classes if the schedule moved to the proposed day, time and room, and how many KRS an update would send back to REVISION.")
+def schedule_impact_endpoint(
+    id: int,
+    proposal: ScheduleImpactRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    What-if analysis for a schedule move
+    """
+    schedule = db.query(JadwalKelas).filter(JadwalKelas.id == id).first()
+    if not schedule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Schedule with ID {id} not found"
+        )
+
+    try:
+        impact = impact_analyzer.analyze_move(
+            schedule=schedule,
+            hari=proposal.hari,
+            jam_mulai=proposal.jam_mulai,
+            jam_selesai=proposal.jam_selesai,
+            ruang_id=proposal.ruang_id,
+            db=db
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    return ScheduleImpactResponse(
+        schedule_id=id,
+        student_count=len(impact['students']),
+        students=impact['students'],
+        lecturer_count=len({c['dosen_id'] for c in impact['lecturers']}),
+        lecturers=impact['lecturers'],
+        room_conflicts=impact['room_conflicts'],
+        affected_krs=impact['affected_krs']
+    )
+
+
 # 3. DELETE /{id}/delete
 @router.delete("/{id}/delete", response_model=dict,
                summary="Delete a schedule",
@@ -276,29 +547,23 @@ def delete_schedule_endpoint(
 # 4. GET /conflicts
 @router.get("/conflicts", response_model=List[JadwalConflictResponse],
             summary="Get all schedule conflicts",
-            description="Retrieve all existing schedule conflicts in the system including room conflicts, lecturer conflicts, and time overlaps.")
+            description="Retrieve all existing schedule conflicts in the system including room conflicts, lecturer conflicts, and time overlaps. Results are cached per semester and stamped with the schedule version in the ETag header; send it back as If-None-Match to get 304 Not Modified while no schedule changed.")
 def get_schedule_conflicts(
+    response: Response,
+    semester: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
-    Get all schedule conflicts
+    Get all schedule conflicts, optionally limited to one semester
     """
-    # Get all schedules to check for conflicts
-    all_schedules = db.query(JadwalKelas).all()
-
-    # Convert schedules to the format expected by detect_schedule_conflicts
-    schedule_list = []
-    for schedule in all_schedules:
-        schedule_list.append({
-            'id': schedule.id,
-            'hari': schedule.hari,
-            'jam_mulai': schedule.jam_mulai,
-            'jam_selesai': schedule.jam_selesai,
-            'ruangan_id': schedule.ruang_id,
-            'dosen_id': schedule.dosen_id
-        })
+    # Cheap version check first so unchanged dashboards never touch the schedules
+    etag = make_conflicts_etag(semester, get_schedule_version(db))
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
 
-    conflicts = detect_schedule_conflicts(schedule_list)
+    version, conflicts = conflict_cache.get_conflicts(db, semester)
+    response.headers["ETag"] = make_conflicts_etag(semester, version)
 
     # Format conflicts for response
     conflict_responses = []
@@ -313,6 +578,42 @@ def get_schedule_conflicts(
 
 
 # 5. GET /rooms
+class RoomUtilization(BaseModel):
+    ruang_id: int
+    kode: str
+    nama: str
+    kapasitas: int
+    schedules: int
+    weekly_hours: float
+    time_utilization: float  # Booked hours / teaching hours of the week
+    seat_utilization: float  # Enrolled / kapasitas, weighted by class duration
+    peak_enrolled: int
+    occupancy: List[List[float]]  # [day][hour] fraction of the hour booked
+
+
+class RoomUtilizationResponse(BaseModel):
+    semester: str
+    version: int
+    days: List[str]
+    hours: List[int]
+    rooms: List[RoomUtilization]
+
+
+# 5b. GET /rooms/utilization
+@router.get("/rooms/utilization", response_model=RoomUtilizationResponse,
+            summary="Room utilization heatmap",
+            description="Per room: occupancy per day x hour and seat utilization (enrolled / kapasitas) for a semester. Cached until schedules, placements or rooms change.")
+def get_room_utilization(
+    semester: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Get room utilization analytics for a semester
+    """
+    version, result = room_utilization_cache.get(db, semester)
+    return RoomUtilizationResponse(semester=semester, version=version, **result)
+
+
 @router.get("/rooms", response_model=List[RuangResponse],
             summary="Get all rooms",
             description="Retrieve all available rooms in the system including their capacity and type.")
@@ -0,0 +1,223 @@
+"""
+What-if impact analysis for moving a schedule
+
+Weekly occupancy of every student, lecturer and room of a semester is kept as a
+bitset (a Python int with one bit per minute of the week). Checking a proposed
+slot is then a handful of AND operations instead of one query per student.
+"""
+import threading
+from datetime import time
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from schedule_system.models import JadwalKelas, JadwalMahasiswa, Dosen
+from schedule_system.conflict_cache import get_schedule_version
+
+
+MINUTES_PER_DAY = 24 * 60
+DAYS = ("senin", "selasa", "rabu", "kamis", "jumat", "sabtu", "minggu")
+
+
+def _day_index(hari: str) -> int:
+    """Position of a day in the week"""
+    day = (hari or "").strip().lower()
+    if day not in DAYS:
+        raise ValueError(f"Unknown day: {hari}")
+    return DAYS.index(day)
+
+
+def slot_mask(hari: str, jam_mulai: time, jam_selesai: time) -> int:
+    """
+    Bitset of the minutes covered by [jam_mulai, jam_selesai) on a day.
+    Two masks intersect exactly when _check_time_overlap would report an overlap.
+    """
+    start = jam_mulai.hour * 60 + jam_mulai.minute
+    end = jam_selesai.hour * 60 + jam_selesai.minute
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << (_day_index(hari) * MINUTES_PER_DAY + start)
+
+
+def get_occupancy_key(db: Session, semester: str) -> Tuple:
+    """Schedule version plus a fingerprint of the semester's placements"""
+    # Enrollment changes do not bump the schedule version, so they are part of the key
+    count, max_id, max_updated = db.query(
+        func.count(JadwalMahasiswa.id), func.max(JadwalMahasiswa.id), func.max(JadwalMahasiswa.updated_at)
+    ).filter(JadwalMahasiswa.semester == semester).one()
+    return get_schedule_version(db), count, max_id, max_updated
+
+
+class OccupancyIndex:
+    """
+    Occupancy bitsets of one semester at a given (schedule version, enrollment) key.
+    Never modified once built: a stale index is replaced by a new one, so readers
+    holding the old object keep a consistent view.
+    """
+
+    def __init__(self, semester: str):
+        self.semester = semester
+        self.key = None
+        self.schedules: Dict[int, Dict[str, Any]] = {}
+        self.student_schedules: Dict[str, List[int]] = {}
+        self.schedule_students: Dict[int, List[str]] = {}
+        self.student_masks: Dict[str, int] = {}
+        self.dosen_masks: Dict[int, int] = {}
+        self.ruang_masks: Dict[int, int] = {}
+        self.dosen_schedules: Dict[int, List[int]] = {}
+        self.ruang_schedules: Dict[int, List[int]] = {}
+
+    @classmethod
+    def build(cls, db: Session, semester: str, key) -> "OccupancyIndex":
+        """Load the semester's schedules and placements in two queries"""
+        self = cls(semester)
+        for row in db.query(
+            JadwalKelas.id, JadwalKelas.kode_mk, JadwalKelas.dosen_id, JadwalKelas.ruang_id,
+            JadwalKelas.hari, JadwalKelas.jam_mulai, JadwalKelas.jam_selesai
+        ).filter(JadwalKelas.semester == self.semester).all():
+            try:
+                mask = slot_mask(row.hari, row.jam_mulai, row.jam_selesai)
+            except ValueError:
+                # A stored schedule on an unknown day occupies no slot of the week
+                mask = 0
+            self.schedules[row.id] = {
+                'id': row.id,
+                'kode_mk': row.kode_mk,
+                'dosen_id': row.dosen_id,
+                'ruang_id': row.ruang_id,
+                'mask': mask
+            }
+            self.dosen_masks[row.dosen_id] = self.dosen_masks.get(row.dosen_id, 0) | mask
+            self.ruang_masks[row.ruang_id] = self.ruang_masks.get(row.ruang_id, 0) | mask
+            self.dosen_schedules.setdefault(row.dosen_id, []).append(row.id)
+            self.ruang_schedules.setdefault(row.ruang_id, []).append(row.id)
+
+        for nim, jadwal_kelas_id in db.query(JadwalMahasiswa.nim, JadwalMahasiswa.jadwal_kelas_id).filter(
+            JadwalMahasiswa.semester == self.semester
+        ).all():
+            schedule = self.schedules.get(jadwal_kelas_id)
+            if schedule is None:
+                continue
+            self.student_schedules.setdefault(nim, []).append(jadwal_kelas_id)
+            self.schedule_students.setdefault(jadwal_kelas_id, []).append(nim)
+            self.student_masks[nim] = self.student_masks.get(nim, 0) | schedule['mask']
+
+        self.key = key
+        return self
+
+    def colliding_schedules(self, schedule_ids, proposed_mask: int, exclude_id: int) -> List[int]:
+        """Schedules among schedule_ids (other than exclude_id) that intersect the proposed slot"""
+        return [
+            schedule_id for schedule_id in schedule_ids
+            if schedule_id != exclude_id and self.schedules[schedule_id]['mask'] & proposed_mask
+        ]
+
+
+class ScheduleImpactAnalyzer:
+    """Per-semester occupancy indexes shared by all requests of this process"""
+
+    def __init__(self):
+        self._indexes: Dict[str, OccupancyIndex] = {}
+        self._lock = threading.Lock()
+
+    def get_index(self, db: Session, semester: str) -> OccupancyIndex:
+        """Get the occupancy index of a semester, rebuilding it when stale"""
+        with self._lock:
+            index = self._indexes.get(semester)
+            key = get_occupancy_key(db, semester)
+            if index is None or index.key != key:
+                index = OccupancyIndex.build(db, semester, key)
+                self._indexes[semester] = index
+            return index
+
+    def analyze_move(
+        self,
+        schedule: JadwalKelas,
+        hari: str,
+        jam_mulai: time,
+        jam_selesai: time,
+        ruang_id: Optional[int],
+        db: Session
+    ) -> Dict[str, Any]:
+        """
+        Preview who would collide if a schedule moved to a new slot
+
+        Args:
+            schedule: JadwalKelas to move
+            hari, jam_mulai, jam_selesai, ruang_id: Proposed slot (ruang_id None keeps the room)
+            db: Database session
+
+        Returns:
+            {"students": [...], "lecturers": [...], "room_conflicts": [...], "affected_krs": int}
+        """
+        from krs_system.models import KRSDetail, Matakuliah
+        from pmb_system.models import CalonMahasiswa
+
+        if jam_mulai >= jam_selesai:
+            raise ValueError("jam_mulai must be earlier than jam_selesai")
+
+        proposed_mask = slot_mask(hari, jam_mulai, jam_selesai)
+        index = self.get_index(db, schedule.semester)
+        new_ruang_id = ruang_id or schedule.ruang_id
+
+        # Students: fast reject on the full bitset, exact check on their other placements
+        colliding_students = []
+        for nim in index.schedule_students.get(schedule.id, []):
+            if not index.student_masks[nim] & proposed_mask:
+                continue
+            conflicting_ids = index.colliding_schedules(index.student_schedules[nim], proposed_mask, schedule.id)
+            if conflicting_ids:
+                colliding_students.append({'nim': nim, 'conflicting_schedule_ids': conflicting_ids})
+
+        if colliding_students:
+            names = dict(db.query(CalonMahasiswa.nim, CalonMahasiswa.nama_lengkap).filter(
+                CalonMahasiswa.nim.in_([s['nim'] for s in colliding_students])
+            ).all())
+            for student in colliding_students:
+                student['nama'] = names.get(student['nim'], f"Student {student['nim']}")
+
+        # Lecturer of this schedule and lecturers already teaching in the proposed room
+        lecturer_conflicts = []
+        if index.dosen_masks.get(schedule.dosen_id, 0) & proposed_mask:
+            conflicting_ids = index.colliding_schedules(
+                index.dosen_schedules[schedule.dosen_id], proposed_mask, schedule.id
+            )
+            if conflicting_ids:
+                lecturer_conflicts.append({
+                    'dosen_id': schedule.dosen_id,
+                    'type': 'lecturer_conflict',
+                    'conflicting_schedule_ids': conflicting_ids
+                })
+
+        room_conflicts = []
+        if index.ruang_masks.get(new_ruang_id, 0) & proposed_mask:
+            room_conflicts = index.colliding_schedules(
+                index.ruang_schedules[new_ruang_id], proposed_mask, schedule.id
+            )
+            for schedule_id in room_conflicts:
+                lecturer_conflicts.append({
+                    'dosen_id': index.schedules[schedule_id]['dosen_id'],
+                    'type': 'room_conflict',
+                    'conflicting_schedule_ids': [schedule_id]
+                })
+
+        if lecturer_conflicts:
+            names = dict(db.query(Dosen.id, Dosen.nama).filter(
+                Dosen.id.in_({c['dosen_id'] for c in lecturer_conflicts})
+            ).all())
+            for conflict in lecturer_conflicts:
+                conflict['nama'] = names.get(conflict['dosen_id'], f"Dosen {conflict['dosen_id']}")
+
+        # KRS that update_schedule would flip to REVISION (see invalidate_affected_krs)
+        affected_krs = db.query(func.count(func.distinct(KRSDetail.krs_id))).join(
+            Matakuliah, Matakuliah.id == KRSDetail.matakuliah_id
+        ).filter(Matakuliah.kode == schedule.kode_mk).scalar()
+
+        return {
+            'students': colliding_students,
+            'lecturers': lecturer_conflicts,
+            'room_conflicts': room_conflicts,
+            'affected_krs': affected_krs
+        }
+
+
+impact_analyzer = ScheduleImpactAnalyzer()
@@ -73,4 +73,15 @@ class JadwalMahasiswa(Base):
     
     # Note: Removed direct relationship to CalonMahasiswa to avoid circular imports in tests
     # Instead, we'll reference students by their NIM only
-    jadwal_kelas = relationship("JadwalKelas", back_populates="jadwal_mahasiswa")
\ No newline at end of file
+    jadwal_kelas = relationship("JadwalKelas", back_populates="jadwal_mahasiswa")
+
+class JadwalKelasEvent(Base):
+    __tablename__ = 'jadwal_kelas_event'
+
+    # The auto-increment id doubles as the schedule version: every create/update/delete
+    # appends one row in the same transaction as the schedule change itself
+    id = Column(Integer, primary_key=True, index=True)
+    jadwal_kelas_id = Column(Integer, nullable=False)  # No FK so events survive schedule deletion
+    semester = Column(String(20), nullable=True)  # Academic semester of the schedule after the change
+    event_type = Column(String(30), nullable=False)  # SCHEDULE_CREATED | SCHEDULE_UPDATED | SCHEDULE_DELETED
+    created_at = Column(DateTime, default=func.now())
@@ -0,0 +1,132 @@
+"""
+Room utilization analytics
+
+For every room of a semester: minutes occupied per day x hour and seat utilization
+(enrolled / Ruang.kapasitas). The semester is loaded in three queries and aggregated
+with NumPy: each schedule is clipped against every hour of the day in one broadcast,
+then scattered into a rooms x days x hours array with np.add.at. Results are cached
+per (schedule version, placements, rooms) key.
+"""
+import threading
+from typing import List, Dict, Any, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from schedule_system.models import JadwalKelas, JadwalMahasiswa, Ruang
+from schedule_system.impact import DAYS, get_occupancy_key
+
+
+HOUR_START = 7  # First hour shown in the heatmap
+HOUR_END = 21   # Hours up to (not including) this one are shown
+WEEKDAYS = 6    # Senin s.d. Sabtu count as teaching days for time utilization
+
+
+def _minutes(value) -> int:
+    return value.hour * 60 + value.minute
+
+
+def compute_room_utilization(db: Session, semester: str) -> Dict[str, Any]:
+    """
+    Aggregate room occupancy and seat utilization of a semester
+
+    Returns:
+        {"days": [...], "hours": [...], "rooms": [{"ruang_id", "kode", "nama", "kapasitas", "schedules",
+         "weekly_hours", "time_utilization", "seat_utilization", "peak_enrolled", "occupancy"}]}
+        where occupancy[d][h] is the fraction of that hour the room is booked (above 1.0 when double booked)
+    """
+    rooms = db.query(Ruang.id, Ruang.kode, Ruang.nama, Ruang.kapasitas).order_by(Ruang.kode).all()
+    schedules = db.query(
+        JadwalKelas.id, JadwalKelas.ruang_id, JadwalKelas.hari, JadwalKelas.jam_mulai, JadwalKelas.jam_selesai
+    ).filter(JadwalKelas.semester == semester).all()
+    enrolled_by_schedule = dict(db.query(JadwalMahasiswa.jadwal_kelas_id, func.count(JadwalMahasiswa.id)).filter(
+        JadwalMahasiswa.semester == semester
+    ).group_by(JadwalMahasiswa.jadwal_kelas_id).all())
+
+    hours = np.arange(HOUR_START, HOUR_END)
+    room_index = {room.id: i for i, room in enumerate(rooms)}
+    schedules = [s for s in schedules if s.ruang_id in room_index and s.hari and s.hari.strip().lower() in DAYS]
+
+    n_rooms = len(rooms)
+    occupied = np.zeros((n_rooms, len(DAYS), len(hours)), dtype=np.int64)
+    seat_minutes = np.zeros(n_rooms, dtype=np.int64)
+    booked_minutes = np.zeros(n_rooms, dtype=np.int64)
+    peak = np.zeros(n_rooms, dtype=np.int64)
+    schedule_count = np.zeros(n_rooms, dtype=np.int64)
+    capacity = np.array([room.kapasitas or 0 for room in rooms], dtype=np.int64)
+
+    if schedules:
+        room_idx = np.array([room_index[s.ruang_id] for s in schedules])
+        day_idx = np.array([DAYS.index(s.hari.strip().lower()) for s in schedules])
+        start = np.array([_minutes(s.jam_mulai) for s in schedules])
+        end = np.array([_minutes(s.jam_selesai) for s in schedules])
+        enrolled = np.array([enrolled_by_schedule.get(s.id, 0) for s in schedules], dtype=np.int64)
+        duration = np.clip(end - start, 0, None)
+
+        # Minutes of each shown hour covered by each schedule: (schedules, hours)
+        hour_start = hours * 60
+        per_hour = np.clip(
+            np.minimum(end[:, None], hour_start[None, :] + 60) - np.maximum(start[:, None], hour_start[None, :]),
+            0, None
+        )
+        np.add.at(occupied, (room_idx, day_idx), per_hour)
+        np.add.at(booked_minutes, room_idx, duration)
+        np.add.at(seat_minutes, room_idx, enrolled * duration)
+        np.add.at(schedule_count, room_idx, 1)
+        np.maximum.at(peak, room_idx, enrolled)
+
+    available_minutes = WEEKDAYS * len(hours) * 60
+    offered_seat_minutes = capacity * booked_minutes
+    seat_utilization = np.divide(
+        seat_minutes, offered_seat_minutes,
+        out=np.zeros(n_rooms, dtype=float), where=offered_seat_minutes > 0
+    )
+    occupancy = np.round(occupied / 60.0, 3)
+
+    return {
+        'days': list(DAYS),
+        'hours': hours.tolist(),
+        'rooms': [
+            {
+                'ruang_id': room.id,
+                'kode': room.kode,
+                'nama': room.nama,
+                'kapasitas': room.kapasitas,
+                'schedules': int(schedule_count[i]),
+                'weekly_hours': round(booked_minutes[i] / 60.0, 2),
+                'time_utilization': round(float(booked_minutes[i]) / available_minutes, 4),
+                'seat_utilization': round(float(seat_utilization[i]), 4),
+                'peak_enrolled': int(peak[i]),
+                'occupancy': occupancy[i].tolist()
+            }
+            for i, room in enumerate(rooms)
+        ]
+    }
+
+
+class RoomUtilizationCache:
+    """Per-semester utilization results, recomputed when schedules, placements or rooms change"""
+
+    def __init__(self):
+        self._results: Dict[str, Tuple[Tuple, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, db: Session, semester: str) -> Tuple:
+        rooms = db.query(func.count(Ruang.id), func.max(Ruang.updated_at)).one()
+        return get_occupancy_key(db, semester) + tuple(rooms)
+
+    def get(self, db: Session, semester: str) -> Tuple[int, Dict[str, Any]]:
+        """Return (schedule version, utilization) for a semester"""
+        with self._lock:
+            key = self._key(db, semester)
+            cached = self._results.get(semester)
+            if cached is None or cached[0] != key:
+                cached = (key, compute_room_utilization(db, semester))
+                self._results[semester] = cached
+            return key[0], cached[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+
+room_utilization_cache = RoomUtilizationCache()
@@ -0,0 +1,204 @@
+"""
+Balanced section assignment from approved KRS
+
+Turns every approved KRS course of a semester into one JadwalMahasiswa row, placing
+each student in exactly one section (kelas A/B/...) of the course. The assignment is
+an iterative matching:
+
+1. Courses are processed tightest first (least spare capacity).
+2. Inside a course, the students with the busiest week go first.
+3. A student takes the least filled section (load / capacity) that still has room
+   and does not collide with the student's other classes.
+4. When every section is full or colliding, one augmenting step tries to move a
+   student placed earlier in this run to another section to free a seat.
+
+Capacity of a section is min(kapasitas_kelas, Ruang.kapasitas). All reads are a few
+set-based queries and the result is written with a single bulk insert.
+"""
+from typing import List, Dict, Any, Optional
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from schedule_system.models import JadwalKelas, JadwalMahasiswa, Ruang
+from schedule_system.impact import slot_mask
+
+
+def _section_capacity(kapasitas_kelas: Optional[int], ruang_kapasitas: Optional[int]) -> int:
+    capacities = [c for c in (kapasitas_kelas, ruang_kapasitas) if c is not None]
+    return min(capacities) if capacities else 0
+
+
+def assign_sections(semester: str, db: Session) -> Dict[str, Any]:
+    """
+    Place every student with an approved KRS in one section per course
+
+    Students that already have a JadwalMahasiswa row for a section of the course keep it;
+    their rows count towards the section load and the student's occupied time.
+
+    Args:
+        semester: Academic semester (e.g. "2023/2024-1")
+        db: Database session
+
+    Returns:
+        {
+          "assigned": int,
+          "already_assigned": int,
+          "unassigned": [{"nim", "kode_mk", "reason"}],
+          "sections": [{"id", "kode_mk", "kelas", "load", "capacity"}]
+        }
+
+    Raises:
+        ValueError: Empty semester
+    """
+    if not semester or not semester.strip():
+        raise ValueError("semester is required")
+
+    from krs_system.enums import KRSStatusEnum
+    from krs_system.models import KRS, KRSDetail, Matakuliah
+    from schedule_system.database import commit_with_retry
+
+    # Sections of the semester with their effective capacity
+    sections: Dict[int, Dict[str, Any]] = {}
+    course_sections: Dict[str, List[int]] = {}
+    for row in db.query(
+        JadwalKelas.id, JadwalKelas.kode_mk, JadwalKelas.kelas, JadwalKelas.hari,
+        JadwalKelas.jam_mulai, JadwalKelas.jam_selesai, JadwalKelas.kapasitas_kelas, Ruang.kapasitas
+    ).join(Ruang, Ruang.id == JadwalKelas.ruang_id).filter(
+        JadwalKelas.semester == semester
+    ).order_by(JadwalKelas.kelas, JadwalKelas.id).all():
+        try:
+            mask = slot_mask(row.hari, row.jam_mulai, row.jam_selesai)
+        except ValueError:
+            # A stored section on an unknown day occupies no slot of the week, as in OccupancyIndex
+            mask = 0
+        sections[row.id] = {
+            'id': row.id,
+            'kode_mk': row.kode_mk,
+            'kelas': row.kelas,
+            'mask': mask,
+            'capacity': _section_capacity(row.kapasitas_kelas, row.kapasitas),
+            'load': 0
+        }
+        course_sections.setdefault(row.kode_mk, []).append(row.id)
+
+    # Existing placements: occupancy per student and load per section
+    placements: Dict[str, List[int]] = {}
+    placed_courses = set()
+    for nim, jadwal_kelas_id in db.query(JadwalMahasiswa.nim, JadwalMahasiswa.jadwal_kelas_id).filter(
+        JadwalMahasiswa.semester == semester
+    ).all():
+        section = sections.get(jadwal_kelas_id)
+        if section is None:
+            continue
+        section['load'] += 1
+        placements.setdefault(nim, []).append(jadwal_kelas_id)
+        placed_courses.add((nim, section['kode_mk']))
+
+    def occupancy(nim: str, skip_id: int = None) -> int:
+        mask = 0
+        for section_id in placements.get(nim, []):
+            if section_id != skip_id:
+                mask |= sections[section_id]['mask']
+        return mask
+
+    # Demand: (nim, kode_mk) of every approved KRS of the semester
+    pending: Dict[str, List[str]] = {}
+    already_assigned = 0
+    unassigned = []
+    for nim, kode in db.query(KRS.nim, Matakuliah.kode).join(
+        KRSDetail, KRSDetail.krs_id == KRS.id
+    ).join(
+        Matakuliah, Matakuliah.id == KRSDetail.matakuliah_id
+    ).filter(
+        KRS.semester == semester,
+        KRS.status == KRSStatusEnum.APPROVED
+    ).distinct().all():
+        if (nim, kode) in placed_courses:
+            already_assigned += 1
+        elif kode not in course_sections:
+            unassigned.append({'nim': nim, 'kode_mk': kode, 'reason': "Tidak ada kelas untuk mata kuliah ini"})
+        else:
+            pending.setdefault(kode, []).append(nim)
+
+    def spare_capacity(kode: str) -> int:
+        return sum(sections[s]['capacity'] - sections[s]['load'] for s in course_sections[kode]) - len(pending[kode])
+
+    new_placements: Dict[int, List[str]] = {}
+
+    def place(nim: str, section_id: int) -> None:
+        sections[section_id]['load'] += 1
+        placements.setdefault(nim, []).append(section_id)
+        new_placements.setdefault(section_id, []).append(nim)
+
+    def unplace(nim: str, section_id: int) -> None:
+        sections[section_id]['load'] -= 1
+        placements[nim].remove(section_id)
+        new_placements[section_id].remove(nim)
+
+    def best_section(candidate_ids: List[int], busy: int) -> Optional[int]:
+        feasible = [
+            sections[s] for s in candidate_ids
+            if sections[s]['load'] < sections[s]['capacity'] and not sections[s]['mask'] & busy
+        ]
+        if not feasible:
+            return None
+        return min(feasible, key=lambda s: (s['load'] / s['capacity'], s['load'], s['id']))['id']
+
+    for kode in sorted(pending, key=lambda k: (spare_capacity(k), k)):
+        section_ids = course_sections[kode]
+        for nim in sorted(pending[kode], key=lambda n: (-occupancy(n).bit_count(), n)):
+            busy = occupancy(nim)
+            section_id = best_section(section_ids, busy)
+            if section_id is not None:
+                place(nim, section_id)
+                continue
+
+            # Augmenting step: free a seat in a full, non-colliding section by moving
+            # a student placed in this run to another section of the same course
+            free_of_collision = [s for s in section_ids if not sections[s]['mask'] & busy]
+            moved = False
+            for full_id in free_of_collision:
+                for other_nim in list(new_placements.get(full_id, [])):
+                    target_id = best_section(
+                        [s for s in section_ids if s != full_id], occupancy(other_nim, skip_id=full_id)
+                    )
+                    if target_id is not None:
+                        unplace(other_nim, full_id)
+                        place(other_nim, target_id)
+                        place(nim, full_id)
+                        moved = True
+                        break
+                if moved:
+                    break
+
+            if not moved:
+                reason = "Semua kelas penuh" if free_of_collision else "Bentrok dengan jadwal lain mahasiswa"
+                unassigned.append({'nim': nim, 'kode_mk': kode, 'reason': reason})
+
+    rows = [
+        {'nim': nim, 'jadwal_kelas_id': section_id, 'semester': semester, 'status_kehadiran': "belum_hadir"}
+        for section_id, nims in new_placements.items()
+        for nim in nims
+    ]
+    if rows:
+        try:
+            db.execute(insert(JadwalMahasiswa), rows)
+            commit_with_retry(db)
+        except Exception:
+            db.rollback()
+            raise
+
+    return {
+        'assigned': len(rows),
+        'already_assigned': already_assigned,
+        'unassigned': unassigned,
+        'sections': [
+            {
+                'id': s['id'],
+                'kode_mk': s['kode_mk'],
+                'kelas': s['kelas'],
+                'load': s['load'],
+                'capacity': s['capacity']
+            }
+            for s in sorted(sections.values(), key=lambda s: (s['kode_mk'], s['kelas'] or "", s['id']))
+        ]
+    }
@@ -1,8 +1,8 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, case, insert, literal
 from typing import List, Dict, Any
 from datetime import time
-from schedule_system.models import JadwalKelas, JadwalMahasiswa, Ruang
+from schedule_system.models import JadwalKelas, JadwalMahasiswa, Ruang, JadwalKelasEvent
 from krs_system.models import KRSDetail, KRS
 from pmb_system.models import CalonMahasiswa
 from dataclasses import dataclass
@@ -112,6 +112,19 @@ def detect_schedule_conflicts(jadwal_list: List[Dict[str, Any]]) -> List[Conflic
     return conflicts
 
 
+def record_schedule_event(db: Session, event_type: str, schedule_data: Dict[str, Any]) -> None:
+    """
+    Append a schedule change to jadwal_kelas_event within the caller's transaction.
+    The event id is the schedule version used by the conflict cache, so it only
+    becomes visible once the schedule change itself is committed.
+    """
+    db.add(JadwalKelasEvent(
+        jadwal_kelas_id=schedule_data['id'],
+        semester=schedule_data.get('semester'),
+        event_type=event_type
+    ))
+
+
 def create_schedule(
     kode_mk: str,
     dosen_id: int,
@@ -234,6 +247,7 @@ def create_schedule(
             }
 
             # Notify observers about the new schedule
+            record_schedule_event(db, "SCHEDULE_CREATED", schedule_data)
             schedule_subject.notify("SCHEDULE_CREATED", schedule_data)
 
             return db_schedule
@@ -345,6 +359,7 @@ def create_schedule(
             }
 
             # Notify observers about the new schedule
+            record_schedule_event(db, "SCHEDULE_CREATED", schedule_data)
             schedule_subject.notify("SCHEDULE_CREATED", schedule_data)
 
             return db_schedule
@@ -512,6 +527,7 @@ def update_schedule(
             }
 
             # Notify observers about the updated schedule
+            record_schedule_event(db, "SCHEDULE_UPDATED", updated_schedule_data)
             schedule_subject.notify("SCHEDULE_UPDATED", updated_schedule_data)
 
             return db_schedule
@@ -659,6 +675,7 @@ def update_schedule(
             }
 
             # Notify observers about the updated schedule
+            record_schedule_event(db, "SCHEDULE_UPDATED", updated_schedule_data)
             schedule_subject.notify("SCHEDULE_UPDATED", updated_schedule_data)
 
             return db_schedule
@@ -706,6 +723,7 @@ def delete_schedule(
             db.delete(db_schedule)
             
             # Notify observers about the deleted schedule
+            record_schedule_event(db, "SCHEDULE_DELETED", schedule_data)
             schedule_subject.notify("SCHEDULE_DELETED", schedule_data)
             
             return True
@@ -742,6 +760,7 @@ def delete_schedule(
             db.delete(db_schedule)
             
             # Notify observers about the deleted schedule
+            record_schedule_event(db, "SCHEDULE_DELETED", schedule_data)
             schedule_subject.notify("SCHEDULE_DELETED", schedule_data)
             
             return True
@@ -750,6 +769,289 @@ def delete_schedule(
             raise e
 
 
+def bulk_create_schedules(
+    rows: List[Dict[str, Any]],
+    db: Session = None,
+    with_suggestions: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Create many schedules in one transaction
+
+    Every row is checked against the existing schedules of its day and against the
+    other rows in a single detect_schedule_conflicts sweep. A row is rejected when it
+    conflicts with an existing schedule or with an earlier accepted row, which is what
+    calling create_schedule once per row would do. All accepted rows are inserted
+    together with a single batch of jadwal_kelas_event rows.
+
+    Args:
+        rows: List of schedules with the fields accepted by create_schedule
+        db: Database session
+        with_suggestions: Also run generate_schedule_alternatives for rejected rows
+
+    Returns:
+        One result per row, in order:
+        {"status": "created", "id": ...} |
+        {"status": "invalid", "detail": "..."} |
+        {"status": "conflict", "conflicts": [...], "suggestions": [...]}
+    """
+    from schedule_system.models import Dosen
+    from schedule_system.database import commit_with_retry
+
+    results: List[Dict[str, Any]] = [None] * len(rows)
+
+    try:
+        # Reference data for the whole batch in two queries
+        dosen_ids = {r for (r,) in db.query(Dosen.id).filter(Dosen.id.in_({row['dosen_id'] for row in rows})).all()}
+        ruang_ids = {r for (r,) in db.query(Ruang.id).filter(Ruang.id.in_({row['ruang_id'] for row in rows})).all()}
+
+        # Batch rows get negative ids so they never clash with existing schedules
+        candidates = []
+        for index, row in enumerate(rows):
+            if row['dosen_id'] not in dosen_ids:
+                results[index] = {'status': 'invalid', 'detail': f"Dosen with ID {row['dosen_id']} not found"}
+            elif row['ruang_id'] not in ruang_ids:
+                results[index] = {'status': 'invalid', 'detail': f"Room with ID {row['ruang_id']} not found"}
+            elif row['jam_mulai'] >= row['jam_selesai']:
+                results[index] = {'status': 'invalid', 'detail': "jam_mulai must be earlier than jam_selesai"}
+            else:
+                candidates.append({
+                    'id': -(index + 1),
+                    'kode_mk': row['kode_mk'],
+                    'hari': row['hari'],
+                    'jam_mulai': row['jam_mulai'],
+                    'jam_selesai': row['jam_selesai'],
+                    'ruangan_id': row['ruang_id'],
+                    'dosen_id': row['dosen_id']
+                })
+
+        # Existing schedules of every day touched by the batch, in one query
+        existing_schedules = []
+        days = {c['hari'] for c in candidates}
+        if days:
+            for existing in db.query(JadwalKelas).filter(JadwalKelas.hari.in_(days)).all():
+                existing_schedules.append({
+                    'id': existing.id,
+                    'kode_mk': existing.kode_mk,
+                    'hari': existing.hari,
+                    'jam_mulai': existing.jam_mulai,
+                    'jam_selesai': existing.jam_selesai,
+                    'ruangan_id': existing.ruang_id,
+                    'dosen_id': existing.dosen_id
+                })
+
+        # One sweep over existing + batch, keeping only pairs that involve a batch row
+        conflicts_by_row: Dict[int, List[tuple]] = {}
+        for conflict in detect_schedule_conflicts(existing_schedules + candidates):
+            id_1, id_2 = conflict.schedule_1['id'], conflict.schedule_2['id']
+            if id_1 < 0:
+                conflicts_by_row.setdefault(id_1, []).append((conflict.type, conflict.schedule_2))
+            if id_2 < 0:
+                conflicts_by_row.setdefault(id_2, []).append((conflict.type, conflict.schedule_1))
+
+        # Greedy acceptance in row order, like sequential create_schedule calls
+        accepted = []
+        accepted_ids = set()
+        for candidate in candidates:
+            blocking = [
+                (conflict_type, other) for conflict_type, other in conflicts_by_row.get(candidate['id'], [])
+                if other['id'] > 0 or other['id'] in accepted_ids
+            ]
+            index = -candidate['id'] - 1
+            if not blocking:
+                accepted.append(index)
+                accepted_ids.add(candidate['id'])
+                continue
+
+            conflict_details = []
+            for conflict_type, other in blocking:
+                conflict_details.append({
+                    'type': conflict_type,
+                    'conflicting_id': other['id'] if other['id'] > 0 else None,
+                    'conflicting_row': -other['id'] if other['id'] < 0 else None,
+                    'conflicting_details': {
+                        'kode_mk': other.get('kode_mk', ''),
+                        'hari': other.get('hari', ''),
+                        'jam_mulai': str(other.get('jam_mulai', '')),
+                        'jam_selesai': str(other.get('jam_selesai', '')),
+                        'ruangan_id': other.get('ruangan_id', ''),
+                        'dosen_id': other.get('dosen_id', '')
+                    }
+                })
+            results[index] = {'status': 'conflict', 'conflicts': conflict_details, 'suggestions': []}
+
+        # Insert every accepted row and its event in one transaction
+        db_schedules = [
+            JadwalKelas(
+                kode_mk=rows[index]['kode_mk'],
+                dosen_id=rows[index]['dosen_id'],
+                ruang_id=rows[index]['ruang_id'],
+                semester=rows[index]['semester'],
+                hari=rows[index]['hari'],
+                jam_mulai=rows[index]['jam_mulai'],
+                jam_selesai=rows[index]['jam_selesai'],
+                kapasitas_kelas=rows[index]['kapasitas_kelas'],
+                kelas=rows[index].get('kelas')
+            )
+            for index in accepted
+        ]
+        if db_schedules:
+            db.add_all(db_schedules)
+            db.flush()  # Get the IDs without committing
+            db.execute(JadwalKelasEvent.__table__.insert(), [
+                {'jadwal_kelas_id': s.id, 'semester': s.semester, 'event_type': "SCHEDULE_CREATED"}
+                for s in db_schedules
+            ])
+
+        created_ids = [db_schedule.id for db_schedule in db_schedules]
+        for index, schedule_id in zip(accepted, created_ids):
+            results[index] = {'status': 'created', 'id': schedule_id}
+
+        # Suggestions are expensive, so only on request and after the batch is visible
+        if with_suggestions:
+            from schedule_system.ai_rescheduler import generate_schedule_alternatives
+            for index, result in enumerate(results):
+                if result['status'] == 'conflict':
+                    row = rows[index]
+                    result['suggestions'] = generate_schedule_alternatives(
+                        kode_mk=row['kode_mk'],
+                        dosen_id=row['dosen_id'],
+                        ruang_id=row['ruang_id'],
+                        hari=row['hari'],
+                        jam_mulai=row['jam_mulai'],
+                        jam_selesai=row['jam_selesai'],
+                        kapasitas_kelas=row['kapasitas_kelas'],
+                        semester=row['semester'],
+                        db=db
+                    )
+
+        commit_with_retry(db)
+    except Exception:
+        db.rollback()
+        raise
+
+    if created_ids:
+        schedule_subject.notify("SCHEDULE_BULK_CREATED", {'id': created_ids, 'count': len(created_ids)})
+
+    return results
+
+
+def copy_semester(
+    from_semester: str,
+    to_semester: str,
+    db: Session = None,
+    ruang_overrides: Dict[int, int] = None,
+    dosen_overrides: Dict[int, int] = None
+) -> Dict[str, Any]:
+    """
+    Copy the timetable of a previous semester forward
+
+    The JadwalKelas rows are cloned with a single INSERT ... SELECT, remapping retired
+    rooms and lecturers on the way, and their jadwal_kelas_event rows are written the
+    same way. The all-conflicts engine then runs once over the new semester so the
+    admin can fix the clashes the overrides introduced.
+
+    Args:
+        from_semester: Semester to copy from (e.g. "2023/2024-1")
+        to_semester: Semester to create (must not have any schedule yet)
+        db: Database session
+        ruang_overrides: {old_ruang_id: new_ruang_id} for rooms that are no longer used
+        dosen_overrides: {old_dosen_id: new_dosen_id} for lecturers that are no longer teaching
+
+    Returns:
+        {"copied": int, "conflicts": [{"type", "schedule_1", "schedule_2"}, ...]}
+
+    Raises:
+        ValueError: Same semesters, target already scheduled, empty source, or an override
+            to a room or lecturer that does not exist
+    """
+    from schedule_system.models import Dosen
+    from schedule_system.database import commit_with_retry
+
+    if from_semester == to_semester:
+        raise ValueError("Source and target semester must be different")
+
+    try:
+        if db.query(JadwalKelas.id).filter(JadwalKelas.semester == to_semester).first():
+            raise ValueError(f"Semester {to_semester} already has schedules")
+
+        # Foreign keys are not enforced on SQLite: check the override targets up front
+        for model, label, overrides in ((Ruang, "Room", ruang_overrides), (Dosen, "Dosen", dosen_overrides)):
+            targets = set((overrides or {}).values())
+            known = {r for (r,) in db.query(model.id).filter(model.id.in_(targets)).all()} if targets else set()
+            unknown = sorted(targets - known)
+            if unknown:
+                raise ValueError(f"{label} override target not found: {', '.join(map(str, unknown))}")
+
+        ruang_id = JadwalKelas.ruang_id
+        if ruang_overrides:
+            ruang_id = case(ruang_overrides, value=JadwalKelas.ruang_id, else_=JadwalKelas.ruang_id)
+        dosen_id = JadwalKelas.dosen_id
+        if dosen_overrides:
+            dosen_id = case(dosen_overrides, value=JadwalKelas.dosen_id, else_=JadwalKelas.dosen_id)
+
+        copied = db.execute(
+            insert(JadwalKelas).from_select(
+                ['kode_mk', 'dosen_id', 'ruang_id', 'semester', 'hari',
+                 'jam_mulai', 'jam_selesai', 'kapasitas_kelas', 'kelas'],
+                select(
+                    JadwalKelas.kode_mk, dosen_id, ruang_id, literal(to_semester),
+                    JadwalKelas.hari, JadwalKelas.jam_mulai, JadwalKelas.jam_selesai,
+                    JadwalKelas.kapasitas_kelas, JadwalKelas.kelas
+                ).where(JadwalKelas.semester == from_semester).order_by(JadwalKelas.id)
+            )
+        ).rowcount
+
+        if not copied:
+            raise ValueError(f"Semester {from_semester} has no schedules to copy")
+
+        # Every row of the target semester is new, so its events are one INSERT ... SELECT too
+        db.execute(
+            insert(JadwalKelasEvent).from_select(
+                ['jadwal_kelas_id', 'semester', 'event_type'],
+                select(JadwalKelas.id, JadwalKelas.semester, literal("SCHEDULE_CREATED"))
+                .where(JadwalKelas.semester == to_semester)
+                .order_by(JadwalKelas.id)
+            )
+        )
+
+        # One run of the all-conflicts engine over the new semester
+        schedule_list = [
+            {
+                'id': row.id,
+                'hari': row.hari,
+                'jam_mulai': row.jam_mulai,
+                'jam_selesai': row.jam_selesai,
+                'ruangan_id': row.ruang_id,
+                'dosen_id': row.dosen_id
+            }
+            for row in db.query(
+                JadwalKelas.id, JadwalKelas.hari, JadwalKelas.jam_mulai,
+                JadwalKelas.jam_selesai, JadwalKelas.ruang_id, JadwalKelas.dosen_id
+            ).filter(JadwalKelas.semester == to_semester).order_by(JadwalKelas.id).all()
+        ]
+        conflicts = detect_schedule_conflicts(schedule_list)
+
+        commit_with_retry(db)
+    except Exception:
+        db.rollback()
+        raise
+
+    schedule_subject.notify("SEMESTER_COPIED", {
+        'id': [schedule['id'] for schedule in schedule_list],
+        'from_semester': from_semester,
+        'semester': to_semester,
+        'count': copied
+    })
+
+    return {
+        'copied': copied,
+        'conflicts': [
+            {'type': c.type, 'schedule_1': c.schedule_1, 'schedule_2': c.schedule_2}
+            for c in conflicts
+        ]
+    }
+
+
 def invalidate_affected_krs(jadwal, db: Session) -> None:
     """
     Invalidate all KRS that contain the course from the given schedule
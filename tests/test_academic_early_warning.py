@@ -0,0 +1,90 @@
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from krs_system.models import KRS, KRSStatusEnum
+from auth_system.dependencies import get_current_user
+from auth_system.models import RoleEnum
+from grades_system.models import Grade, AcademicWarning
+from grades_system.router import router
+from grades_system.services.gpa_service import calculate_ips
+from grades_system.services.early_warning import run_academic_early_warning, get_academic_warnings
+
+SEM1, SEM2 = "2023/2024-1", "2023/2024-2"
+NILAI = {"A": 4.0, "B": 3.0, "C": 2.0, "D": 1.0, "E": 0.0}
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+
+    def grade(nim, matakuliah_id, semester, huruf, sks=9):
+        db.add(Grade(nim=nim, matakuliah_id=matakuliah_id, semester=semester, nilai_huruf=huruf,
+                     nilai_angka=NILAI[huruf], sks=sks, dosen_id=1))
+
+    # 001: IPS 4.00 -> 2.00
+    grade("001", 1, SEM1, "A"), grade("001", 2, SEM1, "A"), grade("001", 3, SEM2, "C"), grade("001", 4, SEM2, "C")
+    # 002: first semester with an E, 9 of 18 SKS passed
+    grade("002", 1, SEM2, "E"), grade("002", 2, SEM2, "B")
+    # 003: on track
+    grade("003", 1, SEM1, "B", 18), grade("003", 2, SEM2, "B", 18)
+    # 004: no grades in the evaluated semester
+    grade("004", 1, SEM1, "E", 18)
+    db.add(KRS(nim="002", semester=SEM2, status=KRSStatusEnum.APPROVED, dosen_pa_id=7))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_batch_flags_students(db_session):
+    result = run_academic_early_warning(db_session)
+    assert (result["semester"], result["students"], result["flagged"]) == (SEM2, 3, 2)
+    assert result["by_flag"] == {"IPS_TURUN": 1, "SKS_KURANG": 1, "NILAI_E": 1}
+
+    warnings = {w.nim: w for w in db_session.query(AcademicWarning).all()}
+    assert set(warnings) == {"001", "002"}
+    assert (warnings["001"].flags, warnings["001"].previous_ips, warnings["001"].ips_drop) == ("IPS_TURUN", 4.0, 2.0)
+    assert (warnings["002"].flags, warnings["002"].severity) == ("SKS_KURANG,NILAI_E", 2)
+    assert (warnings["002"].sks_lulus, warnings["002"].sks_shortfall, warnings["002"].e_count) == (9, 9, 1)
+    assert warnings["002"].previous_ips is None
+    assert warnings["002"].dosen_pa_id == 7
+    for nim, warning in warnings.items():
+        assert warning.ips == calculate_ips(db_session, nim, SEM2)
+
+    # Rerunning replaces the semester's rows
+    run_academic_early_warning(db_session, SEM2)
+    assert db_session.query(AcademicWarning).count() == 2
+    page = get_academic_warnings(db_session, flag="NILAI_E")
+    assert (page["total"], page["items"][0].nim) == (1, "002")
+
+
+def test_early_warning_endpoint(db_session):
+    run_academic_early_warning(db_session)
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    user = SimpleNamespace(username="admin", role=RoleEnum.ADMIN, kode_dosen=None, nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    body = client.get("/api/grades/early-warning?limit=1").json()
+    assert (body["semester"], body["total"], [i["nim"] for i in body["items"]]) == (SEM2, 2, ["002"])
+
+    # A dosen only sees their advisees
+    user.role, user.kode_dosen = RoleEnum.DOSEN, "7"
+    body = client.get("/api/grades/early-warning").json()
+    assert [i["nim"] for i in body["items"]] == ["002"]
+    assert client.post("/api/grades/early-warning/run").status_code == 403
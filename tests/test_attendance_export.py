@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+import pytest
+from datetime import datetime, time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from pmb_system import models as pmb_models
+from pmb_system.models import CalonMahasiswa, ProgramStudi, JalurMasukEnum
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from attendance_system.attendance_export import iter_attendance_rows, iter_attendance_csv
+from attendance_system.attendance_matrix import build_attendance_matrix
+from attendance_system.attendance_report import router
+from auth_system.dependencies import get_current_user
+from krs_system.models import Matakuliah, KRS, KRSDetail, KRSStatusEnum
+from schedule_system.models import Dosen, Ruang, JadwalKelas
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # PMB models are declared on their own Base
+    pmb_models.Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        ProgramStudi(kode="TIF", nama="Teknik Informatika", fakultas="Teknik"),
+        ProgramStudi(kode="MNJ", nama="Manajemen", fakultas="Ekonomi"),
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", program_studi="Teknik Informatika", kode_dosen="1"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com", program_studi="Manajemen", kode_dosen="2"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+        Matakuliah(kode="MK2", nama="Akuntansi", sks=3, semester=1, hari="selasa",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db.add_all([
+        JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester=SEMESTER, hari="senin",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40, kelas="A"),
+        JadwalKelas(kode_mk="MK2", dosen_id=2, ruang_id=1, semester=SEMESTER, hari="selasa",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40, kelas="A"),
+        # No sessions yet: not exported
+        JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester="2024/2025-2", hari="senin",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40, kelas="A"),
+    ])
+    db.commit()
+    for i, nim in enumerate(("001", "002", "003"), start=1):
+        db.add(CalonMahasiswa(nama_lengkap=f"Mahasiswa {nim}", email=f"{nim}@example.com", phone="081234567890",
+                              tanggal_lahir=datetime(2005, 1, 1), alamat="Jakarta", program_studi_id=1,
+                              jalur_masuk=JalurMasukEnum.SNBT, nim=nim))
+        db.add(KRS(id=i, nim=nim, semester=SEMESTER, status=KRSStatusEnum.APPROVED))
+        db.add(KRSDetail(krs_id=i, matakuliah_id=1))
+    db.add(KRSDetail(krs_id=3, matakuliah_id=2))
+    # MK1 holds sessions 1, 2 and 4; MK2 holds session 1
+    db.add_all([AttendanceSession(schedule_id=1, session_number=n, qr_token=f"a{n}", is_active=True) for n in (1, 2, 4)])
+    db.add(AttendanceSession(schedule_id=2, session_number=1, qr_token="b1", is_active=True))
+    db.commit()
+    for nim, session_ids in (("001", (1, 2, 3)), ("002", (1,)), ("003", (4,))):
+        db.add_all([AttendanceRecord(attendance_session_id=s, nim=nim) for s in session_ids])
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_rows_fold_sessions_per_student(db_session):
+    rows = list(iter_attendance_rows(db_session, batch_size=2))
+    assert [(r["schedule_id"], r["nim"]) for r in rows] == [(1, "001"), (1, "002"), (1, "003"), (2, "003")]
+    assert rows[0]["sesi"] == {1: True, 2: True, 4: True}
+    assert (rows[1]["hadir"], rows[1]["total_sesi"], rows[1]["status"]) == (1, 3, "KRITIS")
+    assert (rows[3]["hadir"], rows[3]["persentase"]) == (1, 100.0)
+
+    # Same numbers as the per-schedule matrix
+    matrix = build_attendance_matrix(db_session, 1)
+    assert [r["persentase"] for r in rows[:3]] == matrix.percentages().tolist()
+
+
+def test_filters(db_session):
+    assert {r["schedule_id"] for r in iter_attendance_rows(db_session, fakultas="Ekonomi")} == {2}
+    assert {r["schedule_id"] for r in iter_attendance_rows(db_session, dosen_id=1)} == {1}
+    assert list(iter_attendance_rows(db_session, semester="2024/2025-2")) == []
+
+
+def test_csv_has_a_column_per_session(db_session):
+    chunks = list(iter_attendance_csv(db_session, batch_size=1, schedule_id=1))
+    assert len(chunks) == 4
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert [(r["S1"], r["S2"], r["S3"], r["S4"]) for r in rows] == [("1", "1", "", "1"), ("1", "0", "", "0"),
+                                                                      ("0", "0", "", "0")]
+    assert rows[2]["S16"] == ""
+
+
+def test_export_endpoint(db_session):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    user = SimpleNamespace(username="admin", role="ADMIN", kode_dosen=None, nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    response = client.get(f"/api/attendance/export?format=ndjson&semester={SEMESTER}")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 4
+    assert lines[0]["sesi"] == {"1": True, "2": True, "4": True}
+
+    response = client.get("/api/attendance/export?fakultas=Teknik")
+    assert response.headers["content-type"].startswith("text/csv")
+    assert len(response.text.strip().splitlines()) == 4
+    assert client.get("/api/attendance/export?format=xlsx").status_code == 400
+
+    # A lecturer only gets their own classes, whatever dosen_id they ask for
+    user.role, user.kode_dosen = "DOSEN", "2"
+    lines = [json.loads(line) for line in client.get("/api/attendance/export?format=ndjson&dosen_id=1").text.splitlines()]
+    assert {line["schedule_id"] for line in lines} == {2}
+    user.role = "MAHASISWA"
+    assert client.get("/api/attendance/export").status_code == 403
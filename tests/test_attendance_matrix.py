@@ -0,0 +1,118 @@
+import csv
+import io
+import pytest
+from datetime import datetime, time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from pmb_system import models as pmb_models
+from pmb_system.models import CalonMahasiswa, ProgramStudi, JalurMasukEnum
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from attendance_system.attendance_matrix import get_attendance_matrix
+from attendance_system.attendance_report import router
+from attendance_system.qr_tokens import make_rotating_token
+from attendance_system.scan_pipeline import ScanPipeline
+from krs_system.models import Matakuliah, KRS, KRSDetail, KRSStatusEnum
+from schedule_system.models import Dosen, Ruang, JadwalKelas
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # PMB models are declared on their own Base
+    pmb_models.Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add(ProgramStudi(kode="TIF", nama="Teknik Informatika", fakultas="Teknik"))
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", kode_dosen="1"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db.add(JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester=SEMESTER, hari="senin",
+                       jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40))
+    db.commit()
+    for i, nim in enumerate(("001", "002", "003", "004"), start=1):
+        if nim != "004":
+            db.add(CalonMahasiswa(nama_lengkap=f"Mahasiswa {nim}", email=f"{nim}@example.com", phone="081234567890",
+                                  tanggal_lahir=datetime(2005, 1, 1), alamat="Jakarta", program_studi_id=1,
+                                  jalur_masuk=JalurMasukEnum.SNBT, nim=nim))
+        db.add(KRS(id=i, nim=nim, semester=SEMESTER, status=KRSStatusEnum.APPROVED))
+        db.add(KRSDetail(krs_id=i, matakuliah_id=1))
+    db.add_all([AttendanceSession(schedule_id=1, session_number=n, qr_token=f"t{n}", is_active=True)
+                for n in (1, 2, 3, 4)])
+    db.commit()
+    # 001: 4/4, 002: 3/4, 003: 2/4, 004: 1/4
+    for nim, sessions in (("001", (1, 2, 3, 4)), ("002", (1, 2, 3)), ("003", (1, 4)), ("004", (2,))):
+        db.add_all([AttendanceRecord(attendance_session_id=s, nim=nim) for s in sessions])
+    db.commit()
+    db.close()
+    return TestingSessionLocal
+
+
+def test_matrix_is_built_with_constant_queries(session_factory):
+    db = session_factory()
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    matrix = get_attendance_matrix(db, 1)
+    assert len(statements) == 4
+    assert matrix.nims == ["001", "002", "003", "004"]
+    assert matrix.hadir().tolist() == [4, 3, 2, 1]
+    assert matrix.statuses().tolist() == ["AMAN", "AMAN", "PERINGATAN", "KRITIS"]
+    assert matrix.presence[2].tolist() == [True, False, False, True]
+
+    # Served from the cache until a scan of the schedule is written
+    assert get_attendance_matrix(db, 1) is matrix
+    assert len(statements) == 4
+    assert get_attendance_matrix(db, 99) is None
+    db.close()
+
+
+def test_scan_invalidates_the_matrix(session_factory, tmp_path):
+    db = session_factory()
+    before = get_attendance_matrix(db, 1)
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"))
+    pipeline.record(db, make_rotating_token(4), "004")
+    after = get_attendance_matrix(db, 1)
+    assert after is not before
+    assert after.hadir().tolist() == [4, 3, 2, 2]
+    db.close()
+
+
+def test_report_insights_and_csv_share_the_matrix(session_factory):
+    db = session_factory()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+
+    report = client.get("/api/attendance/report/schedule/1").json()["data"]
+    assert (report["course_name"], report["lecturer_name"], report["total_sessions"]) == ("Algoritma", "Dosen 1", 4)
+    assert [(s["nim"], s["persentase"], s["status"]) for s in report["students"]] == [
+        ("001", 100.0, "AMAN"), ("002", 75.0, "AMAN"), ("003", 50.0, "PERINGATAN"), ("004", 25.0, "KRITIS")
+    ]
+    assert report["students"][3]["nama"] == "Student 004"
+
+    insights = client.get("/api/attendance/insights/schedule/1").json()["data"]
+    assert insights["class_attendance_avg"] == 62.5
+    assert [(w["nim"], w["warning_level"]) for w in insights["student_warnings"]] == [
+        ("003", "PERINGATAN"), ("004", "KRITIS")
+    ]
+
+    rows = list(csv.reader(io.StringIO(client.get("/api/attendance/report/schedule/1/export/csv").text)))
+    assert rows[0] == ["NIM", "Nama", "Hadir", "Total Sesi", "Persentase"]
+    assert rows[2] == ["002", "Mahasiswa 002", "3", "4", "75.0%"]
+
+    assert client.get("/api/attendance/report/schedule/99").status_code == 404
+    db.close()
@@ -0,0 +1,95 @@
+import pytest
+from datetime import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from attendance_system.models import AttendanceSession
+from attendance_system.router import router
+from attendance_system.services import create_attendance_sessions_bulk
+from auth_system.dependencies import get_current_user
+from schedule_system.models import Dosen, Ruang, JadwalKelas
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", kode_dosen="1"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com", kode_dosen="2"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+    ])
+    # Schedules 1-2 of dosen 1 and 3 of dosen 2 this semester, 4 in another semester
+    for kode_mk, dosen_id, semester in (("MK1", 1, SEMESTER), ("MK2", 1, SEMESTER),
+                                        ("MK3", 2, SEMESTER), ("MK4", 1, "2023/2024-2")):
+        db.add(JadwalKelas(kode_mk=kode_mk, dosen_id=dosen_id, ruang_id=1, semester=semester, hari="senin",
+                           jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40))
+    db.add(AttendanceSession(schedule_id=1, session_number=1, qr_token="lama", is_active=True))
+    db.commit()
+    db.close()
+    return TestingSessionLocal
+
+
+def test_semester_sessions_are_created_with_one_commit(session_factory):
+    db = session_factory()
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    result = create_attendance_sessions_bulk(db, semester=SEMESTER)
+
+    assert (result["schedules"], result["created"], result["existing"]) == (3, 47, 1)
+    assert len(result["sessions"]) == 48
+    assert result["sessions"][0] == {**result["sessions"][0], "id": 1, "created": False}
+    assert len({session["id"] for session in result["sessions"]}) == 48
+    # Stored tokens never expire, so they are not handed out
+    assert not any("qr_token" in session for session in result["sessions"])
+    assert not any(session["is_active"] for session in result["sessions"] if session["created"])
+    assert sum(sql.startswith("INSERT") for sql in statements) == 1
+    assert db.query(AttendanceSession).count() == 48
+
+    # Running it again creates nothing and keeps every token
+    tokens = {session.id: session.qr_token for session in db.query(AttendanceSession).all()}
+    again = create_attendance_sessions_bulk(db, semester=SEMESTER)
+    assert (again["created"], again["existing"]) == (0, 48)
+    assert {s["id"] for s in again["sessions"]} == {s["id"] for s in result["sessions"]}
+    assert {session.id: session.qr_token for session in db.query(AttendanceSession).all()} == tokens
+    assert tokens[1] == "lama"
+
+    with pytest.raises(ValueError):
+        create_attendance_sessions_bulk(db)
+    with pytest.raises(ValueError):
+        create_attendance_sessions_bulk(db, schedule_ids=[4], session_numbers=[17])
+    db.close()
+
+
+def test_bulk_endpoint_limits_lecturers_to_their_schedules(session_factory):
+    db = session_factory()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db
+    user = SimpleNamespace(username="dosen1", role="DOSEN", kode_dosen="1", nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    response = client.post("/api/attendance/session/bulk", json={"semester": SEMESTER, "session_numbers": [1, 2]})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert (data["schedules"], data["created"], data["existing"]) == (2, 3, 1)
+
+    assert client.post("/api/attendance/session/bulk", json={"schedule_ids": [3]}).status_code == 400
+
+    user.role, user.kode_dosen = "ADMIN", None
+    response = client.post("/api/attendance/session/bulk", json={"schedule_ids": [3, 4]})
+    assert response.json()["data"]["created"] == 32
+    db.close()
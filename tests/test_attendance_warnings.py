@@ -0,0 +1,118 @@
+import pytest
+from datetime import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from attendance_system.models import AttendanceSession, AttendanceRecord, AttendanceWarning
+from attendance_system.attendance_report import router
+from attendance_system.attendance_warnings import run_attendance_early_warning
+from auth_system.dependencies import get_current_user
+from krs_system.models import Matakuliah, KRS, KRSDetail, KRSStatusEnum
+from schedule_system.models import Dosen, Ruang, JadwalKelas
+
+SEMESTER = "2024/2025-1"
+PREVIOUS = "2023/2024-2"
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", kode_dosen="1"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com", kode_dosen="2"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+        Matakuliah(kode="MK2", nama="Basis Data", sks=3, semester=1, hari="selasa",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    for kode_mk, dosen_id, semester in (("MK1", 1, SEMESTER), ("MK2", 2, SEMESTER), ("MK1", 1, PREVIOUS)):
+        db.add(JadwalKelas(kode_mk=kode_mk, dosen_id=dosen_id, ruang_id=1, semester=semester, hari="senin",
+                           jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40))
+    db.commit()
+    # 005 took MK1 last semester, so it is only on the roster of schedule 3
+    krs = (("001", SEMESTER, (1, 2)), ("002", SEMESTER, (1,)), ("003", SEMESTER, (1,)),
+           ("004", SEMESTER, (2,)), ("005", PREVIOUS, (1,)))
+    for i, (nim, semester, courses) in enumerate(krs, start=1):
+        db.add(KRS(id=i, nim=nim, semester=semester, status=KRSStatusEnum.APPROVED))
+        db.add_all([KRSDetail(krs_id=i, matakuliah_id=matakuliah_id) for matakuliah_id in courses])
+    sessions = [(1, n) for n in (1, 2, 3, 4)] + [(2, 1), (2, 2), (3, 1)]
+    db.add_all([AttendanceSession(schedule_id=schedule_id, session_number=number, qr_token=f"t{i}", is_active=True)
+                for i, (schedule_id, number) in enumerate(sessions, start=1)])
+    db.commit()
+    # Schedule 1: 001 4/4, 002 2/4, 003 0/4; schedule 2: 001 1/2, 004 0/2
+    for nim, session_ids in (("001", (1, 2, 3, 4, 5)), ("002", (1, 2))):
+        db.add_all([AttendanceRecord(attendance_session_id=s, nim=nim) for s in session_ids])
+    db.commit()
+    db.close()
+    return TestingSessionLocal
+
+
+def test_sweep_uses_one_grouped_query_and_replaces_the_semester(session_factory):
+    db = session_factory()
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    result = run_attendance_early_warning(db, SEMESTER)
+
+    assert result == {"semester": SEMESTER, "students": 5, "flagged": 4, "by_status": {"PERINGATAN": 2, "KRITIS": 2}}
+    assert sum(sql.startswith("SELECT") for sql in statements) == 1
+    rows = {(w.schedule_id, w.nim): (w.hadir, w.total_sesi, w.persentase, w.status)
+            for w in db.query(AttendanceWarning).all()}
+    assert rows == {
+        (1, "002"): (2, 4, 50.0, "PERINGATAN"),
+        (1, "003"): (0, 4, 0.0, "KRITIS"),
+        (2, "001"): (1, 2, 50.0, "PERINGATAN"),
+        (2, "004"): (0, 2, 0.0, "KRITIS"),
+    }
+
+    # 003 catches up: the next run rewrites the semester
+    db.add_all([AttendanceRecord(attendance_session_id=s, nim="003") for s in (1, 2, 3)])
+    db.commit()
+    assert run_attendance_early_warning(db, SEMESTER)["flagged"] == 3
+    assert db.query(AttendanceWarning).count() == 3
+
+    # Without a semester, the latest one with sessions is swept
+    assert run_attendance_early_warning(db)["semester"] == SEMESTER
+    assert run_attendance_early_warning(db, PREVIOUS)["by_status"] == {"PERINGATAN": 0, "KRITIS": 1}
+    db.close()
+
+
+def test_warnings_endpoint_pages_by_severity(session_factory):
+    db = session_factory()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db
+    user = SimpleNamespace(username="admin", role="ADMIN", kode_dosen=None, nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    assert client.post("/api/attendance/early-warning/run", params={"semester": SEMESTER}).json()["data"]["flagged"] == 4
+    data = client.get("/api/attendance/early-warning").json()["data"]
+    assert (data["semester"], data["total"]) == (SEMESTER, 4)
+    assert [(item["nim"], item["status"]) for item in data["items"]] == [
+        ("003", "KRITIS"), ("004", "KRITIS"), ("001", "PERINGATAN"), ("002", "PERINGATAN")
+    ]
+    page = client.get("/api/attendance/early-warning", params={"skip": 1, "limit": 2}).json()["data"]
+    assert [item["nim"] for item in page["items"]] == ["004", "001"]
+    kritis = client.get("/api/attendance/early-warning", params={"status": "KRITIS"}).json()["data"]
+    assert kritis["total"] == 2
+
+    user.role, user.kode_dosen = "DOSEN", "2"
+    data = client.get("/api/attendance/early-warning").json()["data"]
+    assert {item["schedule_id"] for item in data["items"]} == {2}
+    assert client.post("/api/attendance/early-warning/run").status_code == 403
+
+    user.role = "MAHASISWA"
+    assert client.get("/api/attendance/early-warning").status_code == 403
+    db.close()
@@ -0,0 +1,117 @@
+import random
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from pmb_system import models as pmb_models
+from pmb_system.models import CalonMahasiswa, ProgramStudi, JalurMasukEnum
+from auth_system.dependencies import get_current_user
+from auth_system.models import RoleEnum
+from grades_system.models import Grade
+from grades_system.router_gpa import router
+from grades_system.services.cohort_gpa import get_cohort_gpa
+from grades_system.services.gpa_service import calculate_ipk, get_predikat
+
+NILAI = {"A": 4.0, "B": 3.0, "C": 2.0, "D": 1.0, "E": 0.0}
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # PMB models are declared on their own Base
+    pmb_models.Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        ProgramStudi(kode="TIF", nama="Teknik Informatika", fakultas="Teknik"),
+        ProgramStudi(kode="MNJ", nama="Manajemen", fakultas="Ekonomi"),
+    ])
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _student(db, nim, prodi=1):
+    db.add(CalonMahasiswa(nama_lengkap=f"Mahasiswa {nim}", email=f"{nim}@example.com", phone="081234567890",
+                          tanggal_lahir=datetime(2005, 1, 1), alamat="Jakarta", program_studi_id=prodi,
+                          jalur_masuk=JalurMasukEnum.SNBT, nim=nim))
+
+
+def _grade(db, nim, matakuliah_id, huruf, sks=3, semester="2023/2024-1"):
+    db.add(Grade(nim=nim, matakuliah_id=matakuliah_id, semester=semester, nilai_huruf=huruf,
+                 nilai_angka=NILAI[huruf], sks=sks, dosen_id=1))
+
+
+def test_cohort_ranking(db_session):
+    for nim in ("2023TIF001", "2023TIF002", "2023TIF003", "2023TIF004"):
+        _student(db_session, nim)
+    _student(db_session, "2023MNJ001", prodi=2)
+    _grade(db_session, "2023TIF001", 1, "D")
+    _grade(db_session, "2023TIF001", 1, "A", semester="2024/2025-1")  # repeat: best counts
+    _grade(db_session, "2023TIF001", 2, "B", sks=2)
+    _grade(db_session, "2023TIF002", 1, "A")
+    _grade(db_session, "2023TIF002", 2, "E", sks=2)                   # failed: not counted
+    _grade(db_session, "2023TIF003", 1, "C")
+    _grade(db_session, "2023MNJ001", 1, "A")
+    db_session.commit()
+
+    result = get_cohort_gpa(db_session, program_studi_id=1, angkatan="2023")
+    assert result["total_students"] == 4
+    students = {s["nim"]: s for s in result["students"]}
+    assert [s["nim"] for s in result["students"]] == ["2023TIF002", "2023TIF001", "2023TIF003", "2023TIF004"]
+    assert (students["2023TIF001"]["ipk"], students["2023TIF001"]["sks_lulus"]) == (3.6, 5)
+    assert [students[nim]["rank"] for nim in ("2023TIF002", "2023TIF001", "2023TIF003", "2023TIF004")] == [1, 2, 3, 4]
+    assert students["2023TIF004"]["ipk"] == 0.0
+    assert students["2023TIF002"]["percentile"] == 87.5
+    assert result["predikat"] == {"Cum Laude": 2, "Sangat Memuaskan": 0, "Memuaskan": 0, "Cukup": 1, "Kurang": 1}
+    assert sum(b["count"] for b in result["histogram"]) == 4
+    assert (result["histogram"][0]["lower"], result["histogram"][-1]["upper"]) == (0.0, 4.0)
+    assert result["percentiles"]["p50"] == round((2.0 + 3.6) / 2, 2)
+
+    with pytest.raises(ValueError):
+        get_cohort_gpa(db_session)
+
+
+def test_cohort_ipk_matches_calculate_ipk(db_session):
+    rng = random.Random(7)
+    nims = [f"2022TIF{i:03d}" for i in range(40)]
+    for nim in nims:
+        _student(db_session, nim)
+        for _ in range(rng.randint(0, 12)):
+            _grade(db_session, nim, rng.randint(1, 8), rng.choice("ABCDE"), sks=rng.choice([2, 3, 4]),
+                   semester=rng.choice(["2022/2023-1", "2022/2023-2", "2023/2024-1"]))
+    db_session.commit()
+
+    result = get_cohort_gpa(db_session, angkatan="2022")
+    assert result["total_students"] == len(nims)
+    for student in result["students"]:
+        assert student["ipk"] == calculate_ipk(db_session, student["nim"])
+        assert student["predikat"] == get_predikat(student["ipk"])
+        assert student["rank"] == 1 + sum(s["ipk"] > student["ipk"] for s in result["students"])
+
+
+def test_cohort_endpoint_access(db_session):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    user = SimpleNamespace(username="dosen1", role=RoleEnum.DOSEN, kode_dosen="7", nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    assert client.get("/api/gpa/cohort?program_studi_id=1").status_code == 200
+    assert client.get("/api/gpa/cohort").status_code == 400
+    assert client.get("/api/gpa/cohort?program_studi_id=1&bin_width=0").status_code == 400
+    user.role = RoleEnum.MAHASISWA
+    assert client.get("/api/gpa/cohort?program_studi_id=1").status_code == 403
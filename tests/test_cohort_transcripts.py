@@ -0,0 +1,107 @@
+import io
+import zipfile
+import pytest
+from datetime import datetime, time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from pmb_system import models as pmb_models
+from pmb_system.models import CalonMahasiswa, ProgramStudi, JalurMasukEnum
+from krs_system.models import Matakuliah
+from auth_system.dependencies import get_current_user
+from auth_system.models import RoleEnum
+from grades_system.models import Grade
+from grades_system.router_gpa import router
+from grades_system.services.gpa_service import get_transcript
+from grades_system.services.cohort_transcripts import iter_cohort_transcripts, stream_transcript_zip
+
+TIF_2023 = ["2023TIF0001", "2023TIF0002", "2023TIF0003"]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # PMB models are declared on their own Base
+    pmb_models.Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSessionLocal()
+    db.add_all([
+        ProgramStudi(kode="TIF", nama="Teknik Informatika", fakultas="Teknik"),
+        ProgramStudi(kode="MNJ", nama="Manajemen", fakultas="Ekonomi"),
+    ])
+    students = [(nim, 1) for nim in TIF_2023] + [("2022TIF0001", 1), ("2023MNJ0001", 2)]
+    db.add_all([
+        CalonMahasiswa(nama_lengkap=f"Mahasiswa {nim}", email=f"{nim}@example.com", phone="081234567890",
+                       tanggal_lahir=datetime(2005, 1, 1), alamat="Jakarta", program_studi_id=prodi,
+                       jalur_masuk=JalurMasukEnum.SNBT, nim=nim)
+        for nim, prodi in students
+    ])
+    db.add_all([
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+        Matakuliah(kode="MK2", nama="Basis Data", sks=2, semester=2, hari="selasa",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db.add_all([
+        Grade(nim="2023TIF0001", matakuliah_id=1, semester="2023/2024-1", nilai_huruf="D", nilai_angka=1.0, sks=3, dosen_id=1),
+        Grade(nim="2023TIF0001", matakuliah_id=1, semester="2024/2025-1", nilai_huruf="A", nilai_angka=4.0, sks=3, dosen_id=1),
+        Grade(nim="2023TIF0001", matakuliah_id=2, semester="2023/2024-2", nilai_huruf="B", nilai_angka=3.0, sks=2, dosen_id=1),
+        Grade(nim="2023TIF0002", matakuliah_id=2, semester="2023/2024-2", nilai_huruf="E", nilai_angka=0.0, sks=2, dosen_id=1),
+        Grade(nim="2022TIF0001", matakuliah_id=1, semester="2022/2023-1", nilai_huruf="C", nilai_angka=2.0, sks=3, dosen_id=1),
+    ])
+    db.commit()
+    db.close()
+    return TestingSessionLocal
+
+
+def test_cohort_transcripts_match_single_transcripts(session_factory):
+    db = session_factory()
+    transcripts = list(iter_cohort_transcripts(db, program_studi_id=1, angkatan="2023", chunk_size=2))
+    assert [t["biodata"]["nim"] for t in transcripts] == TIF_2023
+    assert transcripts == [get_transcript(db, nim) for nim in TIF_2023]
+
+    with pytest.raises(ValueError):
+        list(iter_cohort_transcripts(db))
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(stream_transcript_zip(iter(transcripts), workers=0))))
+    assert sorted(archive.namelist()) == [f"transkrip_{nim}.pdf" for nim in TIF_2023]
+    db.close()
+
+
+def test_cohort_zip_endpoint(session_factory):
+    app = FastAPI()
+    app.include_router(router)
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        username="admin", role=RoleEnum.ADMIN, kode_dosen=None, nim=None
+    )
+    client = TestClient(app)
+
+    response = client.get("/api/gpa/transcripts/cohort?program_studi_id=1&angkatan=2023")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["x-total-transcripts"] == "3"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(archive.namelist()) == [f"transkrip_{nim}.pdf" for nim in TIF_2023]
+    assert all(archive.read(name).startswith(b"%PDF") for name in archive.namelist())
+
+    assert client.get("/api/gpa/transcripts/cohort").status_code == 400
+    assert client.get("/api/gpa/transcripts/cohort?angkatan=2019").status_code == 404
@@ -0,0 +1,116 @@
+import pytest
+from datetime import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from krs_system.models import Matakuliah
+from schedule_system.models import Dosen
+from auth_system.dependencies import get_current_user
+from auth_system.models import RoleEnum
+from grades_system import crud
+from grades_system.models import Grade, CourseGradeStats
+from grades_system.router import router
+from grades_system.schemas import GradeCreate, GradeUpdate
+from grades_system.services.course_stats import get_course_stats, rebuild_course_grade_stats
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", program_studi="Teknik Informatika", kode_dosen="1"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com", program_studi="Manajemen", kode_dosen="2"),
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _grade(nim, huruf, presensi=100.0, dosen_id=1, semester=SEMESTER):
+    return GradeCreate(nim=nim, matakuliah_id=1, semester=semester, nilai_huruf=huruf, sks=3,
+                       dosen_id=dosen_id, presensi=presensi)
+
+
+def _snapshot(db):
+    return sorted(
+        (row.matakuliah_id, row.semester, row.dosen_id, row.count_a, row.count_b, row.count_c, row.count_d,
+         row.count_e, row.total_nilai, row.presensi_a, row.presensi_b, row.presensi_e)
+        for row in db.query(CourseGradeStats).all()
+    )
+
+
+def test_stats_follow_grade_changes(db_session):
+    crud.create_grade(db_session, _grade("001", "A", 90.0), "dosen1")
+    crud.create_grade(db_session, _grade("002", "B", 80.0), "dosen1")
+    e = crud.create_grade(db_session, _grade("003", "E", 76.0), "dosen1")
+    crud.create_grade(db_session, _grade("004", "C", dosen_id=2), "dosen2")
+
+    stats = get_course_stats(db_session, 1)
+    assert stats["overall"]["counts"] == {"A": 1, "B": 1, "C": 1, "D": 0, "E": 1}
+    assert stats["overall"]["pass_rate"] == 75.0
+    assert stats["overall"]["mean_nilai"] == 2.25
+    assert [(c["dosen_id"], c["total"]) for c in stats["classes"]] == [(1, 3), (2, 1)]
+    assert stats["classes"][0]["presensi_by_grade"] == {"A": 90.0, "B": 80.0, "C": None, "D": None, "E": 76.0}
+
+    crud.update_grade(db_session, e.id, GradeUpdate(nilai_huruf="D", reason="Remedial"), "dosen1")
+    crud.delete_grade(db_session, crud.get_grade_by_student_and_course(db_session, "001", 1).id)
+    stats = get_course_stats(db_session, 1, SEMESTER)
+    assert stats["overall"]["counts"] == {"A": 0, "B": 1, "C": 1, "D": 1, "E": 0}
+    assert stats["overall"]["pass_rate"] == 100.0
+
+    incremental = _snapshot(db_session)
+    rebuild_course_grade_stats(db_session)
+    assert _snapshot(db_session) == incremental
+
+
+def test_grades_predating_the_table_are_counted(db_session):
+    db_session.add(Grade(nim="010", matakuliah_id=1, semester=SEMESTER, nilai_huruf="B", nilai_angka=3.0,
+                         sks=3, dosen_id=1, presensi=85.0))
+    db_session.commit()
+    assert get_course_stats(db_session, 1)["overall"]["total"] == 0
+
+    # The first change of the class counts the older grade too
+    crud.create_grade(db_session, _grade("011", "A"), "dosen1")
+    assert get_course_stats(db_session, 1)["overall"]["counts"]["B"] == 1
+    assert get_course_stats(db_session, 1)["overall"]["total"] == 2
+
+
+def test_stats_endpoints(db_session):
+    crud.create_grade(db_session, _grade("001", "A"), "dosen1")
+    crud.create_grade(db_session, _grade("002", "C", dosen_id=2), "dosen2")
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    user = SimpleNamespace(username="admin", role=RoleEnum.ADMIN, kode_dosen=None, nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    response = client.get("/api/grades/course/1/stats")
+    assert response.status_code == 200
+    assert response.json()["overall"]["total"] == 2
+
+    listing = client.get("/api/grades/stats?program_studi=Manajemen").json()
+    assert listing["total"] == 1
+    assert (listing["items"][0]["kode_mk"], listing["items"][0]["nama_dosen"]) == ("MK1", "Dosen 2")
+
+    user.role = RoleEnum.MAHASISWA
+    assert client.get("/api/grades/course/1/stats").status_code == 403
+    assert client.get("/api/grades/stats").status_code == 403
@@ -0,0 +1,96 @@
+import pytest
+from datetime import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base
+from krs_system.enums import KRSStatusEnum
+from krs_system.models import KRS, KRSDetail, Matakuliah
+from schedule_system.models import Ruang
+from exam_system.models import JadwalUjian
+from exam_system.services import build_conflict_graph, color_conflict_graph, pack_rooms, generate_exam_timetable
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_coloring_is_clash_free_and_repair_minimises_clashes():
+    # Courses 1, 2, 3 form a triangle; 4 only shares a student with 1
+    student_courses = {"a": [1, 2], "b": [2, 3], "c": [1, 3], "d": [1, 3], "e": [1, 4]}
+    graph = build_conflict_graph(student_courses)
+    assert graph[1] == {2: 1, 3: 2, 4: 1}
+    sizes = {1: 4, 2: 2, 3: 3, 4: 1}
+
+    colors = color_conflict_graph(graph, sizes, seats_per_period=100)
+    assert len(set(colors.values())) == 3
+    assert all(colors[a] != colors[b] for a in graph for b in graph[a])
+
+    # Two periods: the lightest triangle edge (one student) is the only clash left
+    colors = color_conflict_graph(graph, sizes, seats_per_period=100, max_periods=2)
+    clashes = sum(w for a in graph for b, w in graph[a].items() if a < b and colors[a] == colors[b])
+    assert clashes == 1
+    assert colors[1] != colors[3]
+
+
+def test_pack_rooms_shares_leftover_seats():
+    allocation = pack_rooms([(1, 50), (2, 10), (3, 15)], [(10, 40), (11, 40)])
+    assert allocation[1] == [(11, 40), (10, 10)]
+    assert sum(seated for _, seated in allocation[2]) == 10
+    assert sum(seated for _, seated in allocation[3]) == 15
+    assert all(ruang_id is not None for rooms in allocation.values() for ruang_id, _ in rooms)
+
+
+def test_generate_exam_timetable(db_session):
+    db_session.add_all([
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=3, jenis="Kelas"),
+        Ruang(kode="R2", nama="Ruang 2", kapasitas=2, jenis="Kelas"),
+    ])
+    courses = [
+        Matakuliah(kode=kode, nama=kode, sks=3, semester=1, hari="senin", jam_mulai=time(8), jam_selesai=time(10))
+        for kode in ("MK1", "MK2", "MK3")
+    ]
+    db_session.add_all(courses)
+    db_session.commit()
+    enrolments = {"001": [0, 1], "002": [0, 1], "003": [0, 2], "004": [0], "005": [2], "007": [2], "008": [2]}
+    for nim, indexes in enrolments.items():
+        krs = KRS(nim=nim, semester=SEMESTER, status=KRSStatusEnum.APPROVED)
+        krs.krs_details = [KRSDetail(matakuliah_id=courses[i].id) for i in indexes]
+        db_session.add(krs)
+    draft = KRS(nim="006", semester=SEMESTER, status=KRSStatusEnum.DRAFT)
+    draft.krs_details = [KRSDetail(matakuliah_id=courses[1].id), KRSDetail(matakuliah_id=courses[2].id)]
+    db_session.add(draft)
+    db_session.commit()
+
+    result = generate_exam_timetable(SEMESTER, "UAS", db_session)
+
+    slots = {c['kode_mk']: c for c in result['courses']}
+    assert result['clashes'] == 0
+    assert slots["MK1"]['peserta'] == 4
+    assert slots["MK1"]['periode'] != slots["MK2"]['periode']
+    assert slots["MK1"]['periode'] != slots["MK3"]['periode']
+    # MK2 and MK3 share no approved student but do not fit the 5 seats of one period together
+    assert result['periods'] == 3
+    assert sorted(r['jumlah'] for r in slots["MK1"]['ruang']) == [1, 3]
+
+    # Regenerating replaces the stored timetable
+    generate_exam_timetable(SEMESTER, "UAS", db_session, max_periods=3)
+    rows = db_session.query(JadwalUjian).filter(JadwalUjian.jenis_ujian == "UAS").all()
+    assert sum(r.jumlah_peserta for r in rows) == 10
+
+    with pytest.raises(ValueError):
+        generate_exam_timetable(SEMESTER, "KUIS", db_session)
@@ -0,0 +1,86 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base
+from grades_system import crud
+from grades_system.models import Grade, StudentGpaSummary, StudentBestGrade
+from grades_system.schemas import GradeCreate, GradeUpdate
+from grades_system.services.gpa_service import calculate_ips, calculate_ipk
+from grades_system.services.gpa_summary import lookup_gpa, rebuild_gpa_summary, CUMULATIVE
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _grade(matakuliah_id, semester, nilai_huruf, sks, nim="2023001"):
+    return GradeCreate(nim=nim, matakuliah_id=matakuliah_id, semester=semester,
+                       nilai_huruf=nilai_huruf, sks=sks, dosen_id=1)
+
+
+def _summary(db, nim="2023001"):
+    return sorted(
+        (row.semester, row.total_mutu, row.total_sks)
+        for row in db.query(StudentGpaSummary).filter(StudentGpaSummary.nim == nim).all()
+    )
+
+
+def test_summary_follows_grade_changes(db_session):
+    a = crud.create_grade(db_session, _grade(1, "2023/2024-1", "A", 3), "dosen1")
+    crud.create_grade(db_session, _grade(2, "2023/2024-1", "E", 2), "dosen1")
+    c = crud.create_grade(db_session, _grade(3, "2023/2024-2", "C", 4), "dosen1")
+
+    assert lookup_gpa(db_session, "2023001", "2023/2024-1") == 4.0
+    assert lookup_gpa(db_session, "2023001", CUMULATIVE) == round((12 + 8) / 7, 2)
+    assert calculate_ipk(db_session, "2023001") == round((12 + 8) / 7, 2)
+
+    crud.update_grade(db_session, c.id, GradeUpdate(nilai_huruf="B", reason="Koreksi"), "dosen1")
+    assert calculate_ips(db_session, "2023001", "2023/2024-2") == 3.0
+    assert calculate_ipk(db_session, "2023001") == round((12 + 12) / 7, 2)
+
+    crud.delete_grade(db_session, a.id)
+    assert calculate_ips(db_session, "2023001", "2023/2024-1") == 0.0
+    assert calculate_ipk(db_session, "2023001") == 3.0
+
+    incremental = _summary(db_session)
+    rebuild_gpa_summary(db_session)
+    assert _summary(db_session) == [s for s in incremental if s[2] or s[0] == CUMULATIVE]
+
+
+def test_best_grade_per_course_and_fallback(db_session):
+    # A repeated course inserted directly: no summary yet, reads fall back to the grades table
+    db_session.add_all([
+        Grade(nim="2023002", matakuliah_id=1, semester="2023/2024-1", nilai_huruf="D", nilai_angka=1.0, sks=3, dosen_id=1),
+        Grade(nim="2023002", matakuliah_id=1, semester="2024/2025-1", nilai_huruf="A", nilai_angka=4.0, sks=3, dosen_id=1),
+        Grade(nim="2023002", matakuliah_id=2, semester="2024/2025-1", nilai_huruf="B", nilai_angka=3.0, sks=2, dosen_id=1),
+    ])
+    db_session.commit()
+    assert lookup_gpa(db_session, "2023002") is None
+    expected_ipk = calculate_ipk(db_session, "2023002")
+    assert expected_ipk == round((12 + 6) / 5, 2)
+
+    result = rebuild_gpa_summary(db_session)
+    assert result['students'] == 1
+    assert lookup_gpa(db_session, "2023002") == expected_ipk
+    assert lookup_gpa(db_session, "2023002", "2023/2024-1") == 1.0
+    best = db_session.query(StudentBestGrade).filter(StudentBestGrade.matakuliah_id == 1).one()
+    assert best.nilai_angka == 4.0
+
+    # Downgrading the better attempt moves the course back to the other attempt
+    better = db_session.query(Grade).filter(Grade.semester == "2024/2025-1", Grade.matakuliah_id == 1).one()
+    crud.update_grade(db_session, better.id, GradeUpdate(nilai_huruf="E", reason="Koreksi"), "admin")
+    assert calculate_ipk(db_session, "2023002") == round((3 + 6) / 5, 2)
+    assert calculate_ips(db_session, "2023002", "2024/2025-1") == 3.0
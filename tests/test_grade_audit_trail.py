@@ -0,0 +1,116 @@
+import csv
+import io
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from auth_system.dependencies import get_current_user
+from auth_system.models import RoleEnum
+from grades_system import crud
+from grades_system.audit_service import search_grade_history, iter_grade_history_csv, encode_audit_cursor
+from grades_system.models import Grade, GradeHistory
+from grades_system.router import router
+from grades_system.schemas import GradeUpdate
+
+START = datetime(2024, 9, 1, 8, 0)
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        Grade(nim="001", matakuliah_id=1, semester="2024/2025-1", nilai_huruf="B", nilai_angka=3.0, sks=3, dosen_id=1),
+        Grade(nim="002", matakuliah_id=2, semester="2024/2025-1", nilai_huruf="C", nilai_angka=2.0, sks=3, dosen_id=1),
+    ])
+    db.commit()
+    # 7 changes; every second one shares its timestamp with the previous one
+    for i in range(7):
+        grade_id = 1 if i % 2 == 0 else 2
+        db.add(GradeHistory(grade_id=grade_id, nim="001" if grade_id == 1 else "002", matakuliah_id=grade_id,
+                            old_value="B(3.0)", new_value="A(4.0)", changed_by="dosen1" if i < 5 else "admin",
+                            changed_at=START + timedelta(minutes=i // 2), reason=f"perubahan {i}"))
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_keyset_pages_cover_every_row_once(db_session):
+    seen, cursor = [], None
+    while True:
+        page = search_grade_history(db_session, cursor=cursor, limit=3)
+        seen.extend(page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 7
+    assert len({h.id for h in seen}) == 7
+    assert [(h.changed_at, h.id) for h in seen] == sorted(((h.changed_at, h.id) for h in seen), reverse=True)
+
+
+def test_history_without_changed_at_still_has_a_cursor(db_session):
+    history = GradeHistory(grade_id=1, nim="001", matakuliah_id=1, old_value="B(3.0)", new_value="A(4.0)",
+                           changed_by="dosen1", reason="tanpa waktu")
+    db_session.add(history)
+    db_session.commit()
+    assert history.changed_at is not None
+    assert encode_audit_cursor(history).endswith(f"_{history.id}")
+
+
+def test_filters(db_session):
+    assert len(search_grade_history(db_session, changed_by="admin")["items"]) == 2
+    assert {h.grade_id for h in search_grade_history(db_session, nim="002")["items"]} == {2}
+    assert len(search_grade_history(db_session, matakuliah_id=1)["items"]) == 4
+    window = search_grade_history(db_session, changed_from=START + timedelta(minutes=1),
+                                  changed_to=START + timedelta(minutes=2))["items"]
+    assert sorted(h.reason for h in window) == ["perubahan 2", "perubahan 3"]
+
+
+def test_update_records_student_and_course(db_session):
+    crud.update_grade(db_session, 2, GradeUpdate(nilai_huruf="A", reason="Koreksi"), "dosen2")
+    entry = search_grade_history(db_session, changed_by="dosen2")["items"][0]
+    assert (entry.nim, entry.matakuliah_id, entry.grade_id) == ("002", 2, 2)
+
+
+def test_csv_export_streams_in_batches(db_session):
+    chunks = list(iter_grade_history_csv(db_session, batch_size=2, nim="001"))
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert len(rows) == 4
+    assert {row["nim"] for row in rows} == {"001"}
+
+
+def test_audit_endpoints(db_session):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    user = SimpleNamespace(username="admin", role=RoleEnum.ADMIN, kode_dosen=None, nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    first = client.get("/api/grades/audit?limit=4").json()
+    assert len(first["items"]) == 4
+    second = client.get("/api/grades/audit", params={"limit": 4, "cursor": first["next_cursor"]}).json()
+    assert (len(second["items"]), second["next_cursor"]) == (3, None)
+    assert client.get("/api/grades/audit?cursor=rusak").status_code == 400
+
+    export = client.get("/api/grades/audit/export?changed_by=admin")
+    assert export.headers["content-type"].startswith("text/csv")
+    assert len(export.text.strip().splitlines()) == 3
+
+    user.role = RoleEnum.DOSEN
+    assert client.get("/api/grades/audit").status_code == 403
+    assert client.get("/api/grades/audit/export").status_code == 403
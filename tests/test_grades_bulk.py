@@ -0,0 +1,129 @@
+import pytest
+from datetime import datetime, time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from pmb_system import models as pmb_models
+from pmb_system.models import CalonMahasiswa, ProgramStudi, JalurMasukEnum
+from krs_system.models import Matakuliah
+from schedule_system.models import Dosen, Ruang, JadwalKelas, JadwalMahasiswa
+from auth_system.dependencies import get_current_user
+from auth_system.models import RoleEnum
+from grades_system.models import Grade, GradeHistory
+from grades_system.router import router
+from grades_system.services.gpa_summary import lookup_gpa
+from grades_system.services.course_stats import get_course_stats
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def client():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # PMB models are declared on their own Base
+    pmb_models.Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSessionLocal()
+    db.add(ProgramStudi(kode="TIF", nama="Teknik Informatika", fakultas="Teknik"))
+    db.add_all([
+        CalonMahasiswa(nama_lengkap=f"Mahasiswa {nim}", email=f"{nim}@example.com", phone="081234567890",
+                       tanggal_lahir=datetime(2005, 1, 1), alamat="Jakarta", program_studi_id=1,
+                       jalur_masuk=JalurMasukEnum.SNBT, nim=nim)
+        for nim in ("001", "002", "003", "004")
+    ])
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", kode_dosen="7"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db.add(JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester=SEMESTER, hari="senin",
+                       jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40))
+    db.commit()
+    # 003 attended 1 of 2 meetings (50%)
+    db.add_all([
+        JadwalMahasiswa(nim="003", jadwal_kelas_id=1, semester=SEMESTER, status_kehadiran="hadir"),
+        JadwalMahasiswa(nim="003", jadwal_kelas_id=1, semester=SEMESTER, status_kehadiran="belum_hadir"),
+    ])
+    db.add(Grade(nim="002", matakuliah_id=1, semester=SEMESTER, nilai_huruf="C", nilai_angka=2.0,
+                 sks=3, dosen_id=1, presensi=100.0))
+    db.commit()
+    db.close()
+
+    app = FastAPI()
+    app.include_router(router)
+
+    def override_get_db():
+        session = TestingSessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        username="dosen1", role=RoleEnum.DOSEN, kode_dosen="7", nim=None
+    )
+    client = TestClient(app)
+    client.session_factory = TestingSessionLocal
+    return client
+
+
+def test_bulk_upload_csv(client):
+    csv_body = (
+        "nim,nilai_huruf\n"
+        "001,a\n"   # new grade
+        "002,B\n"   # updates C -> B with history
+        "003,A\n"   # attendance 50%
+        "999,A\n"   # unknown student
+        "004,F\n"   # invalid letter
+        "001,B\n"   # duplicate
+    )
+    response = client.post(f"/api/grades/course/1/bulk?semester={SEMESTER}", content=csv_body,
+                           headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["updated"], body["unchanged"], body["rejected"]) == (1, 1, 0, 4)
+    assert [r["status"] for r in body["rows"]] == ["created", "updated", "rejected", "rejected", "rejected", "rejected"]
+    assert "75%" in body["rows"][2]["detail"]
+
+    db = client.session_factory()
+    grades = {g.nim: g for g in db.query(Grade).all()}
+    assert (grades["001"].nilai_huruf, grades["001"].nilai_angka, grades["001"].sks) == ("A", 4.0, 3)
+    assert grades["002"].nilai_huruf == "B"
+    history = db.query(GradeHistory).one()
+    assert (history.grade_id, history.old_value, history.new_value, history.changed_by) == \
+        (grades["002"].id, "C(2.0)", "B(3.0)", "dosen1")
+    assert lookup_gpa(db, "002") == 3.0
+    assert get_course_stats(db, 1)["overall"]["counts"] == {"A": 1, "B": 1, "C": 0, "D": 0, "E": 0}
+    db.close()
+
+    # Uploading the same values again changes nothing
+    response = client.post(f"/api/grades/course/1/bulk?semester={SEMESTER}",
+                           json=[{"nim": "001", "nilai_huruf": "A"}, {"nim": "002", "nilai_huruf": "B"}])
+    assert response.json()["unchanged"] == 2
+
+
+def test_bulk_upload_rejects_malformed_body(client):
+    response = client.post(f"/api/grades/course/1/bulk?semester={SEMESTER}", json={"nim": "001"})
+    assert response.status_code == 400
+
+
+def test_bulk_upload_requires_a_lecturer_profile(client):
+    client.app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        username="dosen8", role=RoleEnum.DOSEN, kode_dosen="8", nim=None
+    )
+    response = client.post(f"/api/grades/course/1/bulk?semester={SEMESTER}",
+                           json=[{"nim": "001", "nilai_huruf": "A"}])
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Lecturer profile not found"
@@ -0,0 +1,133 @@
+import importlib
+import pytest
+from datetime import datetime, time, timezone, timedelta
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from attendance_system.schemas import AttendanceSyncScan
+from attendance_system.offline_sync import sync_offline_scans
+from attendance_system.qr_tokens import make_rotating_token
+from attendance_system.router import router
+from auth_system.dependencies import get_current_user
+from krs_system.models import Matakuliah, KRS, KRSDetail, KRSStatusEnum
+from schedule_system.models import Dosen, Ruang, JadwalKelas
+
+SEMESTER = "2024/2025-1"
+NOW = datetime(2024, 9, 2, 8, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", kode_dosen="1"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com", kode_dosen="2"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+        Matakuliah(kode="MK2", nama="Basis Data", sks=3, semester=1, hari="selasa",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db.add_all([
+        JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester=SEMESTER, hari="senin",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40),
+        JadwalKelas(kode_mk="MK2", dosen_id=2, ruang_id=1, semester=SEMESTER, hari="selasa",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40),
+    ])
+    db.commit()
+    # 001-003 take MK1, 004 takes MK2 only
+    for i, (nim, matakuliah_id) in enumerate((("001", 1), ("002", 1), ("003", 1), ("004", 2)), start=1):
+        db.add(KRS(id=i, nim=nim, semester=SEMESTER, status=KRSStatusEnum.APPROVED))
+        db.add(KRSDetail(krs_id=i, matakuliah_id=matakuliah_id))
+    db.add_all([
+        AttendanceSession(schedule_id=1, session_number=1, qr_token="sesi1", is_active=False),
+        AttendanceSession(schedule_id=1, session_number=2, qr_token="sesi2", is_active=True),
+        AttendanceSession(schedule_id=2, session_number=1, qr_token="mk2", is_active=True),
+    ])
+    db.commit()
+    db.add(AttendanceRecord(attendance_session_id=1, nim="003"))
+    db.commit()
+    db.close()
+    return TestingSessionLocal
+
+
+def _scan(nim, minutes=0, **token):
+    return AttendanceSyncScan(nim=nim, scanned_at=NOW - timedelta(minutes=minutes), **token)
+
+
+def test_offline_scans_are_validated_in_bulk_and_inserted_once(session_factory):
+    db = session_factory()
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    scans = [
+        _scan("001", qr_token="sesi1"),
+        _scan("002", qr_token=make_rotating_token(1, (NOW - timedelta(minutes=5)).timestamp()), minutes=5),
+        _scan("001", session_id=2),
+        _scan("001", minutes=1, qr_token="sesi1"),  # same student again in the upload
+        _scan("003", session_id=1),  # already stored
+        _scan("004", session_id=1),  # not in the class
+        _scan("002", session_id=99),
+        _scan("002", qr_token="salah"),
+        _scan("002", qr_token=make_rotating_token(2, (NOW - timedelta(hours=1)).timestamp())),  # code of another time
+        _scan("002", minutes=-10, session_id=2),
+        _scan("002"),
+    ]
+    result = sync_offline_scans(db, scans, now=NOW)
+
+    assert (result["received"], result["accepted"], result["duplicate"], result["rejected"]) == (11, 3, 2, 6)
+    assert [r["index"] for r in result["rejections"]] == [5, 6, 7, 8, 9, 10]
+    assert sum(sql.startswith("SELECT") for sql in statements) == 2
+    assert sum(sql.startswith("INSERT") for sql in statements) == 1
+
+    stored = {(r.attendance_session_id, r.nim): r.scanned_at for r in db.query(AttendanceRecord).all()}
+    assert set(stored) == {(1, "001"), (1, "002"), (2, "001"), (1, "003")}
+    # The earliest of the repeated scans is kept
+    assert stored[(1, "001")].replace(tzinfo=None) == (NOW - timedelta(minutes=1)).replace(tzinfo=None)
+
+    # Uploading the same chunk again stores nothing
+    again = sync_offline_scans(db, scans, now=NOW)
+    assert (again["accepted"], again["duplicate"], again["rejected"]) == (0, 5, 6)
+    db.close()
+
+
+def test_sync_endpoint(session_factory, monkeypatch):
+    db = session_factory()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db
+    user = SimpleNamespace(username="dosen1", role="DOSEN", kode_dosen="1", nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+    scanned_at = datetime.now(timezone.utc).isoformat()
+
+    response = client.post("/api/attendance/sync", json={"scans": [
+        {"session_id": 2, "nim": "002", "scanned_at": scanned_at},
+        {"qr_token": "mk2", "nim": "004", "scanned_at": scanned_at},
+    ]})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert (data["accepted"], data["duplicate"], data["rejected"]) == (1, 0, 1)
+    assert data["rejections"][0]["reason"] == "Attendance session belongs to another lecturer"
+
+    # The package re-exports the router object under the module's name
+    monkeypatch.setattr(importlib.import_module("attendance_system.router"), "SYNC_MAX_SCANS", 1)
+    too_large = client.post("/api/attendance/sync", json={"scans": [
+        {"session_id": 2, "nim": nim, "scanned_at": scanned_at} for nim in ("001", "003")
+    ]})
+    assert too_large.status_code == 413
+
+    user.role = "MAHASISWA"
+    assert client.post("/api/attendance/sync", json={"scans": []}).status_code == 403
+    db.close()
@@ -0,0 +1,108 @@
+import pytest
+from datetime import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from krs_system.models import Matakuliah
+from schedule_system.models import Dosen, Ruang, JadwalKelas, JadwalMahasiswa
+from auth_system.dependencies import get_current_user
+from auth_system.models import RoleEnum
+from grades_system import crud
+from grades_system.models import Grade, StudentAttendance
+from grades_system.router import router
+from grades_system.schemas import GradeCreate
+from grades_system.services.course_stats import get_course_stats
+from grades_system.services.presensi_sync import sync_grade_presensi
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", kode_dosen="1"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+        Matakuliah(kode="MK2", nama="Basis Data", sks=3, semester=1, hari="selasa",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db.add_all([
+        JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester=SEMESTER, hari="senin",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40),
+        JadwalKelas(kode_mk="MK2", dosen_id=1, ruang_id=1, semester=SEMESTER, hari="selasa",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40),
+    ])
+    db.commit()
+    # MK1 holds 4 sessions: 001 scans all, 002 scans 1, 003 is placed and never scans
+    db.add_all([AttendanceSession(schedule_id=1, session_number=n, qr_token=f"t{n}", is_active=True)
+                for n in range(1, 5)])
+    db.add_all([JadwalMahasiswa(nim=nim, jadwal_kelas_id=1, semester=SEMESTER) for nim in ("001", "002", "003")])
+    db.commit()
+    db.add_all([AttendanceRecord(attendance_session_id=s, nim="001") for s in (1, 2, 3, 4)])
+    db.add(AttendanceRecord(attendance_session_id=1, nim="002"))
+    db.add_all([
+        Grade(nim="001", matakuliah_id=1, semester=SEMESTER, nilai_huruf="A", nilai_angka=4.0, sks=3, dosen_id=1),
+        Grade(nim="002", matakuliah_id=1, semester=SEMESTER, nilai_huruf="B", nilai_angka=3.0, sks=3, dosen_id=1),
+        Grade(nim="001", matakuliah_id=2, semester=SEMESTER, nilai_huruf="B", nilai_angka=3.0, sks=3, dosen_id=1),
+    ])
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _presensi(db, nim, matakuliah_id):
+    return db.query(Grade.presensi).filter(Grade.nim == nim, Grade.matakuliah_id == matakuliah_id).scalar()
+
+
+def test_sync_copies_attendance_onto_grades(db_session):
+    result = sync_grade_presensi(db_session)
+    assert (result["students"], result["grades_updated"]) == (3, 1)
+
+    synced = {row.nim: (row.hadir, row.total_sesi, row.persentase) for row in db_session.query(StudentAttendance)}
+    assert synced == {"001": (4, 4, 100.0), "002": (1, 4, 25.0), "003": (0, 4, 0.0)}
+    assert _presensi(db_session, "001", 1) == 100.0
+    assert _presensi(db_session, "002", 1) == 25.0
+    # MK2 has no sessions: the grade keeps its value
+    assert _presensi(db_session, "001", 2) == 100.0
+    # Course statistics follow the new presensi
+    assert get_course_stats(db_session, 1)["overall"]["presensi_by_grade"]["B"] == 25.0
+
+    # Nothing changed since: no grade is rewritten
+    assert sync_grade_presensi(db_session, SEMESTER)["grades_updated"] == 0
+
+
+def test_grade_entry_reads_synced_attendance(db_session):
+    sync_grade_presensi(db_session)
+    with pytest.raises(ValueError):
+        crud.create_grade(db_session, GradeCreate(nim="003", matakuliah_id=1, semester=SEMESTER, nilai_huruf="A",
+                                                  sks=3, dosen_id=1, presensi=100.0), "dosen1")
+    assert crud.get_attendance_percentage(db_session, "001", 1, SEMESTER) == 100.0
+
+
+def test_sync_endpoint_requires_admin(db_session):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    user = SimpleNamespace(username="admin", role=RoleEnum.ADMIN, kode_dosen=None, nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    assert client.post(f"/api/grades/presensi/sync?semester={SEMESTER}").json()["students"] == 3
+    user.role = RoleEnum.DOSEN
+    assert client.post("/api/grades/presensi/sync").status_code == 403
@@ -0,0 +1,110 @@
+import pytest
+from datetime import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from attendance_system.qr_tokens import make_rotating_token, verify_rotating_token, is_rotating_token
+from attendance_system.router import router
+from attendance_system.scan_pipeline import ScanPipeline
+from auth_system.dependencies import get_current_user
+from schedule_system.models import Dosen, JadwalKelas
+
+NOW = 1_700_000_000.0
+
+
+def test_token_round_trip_and_skew():
+    token = make_rotating_token(42, NOW, period=30)
+    assert is_rotating_token(token)
+    assert verify_rotating_token(token, NOW, period=30) == 42
+    # One window either side is tolerated, two are not
+    assert verify_rotating_token(token, NOW + 30, period=30, skew=1) == 42
+    with pytest.raises(ValueError):
+        verify_rotating_token(token, NOW + 60, period=30, skew=1)
+    assert make_rotating_token(42, NOW + 30, period=30) != token
+
+
+def test_forged_and_malformed_tokens_are_rejected():
+    session_id, window, signature = make_rotating_token(42, NOW).split(".")
+    for token in (f"43.{window}.{signature}", f"{session_id}.{window}.{signature[:-1]}A", "42.x.y", "a.b"):
+        with pytest.raises(ValueError):
+            verify_rotating_token(token, NOW)
+    with pytest.raises(ValueError):
+        verify_rotating_token(make_rotating_token(42, NOW, secret=b"lain"), NOW)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com", kode_dosen="1"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com", kode_dosen="2"),
+        JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester="2024/2025-1", hari="senin",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40),
+        AttendanceSession(schedule_id=1, session_number=1, qr_token="statis", is_active=True),
+        AttendanceSession(schedule_id=1, session_number=2, qr_token="tutup", is_active=False),
+    ])
+    db.commit()
+    db.close()
+    return TestingSessionLocal
+
+
+def test_pipeline_verifies_rotating_tokens_without_reading_the_session(session_factory, tmp_path):
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"), flush_interval=60)
+    pipeline.start()
+    db = session_factory()
+    try:
+        pipeline.record(db, make_rotating_token(1), "001")
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+        pipeline.record(db, make_rotating_token(1), "002")
+        assert statements == []
+        # The stored token of the same session never expires, so it is refused
+        with pytest.raises(ValueError):
+            pipeline.record(db, "statis", "003")
+
+        with pytest.raises(ValueError):
+            pipeline.record(db, make_rotating_token(2), "001")
+        with pytest.raises(ValueError):
+            pipeline.record(db, make_rotating_token(1, NOW), "004")
+    finally:
+        pipeline.stop()
+    assert db.query(AttendanceRecord).count() == 2
+    db.close()
+
+
+def test_rotating_qr_endpoint(session_factory):
+    db = session_factory()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db
+    user = SimpleNamespace(username="dosen1", role="DOSEN", kode_dosen="1", nim=None)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+
+    data = client.get("/api/attendance/session/2/qr").json()["data"]
+    assert verify_rotating_token(data["qr_token"]) == 2
+    assert 0 < data["expires_in"] <= data["period"]
+    assert client.get("/api/attendance/session/99/qr").status_code == 404
+
+    user.kode_dosen = "2"
+    assert client.get("/api/attendance/session/2/qr").status_code == 403
+    assert client.get("/api/attendance/session/schedule/1").status_code == 403
+    user.role = "MAHASISWA"
+    assert client.get("/api/attendance/session/2/qr").status_code == 403
+    user.role = "ADMIN"
+    assert client.get("/api/attendance/session/2/qr").status_code == 200
+    sessions = client.get("/api/attendance/session/schedule/1").json()["data"]
+    assert [session["session_number"] for session in sessions] == [1, 2]
+    db.close()
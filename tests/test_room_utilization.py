@@ -0,0 +1,96 @@
+import pytest
+from datetime import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base
+from schedule_system.models import Dosen, Ruang, JadwalKelas, JadwalMahasiswa
+from schedule_system.database import get_db
+from schedule_system.endpoints import router
+from schedule_system.room_utilization import RoomUtilizationCache, room_utilization_cache
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSessionLocal()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Ruang(kode="R2", nama="Ruang 2", kapasitas=10, jenis="Kelas"),
+    ])
+    db.add_all([
+        JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester=SEMESTER, hari="Senin",
+                    jam_mulai=time(8), jam_selesai=time(9, 30), kapasitas_kelas=40),
+        JadwalKelas(kode_mk="MK2", dosen_id=1, ruang_id=1, semester=SEMESTER, hari="senin",
+                    jam_mulai=time(9), jam_selesai=time(10), kapasitas_kelas=40),
+        JadwalKelas(kode_mk="MK3", dosen_id=1, ruang_id=1, semester="2023/2024-2", hari="selasa",
+                    jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40),
+    ])
+    db.commit()
+    db.add_all([JadwalMahasiswa(nim=f"{i:03d}", jadwal_kelas_id=1, semester=SEMESTER) for i in range(20)])
+    db.add_all([JadwalMahasiswa(nim=f"{i:03d}", jadwal_kelas_id=2, semester=SEMESTER) for i in range(10)])
+    db.commit()
+    db.close()
+    room_utilization_cache.clear()
+    return TestingSessionLocal
+
+
+def test_room_utilization(session_factory):
+    db = session_factory()
+    cache = RoomUtilizationCache()
+    version, result = cache.get(db, SEMESTER)
+
+    assert result['hours'][0] == 7
+    r1, r2 = result['rooms']
+    senin = result['days'].index("senin")
+    # 08:00-09:30 and 09:00-10:00 overlap in the 09:00 hour
+    assert r1['occupancy'][senin][1:4] == [1.0, 1.5, 0.0]
+    assert r1['schedules'] == 2
+    assert r1['weekly_hours'] == 2.5
+    # (20 x 90 + 10 x 60) seat-minutes of 40 x 150 offered
+    assert r1['seat_utilization'] == round(2400 / 6000, 4)
+    assert r1['peak_enrolled'] == 20
+    assert r2['schedules'] == 0 and r2['seat_utilization'] == 0.0
+
+    # Cached until a placement changes
+    assert cache.get(db, SEMESTER)[1] is result
+    db.add(JadwalMahasiswa(nim="100", jadwal_kelas_id=2, semester=SEMESTER))
+    db.commit()
+    _, refreshed = cache.get(db, SEMESTER)
+    assert refreshed is not result
+    assert refreshed['rooms'][0]['seat_utilization'] == round(2460 / 6000, 4)
+    db.close()
+
+
+def test_room_utilization_endpoint(session_factory):
+    app = FastAPI()
+    app.include_router(router, prefix="/api/schedule")
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    response = client.get("/api/schedule/rooms/utilization", params={"semester": SEMESTER})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["semester"] == SEMESTER
+    assert [r["kode"] for r in body["rooms"]] == ["R1", "R2"]
+    assert len(body["rooms"][0]["occupancy"]) == len(body["days"])
@@ -0,0 +1,214 @@
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from attendance_system.models import AttendanceSession, AttendanceRecord
+from attendance_system.router import router
+from attendance_system import services
+from attendance_system.scan_pipeline import ScanPipeline, get_scan_pipeline
+from attendance_system.qr_tokens import make_rotating_token
+from attendance_system.services import create_attendance_record, record_attendance_from_qr
+from attendance_system.schemas import AttendanceRecordCreate
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    db.add_all([
+        AttendanceSession(schedule_id=1, session_number=1, qr_token="aktif", is_active=True),
+        AttendanceSession(schedule_id=1, session_number=2, qr_token="tutup", is_active=False),
+        AttendanceSession(schedule_id=2, session_number=1, qr_token="lain", is_active=True),
+    ])
+    db.add(AttendanceRecord(attendance_session_id=1, nim="000"))
+    db.commit()
+    db.close()
+    return TestingSessionLocal
+
+
+def _statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    return statements
+
+
+def test_scans_are_validated_in_memory_and_flushed_in_one_batch(session_factory, tmp_path):
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"), flush_interval=60)
+    pipeline.start()
+    db = session_factory()
+    try:
+        pipeline.record(db, make_rotating_token(1), "001")  # first scan loads the token and the session's NIMs
+        statements = _statements(db.get_bind())
+        for nim in ("002", "003", "004"):
+            pipeline.record(db, make_rotating_token(1), nim)
+        _, _, created = pipeline.record(db, make_rotating_token(1), "002")
+        assert not created
+        stored, _, created = pipeline.record(db, make_rotating_token(1), "000")  # stored before the pipeline started
+        assert not created and stored["scanned_at"] is not None
+        assert statements == []
+        assert pipeline.pending_count() == 4
+
+        assert pipeline.flush() == 4
+        assert sum(sql.startswith("INSERT") for sql in statements) == 1
+        assert (tmp_path / "scans.journal").read_text() == ""
+        assert db.query(AttendanceRecord).count() == 5
+
+        with pytest.raises(ValueError):
+            pipeline.record(db, make_rotating_token(2), "001")
+    finally:
+        pipeline.stop()
+        db.close()
+
+
+def test_journal_is_replayed_after_a_crash(session_factory, tmp_path):
+    journal = str(tmp_path / "scans.journal")
+    crashed = ScanPipeline(session_factory, journal, flush_interval=60)
+    crashed.start()
+    db = session_factory()
+    crashed.record(db, make_rotating_token(1), "001")
+    crashed.record(db, make_rotating_token(1), "002")
+    # The process dies before the writer flushes
+    crashed._stop.set()
+    crashed._thread.join()
+    with open(journal, "a") as tail:
+        tail.write('{"attendance_session_id": 1, "ni')
+
+    restarted = ScanPipeline(session_factory, journal)
+    assert restarted.replay() == 2
+    assert restarted.replay() == 0
+    assert {r.nim for r in db.query(AttendanceRecord).all()} == {"000", "001", "002"}
+    db.close()
+
+
+def test_forgotten_session_is_reloaded(session_factory, tmp_path):
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"))
+    db = session_factory()
+    pipeline.record(db, make_rotating_token(1), "001")
+    session = db.get(AttendanceSession, 1)
+    session.is_active = False
+    db.commit()
+    pipeline.forget_session(1)
+
+    with pytest.raises(ValueError):
+        pipeline.record(db, make_rotating_token(1), "002")
+    session.is_active = True
+    db.commit()
+    assert pipeline.record(db, make_rotating_token(1), "001")[2] is False
+    assert pipeline.record(db, make_rotating_token(1), "002")[2] is True
+    assert db.query(AttendanceRecord).count() == 3
+    db.close()
+
+
+def test_stored_tokens_are_refused(session_factory, tmp_path):
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"))
+    db = session_factory()
+    with pytest.raises(ValueError):
+        pipeline.record(db, "aktif", "001")
+    pipeline.record(db, make_rotating_token(1), "001")
+    # Not even once the session is cached
+    with pytest.raises(ValueError):
+        pipeline.record(db, "aktif", "002")
+    db.close()
+
+
+def test_journal_is_synced_before_a_scan_is_acknowledged(session_factory, tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr("attendance_system.scan_pipeline.os.fsync", synced.append)
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"), flush_interval=60)
+    pipeline.start()
+    db = session_factory()
+    try:
+        pipeline.record(db, make_rotating_token(1), "001")
+        assert len(synced) == 1
+        pipeline.record(db, make_rotating_token(1), "001")  # a repeated scan writes nothing
+        assert len(synced) == 1
+    finally:
+        pipeline.stop()
+        db.close()
+
+
+def test_cache_keeps_the_most_recently_scanned_sessions(session_factory, tmp_path):
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"), max_sessions=1)
+    db = session_factory()
+    pipeline.record(db, make_rotating_token(1), "001")
+    pipeline.record(db, make_rotating_token(3), "001")
+    assert list(pipeline._sessions) == [3]
+    assert set(pipeline._attended) == {3} and set(pipeline._schedule_of) == {3}
+
+    # A closed session leaves every cache
+    pipeline.forget_session(3)
+    assert (pipeline._sessions, pipeline._attended, pipeline._schedule_of) == ({}, {}, {})
+    assert pipeline.record(db, make_rotating_token(1), "001")[2] is False
+    db.close()
+
+
+def test_records_written_elsewhere_refresh_the_pipeline(session_factory, tmp_path, monkeypatch):
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"))
+    monkeypatch.setattr(services, "scan_pipeline", pipeline)
+    db = session_factory()
+    pipeline.record(db, make_rotating_token(1), "001")
+    record_attendance_from_qr(db, "aktif", "002")
+    create_attendance_record(db, AttendanceRecordCreate(attendance_session_id=1, nim="003"))
+
+    for nim in ("002", "003"):
+        _, _, created = pipeline.record(db, make_rotating_token(1), nim)
+        assert not created
+    db.close()
+
+
+def test_scan_endpoint(session_factory, tmp_path):
+    pipeline = ScanPipeline(session_factory, str(tmp_path / "scans.journal"))
+    db = session_factory()
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_scan_pipeline] = lambda: pipeline
+    client = TestClient(app)
+
+    token = make_rotating_token(1)
+    response = client.post("/api/attendance/scan", json={"qr_token": token, "nim": "001"})
+    assert response.status_code == 200
+    assert (response.json()["data"]["session_number"], response.json()["data"]["nim"]) == (1, "001")
+    repeated = client.post("/api/attendance/scan", json={"qr_token": token, "nim": "001"})
+    assert repeated.status_code == 200
+    assert repeated.json()["data"]["duplicate"] is True
+    assert repeated.json()["data"]["scanned_at"] == response.json()["data"]["scanned_at"]
+    assert db.query(AttendanceRecord).filter(AttendanceRecord.nim == "001").count() == 1
+    assert client.post("/api/attendance/scan", json={"qr_token": "salah", "nim": "001"}).status_code == 400
+    assert client.post("/api/attendance/scan", json={"qr_token": "aktif", "nim": "002"}).status_code == 400
+    db.close()
+
+
+def test_unique_index_makes_scans_idempotent(session_factory):
+    db = session_factory()
+    db.add(AttendanceRecord(attendance_session_id=1, nim="000"))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+    statements = _statements(db.get_bind())
+    record, session = record_attendance_from_qr(db, "aktif", "001")
+    assert sum(sql.startswith("INSERT") and "ON CONFLICT" in sql for sql in statements) == 1
+    assert not any(sql.startswith("SELECT") and "attendance_record" in sql for sql in statements)
+
+    # A repeated scan gets the stored row back from the same single statement
+    statements.clear()
+    again, _ = record_attendance_from_qr(db, "aktif", "001")
+    assert (again.id, again.scanned_at) == (record.id, record.scanned_at)
+    original = create_attendance_record(db, AttendanceRecordCreate(attendance_session_id=1, nim="000"))
+    assert original.id == 1
+    assert sum("ON CONFLICT" in sql and "RETURNING" in sql for sql in statements) == 2
+    assert not any(sql.startswith("SELECT") and "attendance_record" in sql for sql in statements)
+    assert db.query(AttendanceRecord).count() == 2
+    db.close()
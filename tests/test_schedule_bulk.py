@@ -0,0 +1,153 @@
+import pytest
+from datetime import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base
+from schedule_system.models import Dosen, Ruang, JadwalKelas, JadwalKelasEvent
+from schedule_system.database import get_db
+from schedule_system.endpoints import router
+from schedule_system.services import schedule_subject
+
+
+@pytest.fixture
+def client():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSessionLocal()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Ruang(kode="R2", nama="Ruang 2", kapasitas=40, jenis="Kelas"),
+    ])
+    db.add(JadwalKelas(kode_mk="OLD1", dosen_id=1, ruang_id=1, semester="2024/2025-1", hari="senin",
+                       jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=30))
+    db.commit()
+    db.close()
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api/schedule")
+
+    def override_get_db():
+        session = TestingSessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+    client.session_factory = TestingSessionLocal
+    return client
+
+
+def _row(kode_mk, dosen_id, ruang_id, hari, mulai, selesai):
+    return {
+        "kode_mk": kode_mk, "dosen_id": dosen_id, "ruang_id": ruang_id, "semester": "2024/2025-1",
+        "hari": hari, "jam_mulai": mulai, "jam_selesai": selesai, "kapasitas_kelas": 30
+    }
+
+
+def test_bulk_json_reports_each_row(client):
+    rows = [
+        _row("MK1", 2, 2, "selasa", "08:00", "10:00"),   # ok
+        _row("MK2", 2, 1, "senin", "09:00", "11:00"),    # clashes with OLD1 in the database
+        _row("MK3", 1, 2, "selasa", "09:00", "10:00"),   # clashes with row 1 of the batch
+        _row("MK4", 9, 2, "rabu", "08:00", "10:00"),     # unknown dosen
+        {"kode_mk": "MK5"},                              # missing fields
+    ]
+    response = client.post("/api/schedule/bulk", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["created"], body["rejected"]) == (5, 1, 4)
+
+    statuses = [r["status"] for r in body["rows"]]
+    assert statuses == ["created", "conflict", "conflict", "invalid", "invalid"]
+    assert body["rows"][1]["conflicts"][0]["conflicting_id"] == 1
+    assert body["rows"][2]["conflicts"][0]["conflicting_row"] == 1
+    assert body["rows"][1]["suggestions"] == []
+
+    db = client.session_factory()
+    assert db.query(JadwalKelas).count() == 2
+    assert db.query(JadwalKelasEvent).count() == 1
+    db.close()
+
+
+def test_bulk_csv_with_suggestions(client):
+    csv_body = (
+        "kode_mk,dosen_id,ruang_id,semester,hari,jam_mulai,jam_selesai,kapasitas_kelas,kelas\n"
+        "MK1,2,2,2024/2025-1,kamis,08:00,10:00,30,A\n"
+        "MK2,1,1,2024/2025-1,senin,08:00,10:00,30,\n"
+    )
+    response = client.post("/api/schedule/bulk?suggest=true", content=csv_body,
+                           headers={"Content-Type": "text/csv"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["status"] for r in body["rows"]] == ["created", "conflict"]
+    assert len(body["rows"][1]["suggestions"]) == 3
+
+
+def test_copy_semester_with_overrides(client):
+    db = client.session_factory()
+    db.add(JadwalKelas(kode_mk="OLD2", dosen_id=2, ruang_id=2, semester="2024/2025-1", hari="senin",
+                       jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=30))
+    db.commit()
+    db.close()
+
+    # Mistyped override targets are refused before anything is copied
+    response = client.post("/api/schedule/semester/copy", json={
+        "from_semester": "2024/2025-1",
+        "to_semester": "2025/2026-1",
+        "ruang_overrides": {"2": 9},
+        "dosen_overrides": {"1": 7, "2": 1}
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Room override target not found: 9"
+    response = client.post("/api/schedule/semester/copy", json={
+        "from_semester": "2024/2025-1",
+        "to_semester": "2025/2026-1",
+        "dosen_overrides": {"1": 7}
+    })
+    assert response.json()["detail"] == "Dosen override target not found: 7"
+
+    events = []
+    recorder = SimpleNamespace(update=lambda event_type, data: events.append((event_type, data)))
+    schedule_subject.attach(recorder)
+    try:
+        # Room 2 is retired and replaced by room 1, so both copies now clash on room 1
+        response = client.post("/api/schedule/semester/copy", json={
+            "from_semester": "2024/2025-1",
+            "to_semester": "2025/2026-1",
+            "ruang_overrides": {"2": 1}
+        })
+    finally:
+        schedule_subject.detach(recorder)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["copied"] == 2
+    assert [c["type"] for c in body["conflicts"]] == ["room_conflict"]
+
+    db = client.session_factory()
+    copies = db.query(JadwalKelas).filter(JadwalKelas.semester == "2025/2026-1").all()
+    assert sorted((s.kode_mk, s.ruang_id, s.dosen_id) for s in copies) == [("OLD1", 1, 1), ("OLD2", 1, 2)]
+    assert db.query(JadwalKelasEvent).filter(JadwalKelasEvent.semester == "2025/2026-1").count() == 2
+    assert events == [("SEMESTER_COPIED", {'id': sorted(s.id for s in copies), 'from_semester': "2024/2025-1",
+                                           'semester': "2025/2026-1", 'count': 2})]
+    db.close()
+
+    # Copying into a semester that already has schedules is refused
+    response = client.post("/api/schedule/semester/copy", json={
+        "from_semester": "2024/2025-1",
+        "to_semester": "2025/2026-1"
+    })
+    assert response.status_code == 400
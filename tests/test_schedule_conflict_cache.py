@@ -0,0 +1,147 @@
+import pytest
+from datetime import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base
+from schedule_system.models import Dosen, Ruang, JadwalKelas
+from schedule_system.services import create_schedule, update_schedule, delete_schedule, detect_schedule_conflicts
+from schedule_system.conflict_cache import ScheduleConflictCache, conflict_cache
+from schedule_system.database import get_db
+from schedule_system.endpoints import router
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    conflict_cache.clear()
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db_session(session_factory):
+    db = session_factory()
+    db.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Ruang(kode="R2", nama="Ruang 2", kapasitas=40, jenis="Kelas"),
+    ])
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _insert_raw(db, kode_mk, dosen_id, ruang_id, hari, mulai, selesai, semester="2024/2025-1"):
+    """Insert a schedule directly so conflicting rows can exist"""
+    schedule = JadwalKelas(
+        kode_mk=kode_mk, dosen_id=dosen_id, ruang_id=ruang_id, semester=semester,
+        hari=hari, jam_mulai=time(mulai), jam_selesai=time(selesai), kapasitas_kelas=30
+    )
+    db.add(schedule)
+    db.commit()
+    return schedule
+
+
+def _from_scratch(db, semester=None):
+    query = db.query(JadwalKelas).order_by(JadwalKelas.id)
+    if semester:
+        query = query.filter(JadwalKelas.semester == semester)
+    schedules = [{
+        'id': s.id, 'hari': s.hari, 'jam_mulai': s.jam_mulai, 'jam_selesai': s.jam_selesai,
+        'ruangan_id': s.ruang_id, 'dosen_id': s.dosen_id
+    } for s in query.all()]
+    return sorted((c.type, c.schedule_1['id'], c.schedule_2['id']) for c in detect_schedule_conflicts(schedules))
+
+
+def _cached(cache, db, semester=None):
+    version, conflicts = cache.get_conflicts(db, semester)
+    return version, sorted((c.type, c.schedule_1['id'], c.schedule_2['id']) for c in conflicts)
+
+
+def test_cache_matches_full_detection_after_changes(db_session):
+    """Incremental reconciliation gives the same pairs as a full recomputation"""
+    cache = ScheduleConflictCache()
+    a = _insert_raw(db_session, "MK1", 1, 1, "senin", 8, 10)
+    b = _insert_raw(db_session, "MK2", 2, 1, "senin", 9, 11)
+
+    version, conflicts = _cached(cache, db_session)
+    assert version == 0
+    assert conflicts == _from_scratch(db_session) == [("room_conflict", a.id, b.id)]
+
+    # A new non-conflicting schedule bumps the version and keeps the old pair
+    c = create_schedule(kode_mk="MK3", dosen_id=1, ruang_id=2, semester="2024/2025-1",
+                        hari="senin", jam_mulai=time(13), jam_selesai=time(15),
+                        kapasitas_kelas=30, db=db_session)
+    db_session.commit()
+    version, conflicts = _cached(cache, db_session)
+    assert version == 1
+    assert conflicts == _from_scratch(db_session)
+
+    # Moving b away resolves the room conflict
+    update_schedule(schedule_id=b.id, hari="selasa", db=db_session)
+    db_session.commit()
+    version, conflicts = _cached(cache, db_session)
+    assert version == 2
+    assert conflicts == _from_scratch(db_session) == []
+
+    delete_schedule(schedule_id=c.id, db=db_session)
+    db_session.commit()
+    version, conflicts = _cached(cache, db_session)
+    assert version == 3
+    assert conflicts == _from_scratch(db_session)
+
+
+def test_cache_is_per_semester(db_session):
+    cache = ScheduleConflictCache()
+    _insert_raw(db_session, "MK1", 1, 1, "senin", 8, 10, semester="2024/2025-1")
+    _insert_raw(db_session, "MK2", 2, 1, "senin", 9, 11, semester="2024/2025-2")
+
+    assert _cached(cache, db_session, "2024/2025-1")[1] == []
+    assert _cached(cache, db_session, "2024/2025-2")[1] == []
+    # Without a semester filter every schedule is compared, as before
+    assert len(_cached(cache, db_session)[1]) == 1
+
+
+def test_conflicts_endpoint_etag(session_factory, db_session):
+    _insert_raw(db_session, "MK1", 1, 1, "senin", 8, 10)
+    _insert_raw(db_session, "MK2", 2, 1, "senin", 9, 11)
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api/schedule")
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    client = TestClient(app)
+
+    response = client.get("/api/schedule/conflicts", params={"semester": "2024/2025-1"})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/schedule/conflicts", params={"semester": "2024/2025-1"},
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    update_schedule(schedule_id=2, hari="selasa", db=db_session)
+    db_session.commit()
+    response = client.get("/api/schedule/conflicts", params={"semester": "2024/2025-1"},
+                          headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json() == []
+    assert response.headers["ETag"] != etag
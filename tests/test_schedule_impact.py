@@ -0,0 +1,114 @@
+import pytest
+from datetime import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base
+from pmb_system import models as pmb_models
+from krs_system import models as krs_models
+from schedule_system.models import Dosen, Ruang, JadwalKelas, JadwalMahasiswa
+from schedule_system.services import _check_time_overlap
+from schedule_system.impact import ScheduleImpactAnalyzer, slot_mask
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # PMB models are declared on their own Base
+    pmb_models.Base.metadata.create_all(bind=engine)
+
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_slot_mask_matches_time_overlap():
+    """Bitset intersection agrees with _check_time_overlap on the same day"""
+    slots = [(time(8), time(10)), (time(9, 50), time(11)), (time(10), time(12)), (time(7), time(8))]
+    for start1, end1 in slots:
+        for start2, end2 in slots:
+            overlap = bool(slot_mask("senin", start1, end1) & slot_mask("Senin", start2, end2))
+            assert overlap == _check_time_overlap(start1, end1, start2, end2)
+    assert not slot_mask("senin", time(8), time(10)) & slot_mask("selasa", time(8), time(10))
+
+
+def test_analyze_move(db_session):
+    db_session.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com"),
+        Dosen(nip="D2", nama="Dosen 2", email="d2@example.com"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Ruang(kode="R2", nama="Ruang 2", kapasitas=40, jenis="Kelas"),
+    ])
+    semester = "2024/2025-1"
+    moved = JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester=semester, hari="senin",
+                        jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=30)
+    other = JadwalKelas(kode_mk="MK2", dosen_id=2, ruang_id=2, semester=semester, hari="selasa",
+                        jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=30)
+    own = JadwalKelas(kode_mk="MK3", dosen_id=1, ruang_id=1, semester=semester, hari="selasa",
+                      jam_mulai=time(13), jam_selesai=time(15), kapasitas_kelas=30)
+    db_session.add_all([moved, other, own])
+    db_session.commit()
+    db_session.add_all([
+        JadwalMahasiswa(nim="001", jadwal_kelas_id=moved.id, semester=semester),
+        JadwalMahasiswa(nim="001", jadwal_kelas_id=other.id, semester=semester),
+        JadwalMahasiswa(nim="002", jadwal_kelas_id=moved.id, semester=semester),
+        JadwalMahasiswa(nim="003", jadwal_kelas_id=other.id, semester=semester),
+    ])
+    db_session.commit()
+
+    analyzer = ScheduleImpactAnalyzer()
+
+    # Tuesday 09:00 in room 2 hits student 001 and room 2 (taught by dosen 2)
+    impact = analyzer.analyze_move(moved, "selasa", time(9), time(11), 2, db_session)
+    assert [s['nim'] for s in impact['students']] == ["001"]
+    assert impact['students'][0]['conflicting_schedule_ids'] == [other.id]
+    assert impact['room_conflicts'] == [other.id]
+    assert [(c['dosen_id'], c['type']) for c in impact['lecturers']] == [(2, "room_conflict")]
+
+    # Tuesday 14:00 in room 2 only hits the lecturer's own class
+    impact = analyzer.analyze_move(moved, "selasa", time(14), time(16), 2, db_session)
+    assert impact['students'] == []
+    assert [(c['dosen_id'], c['type']) for c in impact['lecturers']] == [(1, "lecturer_conflict")]
+
+    # New enrollments are picked up without a schedule change
+    db_session.add(JadwalMahasiswa(nim="004", jadwal_kelas_id=moved.id, semester=semester))
+    db_session.add(JadwalMahasiswa(nim="004", jadwal_kelas_id=own.id, semester=semester))
+    db_session.commit()
+    impact = analyzer.analyze_move(moved, "selasa", time(14), time(16), 2, db_session)
+    assert [s['nim'] for s in impact['students']] == ["004"]
+
+
+def test_unknown_day_is_rejected_and_rebuilds_swap_the_index(db_session):
+    with pytest.raises(ValueError):
+        slot_mask("someday", time(8), time(10))
+
+    db_session.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+    ])
+    db_session.commit()
+    schedule = JadwalKelas(kode_mk="MK1", dosen_id=1, ruang_id=1, semester="2024/2025-1", hari="senin",
+                           jam_mulai=time(8), jam_selesai=time(10), kapasitas_kelas=40)
+    db_session.add(schedule)
+    db_session.commit()
+
+    analyzer = ScheduleImpactAnalyzer()
+    with pytest.raises(ValueError):
+        analyzer.analyze_move(schedule, "someday", time(8), time(10), None, db_session)
+
+    before = analyzer.get_index(db_session, "2024/2025-1")
+    db_session.add(JadwalMahasiswa(nim="001", jadwal_kelas_id=schedule.id, semester="2024/2025-1"))
+    db_session.commit()
+    after = analyzer.get_index(db_session, "2024/2025-1")
+    # The stale index is left intact for readers that still hold it
+    assert after is not before
+    assert before.schedule_students == {} and after.schedule_students == {schedule.id: ["001"]}
@@ -0,0 +1,118 @@
+import pytest
+from datetime import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base
+from krs_system.enums import KRSStatusEnum
+from krs_system.models import KRS, KRSDetail, Matakuliah
+from schedule_system.models import Dosen, Ruang, JadwalKelas, JadwalMahasiswa
+from schedule_system.database import get_db
+from schedule_system.endpoints import router
+from schedule_system.section_assignment import assign_sections
+
+SEMESTER = "2024/2025-1"
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _section(kode_mk, kelas, ruang_id, hari, mulai, selesai, kapasitas=30):
+    return JadwalKelas(kode_mk=kode_mk, kelas=kelas, dosen_id=1, ruang_id=ruang_id, semester=SEMESTER,
+                       hari=hari, jam_mulai=time(mulai), jam_selesai=time(selesai), kapasitas_kelas=kapasitas)
+
+
+def test_assign_sections_respects_capacity_collisions_and_balance(db_session):
+    db_session.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Ruang(kode="R2", nama="Ruang 2", kapasitas=3, jenis="Kelas"),
+    ])
+    courses = [
+        Matakuliah(kode=kode, nama=kode, sks=3, semester=1, hari="senin", jam_mulai=time(8), jam_selesai=time(10))
+        for kode in ("MK1", "MK2", "MK3")
+    ]
+    db_session.add_all(courses)
+    mk1_a = _section("MK1", "A", 1, "senin", 8, 10)
+    mk1_b = _section("MK1", "B", 2, "selasa", 8, 10)            # room only seats 3
+    mk2 = _section("MK2", "A", 1, "senin", 9, 11, kapasitas=4)  # collides with MK1 A
+    mk3_a = _section("MK3", "A", 1, "rabu", 8, 10)
+    mk3_b = _section("MK3", "B", 1, "kamis", 8, 10)
+    db_session.add_all([mk1_a, mk1_b, mk2, mk3_a, mk3_b])
+    db_session.commit()
+
+    for nim in ("001", "002", "003", "004", "005"):
+        status = KRSStatusEnum.DRAFT if nim == "005" else KRSStatusEnum.APPROVED
+        krs = KRS(nim=nim, semester=SEMESTER, status=status)
+        krs.krs_details = [KRSDetail(matakuliah_id=course.id) for course in courses]
+        db_session.add(krs)
+    # 001 was already placed in MK3 A and keeps that section
+    db_session.add(JadwalMahasiswa(nim="001", jadwal_kelas_id=mk3_a.id, semester=SEMESTER))
+    db_session.commit()
+
+    result = assign_sections(SEMESTER, db_session)
+
+    assert result['assigned'] == 10
+    assert result['already_assigned'] == 1
+    assert result['unassigned'] == [{'nim': "004", 'kode_mk': "MK1", 'reason': "Semua kelas penuh"}]
+    loads = {s['id']: (s['load'], s['capacity']) for s in result['sections']}
+    assert loads[mk1_a.id] == (0, 30)
+    assert loads[mk1_b.id] == (3, 3)
+    assert loads[mk2.id] == (4, 4)
+    assert loads[mk3_a.id][0] == loads[mk3_b.id][0] == 2
+
+    placements = {}
+    for row in db_session.query(JadwalMahasiswa).all():
+        placements.setdefault(row.nim, []).append(row.jadwal_kelas_id)
+    assert "005" not in placements
+    assert sorted(placements["004"]) == sorted([mk2.id, mk3_b.id])
+
+    # A second run finds nothing left to place
+    rerun = assign_sections(SEMESTER, db_session)
+    assert (rerun['assigned'], rerun['already_assigned']) == (0, 11)
+
+
+def test_section_on_an_unknown_day_is_still_assigned(db_session):
+    db_session.add_all([
+        Dosen(nip="D1", nama="Dosen 1", email="d1@example.com"),
+        Ruang(kode="R1", nama="Ruang 1", kapasitas=40, jenis="Kelas"),
+        Matakuliah(kode="MK1", nama="MK1", sks=3, semester=1, hari="senin", jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db_session.add(_section("MK1", "A", 1, "Monday", 8, 10))
+    db_session.commit()
+    krs = KRS(nim="001", semester=SEMESTER, status=KRSStatusEnum.APPROVED)
+    krs.krs_details = [KRSDetail(matakuliah_id=1)]
+    db_session.add(krs)
+    db_session.commit()
+
+    result = assign_sections(SEMESTER, db_session)
+    assert (result['assigned'], result['unassigned']) == (1, [])
+
+
+def test_assign_endpoint_rejects_a_blank_semester(db_session):
+    app = FastAPI()
+    app.include_router(router, prefix="/api/schedule")
+    app.dependency_overrides[get_db] = lambda: db_session
+    client = TestClient(app)
+
+    response = client.post("/api/schedule/sections/assign", json={"semester": " "})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "semester is required"
+    response = client.post("/api/schedule/sections/assign", json={"semester": SEMESTER})
+    assert response.status_code == 200
+    assert response.json()["assigned"] == 0
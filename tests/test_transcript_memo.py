@@ -0,0 +1,104 @@
+import pytest
+from datetime import datetime, time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base
+from pmb_system import models as pmb_models
+from pmb_system.models import CalonMahasiswa, ProgramStudi, JalurMasukEnum
+from krs_system.models import Matakuliah
+from grades_system import crud
+from grades_system.models import Grade
+from grades_system.schemas import GradeCreate
+from grades_system.services.gpa_service import get_transcript, transcript_memo
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # PMB models are declared on their own Base
+    pmb_models.Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSessionLocal()
+    db.add(ProgramStudi(kode="TIF", nama="Teknik Informatika", fakultas="Teknik"))
+    db.add(CalonMahasiswa(nama_lengkap="Mahasiswa 001", email="001@example.com", phone="081234567890",
+                          tanggal_lahir=datetime(2005, 1, 1), alamat="Jakarta", program_studi_id=1,
+                          jalur_masuk=JalurMasukEnum.SNBT, nim="001"))
+    db.add_all([
+        Matakuliah(kode="MK2", nama="Basis Data", sks=2, semester=2, hari="selasa",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+        Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                   jam_mulai=time(8), jam_selesai=time(10)),
+    ])
+    db.add_all([
+        Grade(nim="001", matakuliah_id=1, semester="2023/2024-1", nilai_huruf="B", nilai_angka=3.0, sks=2, dosen_id=1),
+        Grade(nim="001", matakuliah_id=2, semester="2023/2024-1", nilai_huruf="E", nilai_angka=0.0, sks=3, dosen_id=1),
+    ])
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_transcript_is_one_query_and_memoized(db_session):
+    statements = _count_statements(db_session.get_bind())
+    transcript = get_transcript(db_session, "001")
+    assert len(statements) == 1
+
+    assert transcript["biodata"] == {"nim": "001", "nama": "Mahasiswa 001",
+                                     "program_studi": "Teknik Informatika", "fakultas": "Teknik"}
+    courses = transcript["semester_list"][0]["courses"]
+    assert [c["kode"] for c in courses] == ["MK1", "MK2"]
+    assert (transcript["total_sks"], transcript["ipk"], transcript["predikat"]) == (5, 3.0, "Sangat Memuaskan")
+
+    assert get_transcript(db_session, "001") is transcript
+    assert len(statements) == 1
+
+    # Unknown students are not memoized
+    assert get_transcript(db_session, "999")["biodata"] == {}
+
+
+def test_grade_write_invalidates_transcript(db_session):
+    before = get_transcript(db_session, "001")
+    crud.create_grade(db_session, GradeCreate(nim="001", matakuliah_id=2, semester="2023/2024-2",
+                                              nilai_huruf="A", sks=3, dosen_id=1), "dosen1")
+    after = get_transcript(db_session, "001")
+    assert after is not before
+    # Existing course: create_grade updates the E to an A
+    assert (after["total_sks"], after["ipk"]) == (5, round((6 + 12) / 5, 2))
+
+
+def test_transcript_read_racing_an_invalidation_is_not_stored(db_session):
+    generation = transcript_memo.generation(db_session)
+    stale = {"biodata": {"nim": "001"}}
+    transcript_memo.invalidate(db_session, ["001"])
+    transcript_memo.put(db_session, "001", stale, generation)
+    assert transcript_memo.get(db_session, "001") is None
+
+
+def test_biodata_and_course_changes_show_up_after_the_ttl(db_session, monkeypatch):
+    before = get_transcript(db_session, "001")
+    # Written directly: nothing invalidates the memo
+    db_session.query(CalonMahasiswa).update({CalonMahasiswa.nama_lengkap: "Nama Baru"})
+    db_session.query(Matakuliah).filter(Matakuliah.id == 2).update({Matakuliah.nama: "Algoritma Dasar"})
+    db_session.commit()
+    assert get_transcript(db_session, "001") is before
+
+    # The entry has outlived the TTL
+    monkeypatch.setattr(transcript_memo, "ttl", 0)
+    after = get_transcript(db_session, "001")
+    assert after["biodata"]["nama"] == "Nama Baru"
+    assert after["semester_list"][0]["courses"][0]["nama"] == "Algoritma Dasar"
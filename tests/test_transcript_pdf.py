@@ -0,0 +1,107 @@
+import pytest
+from datetime import datetime, time
+from pathlib import Path
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from pmb_system.database import Base, get_db
+from pmb_system import models as pmb_models
+from pmb_system.models import CalonMahasiswa, ProgramStudi, JalurMasukEnum
+from krs_system.models import Matakuliah
+from auth_system.dependencies import get_current_user
+from auth_system.models import RoleEnum
+from grades_system import crud
+from grades_system.models import Grade
+from grades_system.schemas import GradeUpdate
+from grades_system.router_gpa import router
+from grades_system.services.transcript_pdf import TranscriptPdfCache, transcript_pdf_cache
+
+
+@pytest.fixture
+def client():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    # PMB models are declared on their own Base
+    pmb_models.Base.metadata.create_all(bind=engine)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSessionLocal()
+    db.add(ProgramStudi(kode="TIF", nama="Teknik Informatika", fakultas="Teknik"))
+    db.add(CalonMahasiswa(nama_lengkap="Mahasiswa 001", email="001@example.com", phone="081234567890",
+                          tanggal_lahir=datetime(2005, 1, 1), alamat="Jakarta", program_studi_id=1,
+                          jalur_masuk=JalurMasukEnum.SNBT, nim="001"))
+    db.add(Matakuliah(kode="MK1", nama="Algoritma", sks=3, semester=1, hari="senin",
+                      jam_mulai=time(8), jam_selesai=time(10)))
+    db.add(Grade(nim="001", matakuliah_id=1, semester="2024/2025-1", nilai_huruf="B", nilai_angka=3.0,
+                 sks=3, dosen_id=1))
+    db.commit()
+    db.close()
+    transcript_pdf_cache.clear()
+
+    app = FastAPI()
+    app.include_router(router)
+
+    def override_get_db():
+        session = TestingSessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        username="001", role=RoleEnum.MAHASISWA, kode_dosen=None, nim="001"
+    )
+    client = TestClient(app)
+    client.session_factory = TestingSessionLocal
+    yield client
+    transcript_pdf_cache.clear()
+
+
+def test_transcript_pdf_is_cached_with_etag(client):
+    response = client.get("/api/gpa/transcript/001/pdf")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+    assert 'filename="transkrip_001.pdf"' in response.headers["content-disposition"]
+    etag = response.headers["etag"]
+    assert not Path("generated_pdfs/transkrip_001.pdf").exists()
+
+    # Same content: served from the cache, or 304 when the client already has it
+    again = client.get("/api/gpa/transcript/001/pdf")
+    assert (again.headers["etag"], again.content) == (etag, response.content)
+    not_modified = client.get("/api/gpa/transcript/001/pdf", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    # A grade change gives a new transcript and a new ETag
+    db = client.session_factory()
+    crud.update_grade(db, 1, GradeUpdate(nilai_huruf="A", reason="Koreksi"), "dosen1")
+    db.close()
+    changed = client.get("/api/gpa/transcript/001/pdf", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_transcript_pdf_requires_own_nim(client):
+    assert client.get("/api/gpa/transcript/002/pdf").status_code == 403
+
+
+def test_cache_evicts_by_total_bytes():
+    cache = TranscriptPdfCache(max_bytes=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"5678")
+    cache.get("a")  # "b" is now the least recently used
+    cache.put("c", b"90ab")
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (b"1234", None, b"90ab")
+    assert cache.size == 8
+
+    cache.put("huge", b"x" * 11)  # Larger than the whole cache: not stored
+    assert cache.get("huge") is None
+    assert cache.size == 8